@@ -0,0 +1,177 @@
+"""
+=========================================================
+SISTEMA DE ANÁLISIS BIM – TRAMO 1 | Metro 80, Medellín
+=========================================================
+Almacén columnar en disco (memory-mapped)
+
+El DataFrame maestro consolidado se escribe como un archivo .npy
+por columna:
+  - Columnas numéricas / booleanas → el arreglo tal cual
+  - Columnas de texto → códigos enteros (.npy) + categorías en el
+    manifiesto (equivalente a una columna categórica de pandas)
+
+Las sesiones "adjuntan" el snapshot con np.load(mmap_mode="r"):
+no se deserializa ni se copia nada, y N procesos/sesiones leyendo
+el mismo snapshot comparten una única copia física en la caché de
+páginas del sistema operativo.
+
+Estructura:
+  .snapshots/<tramo>/<huella>/manifiesto.json
+  .snapshots/<tramo>/<huella>/<columna>.npy
+=========================================================
+"""
+
+import json
+import os
+import shutil
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+from build_maestro import BASE_DIR
+
+DIR_SNAPSHOTS = os.path.join(BASE_DIR, ".snapshots")
+VERSION_FORMATO = 1
+# Snapshots que se conservan por tramo: son las versiones que se pueden
+# comparar en Integridad del Modelo. Ajustable con BIM_SNAPSHOTS_CONSERVAR.
+SNAPSHOTS_CONSERVAR = int(os.environ.get("BIM_SNAPSHOTS_CONSERVAR", "6"))
+
+
+# ─────────────────────────────────────────────────────────
+# 1. RUTAS
+# ─────────────────────────────────────────────────────────
+def ruta_snapshot(tramo: str, huella: str, base_dir: str = DIR_SNAPSHOTS) -> str:
+    return os.path.join(base_dir, tramo, huella)
+
+
+def existe_snapshot(tramo: str, huella: str, base_dir: str = DIR_SNAPSHOTS) -> bool:
+    return os.path.exists(os.path.join(ruta_snapshot(tramo, huella, base_dir), "manifiesto.json"))
+
+
+def ultimo_snapshot(tramo: str, base_dir: str = DIR_SNAPSHOTS):
+    """Huella del snapshot publicado más reciente del tramo (o None si no hay)."""
+    dir_tramo = os.path.join(base_dir, tramo)
+    if not os.path.isdir(dir_tramo):
+        return None
+    huellas = [d for d in os.listdir(dir_tramo)
+               if not d.startswith(".") and existe_snapshot(tramo, d, base_dir)]
+    if not huellas:
+        return None
+    return max(huellas, key=lambda d: os.path.getmtime(os.path.join(dir_tramo, d)))
+
+
+def listar_snapshots(tramo: str, base_dir: str = DIR_SNAPSHOTS) -> list:
+    """Snapshots publicados del tramo, del más reciente al más antiguo: [{huella, fecha, filas}]."""
+    dir_tramo = os.path.join(base_dir, tramo)
+    if not os.path.isdir(dir_tramo):
+        return []
+    snapshots = []
+    for d in os.listdir(dir_tramo):
+        if d.startswith(".") or not existe_snapshot(tramo, d, base_dir):
+            continue
+        ruta = os.path.join(dir_tramo, d)
+        snapshots.append({"huella": d, "fecha": os.path.getmtime(ruta),
+                          "filas": leer_manifiesto(ruta)["filas"]})
+    return sorted(snapshots, key=lambda s: s["fecha"], reverse=True)
+
+
+def _nombre_archivo(i: int, columna: str) -> str:
+    # El índice evita problemas con nombres de columna que no son nombres de archivo válidos
+    seguro = "".join(ch if ch.isalnum() or ch == "_" else "_" for ch in str(columna))
+    return f"{i:03d}_{seguro}.npy"
+
+
+# ─────────────────────────────────────────────────────────
+# 2. ESCRITURA
+# ─────────────────────────────────────────────────────────
+def guardar_snapshot(df: pd.DataFrame, tramo: str, huella: str,
+                     base_dir: str = DIR_SNAPSHOTS, conservar: int = SNAPSHOTS_CONSERVAR) -> str:
+    """
+    Escribe `df` como snapshot columnar y lo publica de forma atómica
+    (se escribe en una carpeta temporal y luego se renombra).
+    Conserva solo los `conservar` snapshots más recientes del tramo.
+    Retorna la ruta del snapshot.
+    """
+    destino = ruta_snapshot(tramo, huella, base_dir)
+    dir_tramo = os.path.dirname(destino)
+    os.makedirs(dir_tramo, exist_ok=True)
+    temporal = tempfile.mkdtemp(prefix=".tmp_", dir=dir_tramo)
+
+    columnas = []
+    for i, col in enumerate(df.columns):
+        serie = df[col]
+        archivo = _nombre_archivo(i, col)
+        if serie.dtype.kind in "biuf":
+            np.save(os.path.join(temporal, archivo), serie.to_numpy())
+            columnas.append({"nombre": col, "archivo": archivo, "tipo": "numerico"})
+        else:
+            cat = serie if isinstance(serie.dtype, pd.CategoricalDtype) else serie.astype("category")
+            np.save(os.path.join(temporal, archivo), cat.cat.codes.to_numpy())
+            columnas.append({"nombre": col, "archivo": archivo, "tipo": "categorico",
+                             "categorias": [str(c) for c in cat.cat.categories]})
+
+    manifiesto = {"version": VERSION_FORMATO, "tramo": tramo, "huella": huella,
+                  "filas": int(len(df)), "columnas": columnas,
+                  "atributos": dict(df.attrs)}     # p. ej. unidades de longitud (auditoría)
+    with open(os.path.join(temporal, "manifiesto.json"), "w", encoding="utf-8") as f:
+        json.dump(manifiesto, f, ensure_ascii=False, indent=1)
+
+    if os.path.exists(destino):
+        shutil.rmtree(temporal)   # otro proceso ya publicó la misma huella
+    else:
+        os.replace(temporal, destino)
+
+    _podar_snapshots(dir_tramo, conservar=conservar, proteger=huella)
+    return destino
+
+
+def _podar_snapshots(dir_tramo: str, conservar: int, proteger: str):
+    """Borra los snapshots más antiguos del tramo (los ya mapeados siguen válidos en Linux)."""
+    candidatos = [d for d in os.listdir(dir_tramo)
+                  if not d.startswith(".") and os.path.isdir(os.path.join(dir_tramo, d))]
+    candidatos.sort(key=lambda d: os.path.getmtime(os.path.join(dir_tramo, d)), reverse=True)
+    for d in candidatos[conservar:]:
+        if d != proteger:
+            shutil.rmtree(os.path.join(dir_tramo, d), ignore_errors=True)
+
+
+# ─────────────────────────────────────────────────────────
+# 3. LECTURA (zero-copy)
+# ─────────────────────────────────────────────────────────
+def leer_manifiesto(ruta: str) -> dict:
+    with open(os.path.join(ruta, "manifiesto.json"), encoding="utf-8") as f:
+        return json.load(f)
+
+
+def adjuntar_snapshot(ruta: str, columnas: list = None) -> pd.DataFrame:
+    """
+    Abre un snapshot en modo memory-map y retorna un DataFrame cuyas
+    columnas apuntan directamente a las páginas del archivo (solo lectura).
+    Con `columnas` se adjunta solo un subconjunto.
+    """
+    manifiesto = leer_manifiesto(ruta)
+    datos = {}
+    for meta in manifiesto["columnas"]:
+        if columnas is not None and meta["nombre"] not in columnas:
+            continue
+        arreglo = np.load(os.path.join(ruta, meta["archivo"]), mmap_mode="r")
+        if meta["tipo"] == "numerico":
+            datos[meta["nombre"]] = pd.Series(arreglo, copy=False)
+        else:
+            dtype = pd.CategoricalDtype(meta["categorias"])
+            datos[meta["nombre"]] = pd.Series(
+                pd.Categorical.from_codes(arreglo, dtype=dtype, validate=False), copy=False)
+    df = pd.DataFrame(datos, copy=False)
+    df.attrs.update(manifiesto.get("atributos", {}))
+    return df
+
+
+def cargar_o_construir(tramo: str, huella: str, construir, base_dir: str = DIR_SNAPSHOTS) -> pd.DataFrame:
+    """
+    Adjunta el snapshot (tramo, huella) si ya existe; si no, ejecuta
+    `construir()`, lo guarda en disco y lo adjunta.
+    """
+    if not existe_snapshot(tramo, huella, base_dir):
+        guardar_snapshot(construir(), tramo, huella, base_dir)
+    return adjuntar_snapshot(ruta_snapshot(tramo, huella, base_dir))
@@ -0,0 +1,190 @@
+"""
+=========================================================
+SISTEMA DE ANÁLISIS BIM – TRAMO 1 | Metro 80, Medellín
+=========================================================
+Almacén de datos compartido entre sesiones
+
+Un único almacén por proceso de Streamlit guarda el DataFrame
+maestro de cada tramo y sus derivados (costos por factor, KPIs,
+agregados). Todas las sesiones reciben el MISMO objeto, sin
+serializar ni copiar: las entradas son de solo lectura.
+
+- Clave de cada entrada: (tramo, huella de las fuentes, nombre)
+- Presupuesto de memoria configurable con expulsión LRU entre tramos
+- Invalidación dirigida: al cambiar un Excel cambia la huella del
+  tramo y solo se descartan las entradas de ESE tramo
+=========================================================
+"""
+
+import hashlib
+import os
+import sys
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+
+# Los DataFrames derivados de una entrada compartida nunca la modifican
+# gracias a Copy-on-Write, siempre activo desde pandas 3.0 (requirements.txt).
+
+# Presupuesto por defecto del almacén (MB). Se puede ajustar con la
+# variable de entorno BIM_PRESUPUESTO_MB sin tocar el código.
+PRESUPUESTO_MB = int(os.environ.get("BIM_PRESUPUESTO_MB", "1024"))
+
+# Versión del pipeline que produce el maestro. Entra en la huella: si un
+# cambio del pipeline cambia el resultado para los mismos archivos (p. ej.
+# la conversión de unidades de longitud), los snapshots viejos no se adoptan.
+VERSION_PIPELINE = 2
+
+
+# ─────────────────────────────────────────────────────────
+# 1. HUELLA DE LAS FUENTES
+# ─────────────────────────────────────────────────────────
+def huella_fuentes(rutas: dict) -> str:
+    """
+    Huella de un conjunto de archivos fuente (ruta, tamaño y fecha de
+    modificación) y de VERSION_PIPELINE. Cambia en cuanto se reemplaza
+    cualquier Excel, sin necesidad de leer su contenido.
+    """
+    h = hashlib.blake2b(digest_size=12)
+    h.update(f"pipeline|{VERSION_PIPELINE}".encode("utf-8"))
+    for nombre in sorted(rutas):
+        ruta = rutas[nombre]
+        try:
+            info = os.stat(ruta)
+            firma = f"{nombre}|{os.path.abspath(ruta)}|{info.st_size}|{info.st_mtime_ns}"
+        except FileNotFoundError:
+            firma = f"{nombre}|{os.path.abspath(ruta)}|ausente"
+        h.update(firma.encode("utf-8"))
+    return h.hexdigest()
+
+
+def tamano_bytes(valor) -> int:
+    """Estimación de memoria de una entrada del almacén."""
+    if isinstance(valor, pd.DataFrame):
+        return int(valor.memory_usage(index=True, deep=True).sum())
+    if isinstance(valor, pd.Series):
+        return int(valor.memory_usage(index=True, deep=True))
+    if isinstance(valor, dict):
+        return sys.getsizeof(valor) + sum(tamano_bytes(v) for v in valor.values())
+    if isinstance(valor, (list, tuple)):
+        return sys.getsizeof(valor) + sum(tamano_bytes(v) for v in valor)
+    return sys.getsizeof(valor)
+
+
+# ─────────────────────────────────────────────────────────
+# 2. ALMACÉN COMPARTIDO
+# ─────────────────────────────────────────────────────────
+class AlmacenCompartido:
+    """
+    Caché LRU de proceso con presupuesto de memoria.
+
+    - `obtener(tramo, huella, nombre, constructor)` retorna la entrada o
+      la construye una sola vez aunque varias sesiones la pidan a la vez.
+    - `invalidar(tramo, conservar=huella)` descarta solo las entradas de
+      ese tramo cuya huella ya no es la vigente.
+    """
+
+    def __init__(self, presupuesto_mb: int = PRESUPUESTO_MB):
+        self.presupuesto_bytes = presupuesto_mb * 1024 * 1024
+        self._entradas = OrderedDict()   # clave → (valor, bytes)
+        self._bytes_usados = 0
+        self._lock = threading.Lock()
+        self._locks_construccion = {}    # clave → [lock, hilos que lo usan]
+        self.aciertos = 0
+        self.fallos = 0
+        self.expulsiones = 0
+
+    # ── Lectura ──
+    def obtener(self, tramo: str, huella: str, nombre, constructor):
+        clave = (tramo, huella, nombre)
+        valor = self._leer(clave)
+        if valor is not None:
+            return valor
+
+        # Un lock por clave: si dos sesiones piden lo mismo en frío,
+        # la segunda espera a la primera en lugar de construir otra vez.
+        with self._lock:
+            registro = self._locks_construccion.setdefault(clave, [threading.Lock(), 0])
+            registro[1] += 1
+        try:
+            with registro[0]:
+                valor = self._leer(clave, contar_fallo=False)
+                if valor is not None:
+                    return valor
+                valor = constructor()
+                self.guardar(tramo, huella, nombre, valor)
+        finally:
+            # El lock se descarta cuando sale el último hilo que lo usa (también si
+            # el constructor falló): mientras alguien espera, todos comparten el mismo
+            with self._lock:
+                registro[1] -= 1
+                if registro[1] == 0:
+                    del self._locks_construccion[clave]
+        return valor
+
+    def _leer(self, clave, contar_fallo=True):
+        with self._lock:
+            if clave in self._entradas:
+                self._entradas.move_to_end(clave)
+                self.aciertos += 1
+                return self._entradas[clave][0]
+            if contar_fallo:
+                self.fallos += 1
+        return None
+
+    def contiene(self, tramo: str, huella: str, nombre) -> bool:
+        with self._lock:
+            return (tramo, huella, nombre) in self._entradas
+
+    # ── Escritura ──
+    def guardar(self, tramo: str, huella: str, nombre, valor):
+        """Publica una entrada (reemplaza la anterior con la misma clave)."""
+        clave = (tramo, huella, nombre)
+        peso = tamano_bytes(valor)
+        with self._lock:
+            if clave in self._entradas:
+                self._bytes_usados -= self._entradas.pop(clave)[1]
+            self._entradas[clave] = (valor, peso)
+            self._bytes_usados += peso
+            self._expulsar(proteger=clave)
+
+    def _expulsar(self, proteger):
+        """LRU: descarta las entradas menos usadas hasta cumplir el presupuesto."""
+        while self._bytes_usados > self.presupuesto_bytes and len(self._entradas) > 1:
+            clave = next(iter(self._entradas))
+            if clave == proteger:
+                self._entradas.move_to_end(clave)
+                clave = next(iter(self._entradas))
+                if clave == proteger:
+                    break
+            self._bytes_usados -= self._entradas.pop(clave)[1]
+            self.expulsiones += 1
+
+    # ── Invalidación ──
+    def invalidar(self, tramo: str, conservar: str = None) -> int:
+        """
+        Descarta las entradas de `tramo`. Si se indica `conservar`, se
+        mantienen las de esa huella (la vigente). Retorna cuántas se
+        descartaron. Los demás tramos no se tocan.
+        """
+        with self._lock:
+            claves = [c for c in self._entradas
+                      if c[0] == tramo and (conservar is None or c[1] != conservar)]
+            for clave in claves:
+                self._bytes_usados -= self._entradas.pop(clave)[1]
+        return len(claves)
+
+    def estadisticas(self) -> dict:
+        with self._lock:
+            consultas = self.aciertos + self.fallos
+            return dict(entradas=len(self._entradas),
+                        mb_usados=self._bytes_usados / 1024 / 1024,
+                        mb_presupuesto=self.presupuesto_bytes / 1024 / 1024,
+                        aciertos=self.aciertos, fallos=self.fallos,
+                        tasa_aciertos=self.aciertos / consultas if consultas else 0.0,
+                        expulsiones=self.expulsiones)
+
+
+# Instancia única por proceso — la comparten todas las sesiones
+ALMACEN = AlmacenCompartido()
@@ -0,0 +1,258 @@
+"""
+=========================================================
+SISTEMA DE ANÁLISIS BIM – TRAMO 1 | Metro 80, Medellín
+=========================================================
+API local de KPIs en JSON (solo lectura, sin dependencias)
+
+Para reportes y hojas de cálculo que hoy copian cifras del dashboard
+a mano. Sirve las mismas cifras sin ejecutar el dashboard:
+
+  GET /                    → índice de endpoints y tramos
+  GET /kpis                → KPIs técnicos, económicos, de conteo y calidad
+  GET /agregados           → cantidad / costo / elementos por Tipo y por
+                             Diámetro (× estado), como el Análisis Detallado
+
+Parámetros (todos opcionales):
+  tramo=Tramo1   factor=25 (% demolición)   categoria=Conduits
+  estado=NUEVO,DEMOLIDO   tipo=Tubo_PVC_2In,Tubo_PVC_4In
+
+Las respuestas salen del almacén compartido (mismas entradas de costos
+por factor que el dashboard si corren en el mismo proceso); el JSON de
+cada consulta se guarda ya serializado. ETag = huella de los datos +
+consulta normalizada: con If-None-Match vigente se responde 304 sin
+tocar los datos. Al publicarse un snapshot nuevo cambia la huella y
+con ella todas las ETag.
+
+Uso:
+    python api_kpis.py --puerto 8502 [--tramos Tramo1 Tramo2]
+    BIM_API_PUERTO=8502 streamlit run dashboard.py   (dentro del dashboard)
+=========================================================
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import numpy as np
+import pandas as pd
+
+from almacen_datos import ALMACEN
+from build_maestro import FACTOR_DEMOLICION, calcular_costos
+from coordinador import obtener_coordinador
+from kpis import ESTADOS_KPI, calcular_kpis
+
+PUERTO = int(os.environ.get("BIM_API_PUERTO", "8502"))
+TRAMOS = ("Tramo1",)
+VERSION_API = 1                  # entra en la ETag: cambiar el formato invalida las cachés
+
+
+class ConsultaInvalida(ValueError):
+    """Parámetro mal formado → 400."""
+
+
+# ─────────────────────────────────────────────────────────
+# 1. CONSULTA NORMALIZADA
+# ─────────────────────────────────────────────────────────
+def _lista(parametros: dict, nombre: str) -> tuple:
+    valores = [v.strip() for texto in parametros.get(nombre, []) for v in texto.split(",")]
+    return tuple(sorted({v for v in valores if v}))
+
+
+def normalizar_consulta(parametros: dict, tramos: tuple = TRAMOS) -> dict:
+    """Parámetros de la URL → consulta canónica (mismo orden → misma ETag)."""
+    tramo = parametros.get("tramo", [tramos[0]])[-1]
+    if tramo not in tramos:
+        raise ConsultaInvalida(f"tramo desconocido: {tramo} (disponibles: {', '.join(tramos)})")
+    try:
+        factor = int(parametros.get("factor", [round(FACTOR_DEMOLICION * 100)])[-1])
+    except ValueError:
+        raise ConsultaInvalida("factor debe ser un porcentaje entero (p. ej. 25)")
+    if not 0 <= factor <= 100:
+        raise ConsultaInvalida("factor debe estar entre 0 y 100")
+    estados = _lista(parametros, "estado")
+    desconocidos = [e for e in estados if e not in ESTADOS_KPI]
+    if desconocidos:
+        raise ConsultaInvalida(f"estado desconocido: {', '.join(desconocidos)}")
+    return dict(tramo=tramo, factor=factor, categoria=_lista(parametros, "categoria"),
+                estado=estados, tipo=_lista(parametros, "tipo"))
+
+
+def etag(huella: str, ruta: str, consulta: dict) -> str:
+    h = hashlib.blake2b(digest_size=12)
+    h.update(f"{VERSION_API}|{huella}|{ruta}|{json.dumps(consulta, sort_keys=True)}".encode("utf-8"))
+    return f'"{h.hexdigest()}"'
+
+
+def coincide_etag(encabezado: str, actual: str) -> bool:
+    if not encabezado:
+        return False
+    candidatas = {e.strip().removeprefix("W/") for e in encabezado.split(",")}
+    return "*" in candidatas or actual in candidatas
+
+
+# ─────────────────────────────────────────────────────────
+# 2. RESPUESTAS DESDE EL ALMACÉN
+# ─────────────────────────────────────────────────────────
+def _filtrar(df: pd.DataFrame, consulta: dict) -> pd.DataFrame:
+    for columna, nombre in (("categoria", "categoria"), ("estado", "estado"), ("type", "tipo")):
+        if consulta[nombre]:
+            df = df[df[columna].isin(consulta[nombre])]
+    return df
+
+
+def _json(valor):
+    if isinstance(valor, np.integer):
+        return int(valor)
+    if isinstance(valor, np.floating):
+        return float(valor)
+    raise TypeError(f"No serializable: {type(valor).__name__}")
+
+
+def _registros(tabla: pd.DataFrame) -> list:
+    tabla = tabla.astype({c: str for c in tabla.columns
+                          if isinstance(tabla[c].dtype, pd.CategoricalDtype)})
+    return tabla.to_dict("records")
+
+
+def respuesta_kpis(df: pd.DataFrame, consulta: dict) -> dict:
+    kpi_tec, kpi_eco, kpi_cnt, kpi_cal = calcular_kpis(df)
+    return dict(elementos=len(df), tecnicos=kpi_tec, economicos=kpi_eco,
+                conteos=kpi_cnt, calidad=kpi_cal)
+
+
+def respuesta_agregados(df: pd.DataFrame, consulta: dict) -> dict:
+    def por(columna, base):
+        return _registros(base.groupby([columna, "estado"], observed=True).agg(
+            cantidad=("cantidad", "sum"), costo=("costo_total", "sum"),
+            elementos=("id", "count")).reset_index())
+
+    conduits = df[df["categoria"] == "Conduits"]
+    return dict(elementos=len(df),
+                por_tipo=por("type", df),
+                por_diametro=por("diametro", df[df["diametro"] != "N/A"]),
+                conduits_por_tipo=por("type", conduits),
+                conduits_por_diametro=por("diametro", conduits))
+
+
+ENDPOINTS = {"/kpis": respuesta_kpis, "/agregados": respuesta_agregados}
+
+
+def cuerpo_respuesta(ruta: str, consulta: dict, huella: str, df_base: pd.DataFrame) -> bytes:
+    """JSON (bytes) de `ruta` para `consulta`, construido una vez por huella."""
+    tramo, factor = consulta["tramo"], consulta["factor"] / 100
+
+    def construir():
+        df = ALMACEN.obtener(tramo, huella, ("costos", factor),
+                             lambda: calcular_costos(df_base, factor))
+        datos = ENDPOINTS[ruta](_filtrar(df, consulta), consulta)
+        return json.dumps(dict(huella=huella, consulta=consulta, **datos),
+                          default=_json, ensure_ascii=False).encode("utf-8")
+
+    clave = ("api", ruta) + tuple((k, consulta[k]) for k in sorted(consulta))
+    return ALMACEN.obtener(tramo, huella, clave, construir)
+
+
+# ─────────────────────────────────────────────────────────
+# 3. SERVIDOR HTTP
+# ─────────────────────────────────────────────────────────
+class ManejadorKPI(BaseHTTPRequestHandler):
+    server_version = "BIM-KPI/1"
+    tramos = TRAMOS
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        ruta = url.path.rstrip("/") or "/"
+        if ruta == "/":
+            return self._enviar(200, json.dumps(dict(
+                endpoints=sorted(ENDPOINTS), tramos=list(self.tramos),
+                parametros=["tramo", "factor", "categoria", "estado", "tipo"])).encode("utf-8"))
+        if ruta not in ENDPOINTS:
+            return self._error(404, f"ruta desconocida: {ruta}")
+        try:
+            consulta = normalizar_consulta(parse_qs(url.query), self.tramos)
+        except ConsultaInvalida as e:
+            return self._error(400, str(e))
+
+        vigente = obtener_coordinador(consulta["tramo"]).snapshot_vigente()
+        if vigente is None:       # primer snapshot aún en construcción
+            return self._error(503, "datos en construcción", {"Retry-After": "10"})
+        huella, df_base = vigente
+        etiqueta = etag(huella, ruta, consulta)
+        encabezados = {"ETag": etiqueta, "Cache-Control": "no-cache"}
+        if coincide_etag(self.headers.get("If-None-Match"), etiqueta):
+            return self._enviar(304, b"", encabezados)
+        try:
+            cuerpo = cuerpo_respuesta(ruta, consulta, huella, df_base)
+        except Exception as e:
+            print(f"  ⚠️  API de KPIs: {ruta} fallida — {type(e).__name__}: {e}")
+            return self._error(500, f"error interno: {type(e).__name__}")
+        self._enviar(200, cuerpo, encabezados)
+
+    def _error(self, codigo: int, mensaje: str, encabezados: dict = None):
+        self._enviar(codigo, json.dumps({"error": mensaje}, ensure_ascii=False).encode("utf-8"),
+                     encabezados)
+
+    def _enviar(self, codigo: int, cuerpo: bytes, encabezados: dict = None):
+        self.send_response(codigo)
+        for nombre, valor in (encabezados or {}).items():
+            self.send_header(nombre, valor)
+        if codigo != 304:
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+            self.send_header("Content-Length", str(len(cuerpo)))
+        self.end_headers()
+        if codigo != 304:
+            self.wfile.write(cuerpo)
+
+    def log_message(self, formato, *args):
+        pass                      # una línea por petición ensuciaría la consola de Streamlit
+
+
+def crear_servidor(puerto: int = PUERTO, tramos: tuple = TRAMOS, host: str = "127.0.0.1"):
+    manejador = type("Manejador", (ManejadorKPI,), {"tramos": tuple(tramos)})
+    return ThreadingHTTPServer((host, puerto), manejador)
+
+
+_SERVIDOR = None
+_ERROR_SERVIDOR = None           # p. ej. el puerto ya lo usa otro worker o la API independiente
+_LOCK_SERVIDOR = threading.Lock()
+
+
+def iniciar_en_segundo_plano(puerto: int = PUERTO, tramos: tuple = TRAMOS):
+    """
+    Arranca la API en un hilo del proceso actual (un solo intento por
+    proceso). Si el puerto no está disponible se informa una vez y se
+    retorna None: quien la llama (el dashboard) sigue sin la API.
+    """
+    global _SERVIDOR, _ERROR_SERVIDOR
+    with _LOCK_SERVIDOR:
+        if _SERVIDOR is None and _ERROR_SERVIDOR is None:
+            try:
+                _SERVIDOR = crear_servidor(puerto, tramos)
+            except OSError as e:
+                _ERROR_SERVIDOR = f"{type(e).__name__}: {e}"
+                print(f"  ⚠️  API de KPIs no disponible en el puerto {puerto} — {_ERROR_SERVIDOR}")
+                return None
+            threading.Thread(target=_SERVIDOR.serve_forever, name="api-kpis", daemon=True).start()
+            print(f"🔌 API de KPIs en http://127.0.0.1:{puerto}/kpis")
+        return _SERVIDOR
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="API local de KPIs en JSON")
+    parser.add_argument("--puerto", type=int, default=PUERTO)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--tramos", nargs="+", default=list(TRAMOS))
+    args = parser.parse_args()
+
+    for tramo in args.tramos:
+        obtener_coordinador(tramo)          # adopta el snapshot en disco o lo construye
+    servidor = crear_servidor(args.puerto, args.tramos, args.host)
+    print(f"🔌 API de KPIs en http://{args.host}:{args.puerto}/  (Ctrl+C para salir)")
+    try:
+        servidor.serve_forever()
+    except KeyboardInterrupt:
+        servidor.server_close()
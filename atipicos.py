@@ -0,0 +1,93 @@
+"""
+=========================================================
+SISTEMA DE ANÁLISIS BIM – TRAMO 1 | Metro 80, Medellín
+=========================================================
+Detección estadística de cantidades atípicas por grupo
+
+Los umbrales fijos de calcular_costos (UMBRAL_ML, UMBRAL_PU) solo
+atrapan valores imposibles en todo el proyecto. Aquí cada elemento se
+compara con sus pares de la misma categoria × type × diametro usando
+estadísticos robustos (no se dejan arrastrar por los propios atípicos):
+
+  z = 0.6745 · (x − mediana) / MAD        (Iglewicz & Hoaglin)
+
+sobre log10(cantidad): un error de unidades (mm en vez de m) es un
+factor, no una diferencia. Si el MAD del grupo es 0 se usa la desviación
+media absoluta (× 1.2533); si también es 0 todo el grupo es igual y no
+hay atípicos. Los grupos con menos de MIN_ELEMENTOS_GRUPO no se evalúan.
+
+Todo se calcula con dos transformaciones por grupo sobre los códigos
+del agrupamiento (sin apply por fila): ~1 M de filas en < 1 s.
+=========================================================
+"""
+
+import numpy as np
+import pandas as pd
+
+COLUMNAS_GRUPO      = ["categoria", "type", "diametro"]
+UMBRAL_Z            = 3.5
+MIN_ELEMENTOS_GRUPO = 5
+ANULAR_ATIPICOS     = False     # True → la construcción anula la cantidad de los atípicos
+
+
+# ─────────────────────────────────────────────────────────
+# 1. PUNTAJE ROBUSTO POR GRUPO
+# ─────────────────────────────────────────────────────────
+def puntaje_robusto(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Estadísticos del grupo de cada fila (alineados con `df`):
+    n_grupo, mediana_grupo (en unidades de la cantidad), razon_mediana
+    (cantidad / mediana) y z_robusto (NaN si la fila no se evalúa).
+    """
+    codigos = df.groupby(COLUMNAS_GRUPO, observed=True, sort=False, dropna=False).ngroup().to_numpy()
+    cantidad = df["cantidad"].to_numpy(dtype="float64", na_value=np.nan)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        x = pd.Series(np.where(cantidad > 0, np.log10(cantidad), np.nan))
+
+    por_grupo = x.groupby(codigos)
+    n = por_grupo.transform("count").to_numpy()
+    mediana = por_grupo.transform("median").to_numpy()
+    desviacion = pd.Series(np.abs(x.to_numpy() - mediana)).groupby(codigos)
+    mad = desviacion.transform("median").to_numpy()
+    escala = np.where(mad > 0, mad / 0.6745, desviacion.transform("mean").to_numpy() * 1.2533)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        z = np.where((escala > 0) & (n >= MIN_ELEMENTOS_GRUPO), (x.to_numpy() - mediana) / escala, np.nan)
+    return pd.DataFrame({"n_grupo": n, "mediana_grupo": 10 ** mediana,
+                         "razon_mediana": 10 ** (x.to_numpy() - mediana), "z_robusto": z},
+                        index=df.index)
+
+
+def detectar_atipicos(df: pd.DataFrame, umbral_z: float = UMBRAL_Z) -> np.ndarray:
+    """Máscara booleana de filas con |z robusto| > umbral_z."""
+    z = puntaje_robusto(df)["z_robusto"].to_numpy()
+    return np.abs(np.nan_to_num(z)) > umbral_z
+
+
+# ─────────────────────────────────────────────────────────
+# 2. REPORTE Y CORRECCIÓN
+# ─────────────────────────────────────────────────────────
+def tabla_atipicos(df: pd.DataFrame, umbral_z: float = UMBRAL_Z) -> pd.DataFrame:
+    """Elementos atípicos con los estadísticos de su grupo, de mayor a menor |z|."""
+    puntajes = puntaje_robusto(df)
+    mascara = np.abs(np.nan_to_num(puntajes["z_robusto"].to_numpy())) > umbral_z
+    columnas = ["id", "categoria", "family", "type", "diametro", "estado", "cantidad", "unidad"]
+    tabla = pd.concat([df.loc[mascara, [c for c in columnas if c in df.columns]],
+                       puntajes.loc[mascara]], axis=1)
+    tabla["direccion"] = np.where(tabla["z_robusto"] > 0, "alto", "bajo")
+    return tabla.sort_values("z_robusto", key=np.abs, ascending=False).reset_index(drop=True)
+
+
+def anular_atipicos(df: pd.DataFrame, umbral_z: float = UMBRAL_Z, verbose: bool = True) -> pd.DataFrame:
+    """Anula (NaN) la cantidad de los atípicos y los marca en dato_corregido."""
+    mascara = detectar_atipicos(df, umbral_z)
+    df = df.copy()
+    if "dato_corregido" not in df.columns:
+        df["dato_corregido"] = False
+    if mascara.any():
+        if verbose:
+            print(f"\n  ⚠️  {mascara.sum()} elementos con cantidad atípica para su tipo y diámetro "
+                  f"(|z| > {umbral_z}) — se anulan")
+        df.loc[mascara, "cantidad"] = np.nan
+        df.loc[mascara, "dato_corregido"] = True
+    return df
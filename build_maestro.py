@@ -12,21 +12,34 @@ import pandas as pd
 import numpy as np
 import os
 
+from formatos_fuente import leer_fuente, resolver_ruta
+from canonizacion import REGLAS_DIAMETRO, REGLAS_TEXTO, canonizar, clave_union
+from atipicos import ANULAR_ATIPICOS, anular_atipicos, detectar_atipicos
+from unidades_longitud import describir, longitudes_en_metros
+
 # ─────────────────────────────────────────────────────────
 # 0. CONFIGURACIÓN DE RUTAS
 # ─────────────────────────────────────────────────────────
 # Cambia BASE_DIR a la carpeta donde tienes tus Excel
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 
-RUTAS = {
-    "conduits_inicial" : os.path.join(BASE_DIR, "Tramo1_Conduits_EstadoInicial.xlsx"),
-    "conduits_final"   : os.path.join(BASE_DIR, "Tramo1_Conduits_EstadoFinal.xlsx"),
-    "fittings_inicial" : os.path.join(BASE_DIR, "Tramo1_Fittings_EstadoInicial.xlsx"),
-    "fittings_final"   : os.path.join(BASE_DIR, "Tramo1_Fittings_EstadoFinal.xlsx"),
-    "fixtures_inicial" : os.path.join(BASE_DIR, "Tramo1_Fixtures_EstadoInicial.xlsx"),
-    "fixtures_final"   : os.path.join(BASE_DIR, "Tramo1_Fixtures_EstadoFinal.xlsx"),
-    "maestro_precios"  : os.path.join(BASE_DIR, "Maestro_Precios_Tramo1.xlsx"),
-}
+def rutas_tramo(tramo: str = "Tramo1", base_dir: str = BASE_DIR) -> dict:
+    """
+    Rutas de las tablas de un tramo, según la convención de nombres de
+    exportación. Para cada tabla se usa el formato más rápido disponible
+    (.parquet, .txt/.csv de Revit o .xlsx) — ver formatos_fuente.py.
+    """
+    return {
+        "conduits_inicial" : resolver_ruta(os.path.join(base_dir, f"{tramo}_Conduits_EstadoInicial")),
+        "conduits_final"   : resolver_ruta(os.path.join(base_dir, f"{tramo}_Conduits_EstadoFinal")),
+        "fittings_inicial" : resolver_ruta(os.path.join(base_dir, f"{tramo}_Fittings_EstadoInicial")),
+        "fittings_final"   : resolver_ruta(os.path.join(base_dir, f"{tramo}_Fittings_EstadoFinal")),
+        "fixtures_inicial" : resolver_ruta(os.path.join(base_dir, f"{tramo}_Fixtures_EstadoInicial")),
+        "fixtures_final"   : resolver_ruta(os.path.join(base_dir, f"{tramo}_Fixtures_EstadoFinal")),
+        "maestro_precios"  : resolver_ruta(os.path.join(base_dir, f"Maestro_Precios_{tramo}")),
+    }
+
+RUTAS = rutas_tramo("Tramo1")
 
 # Factor de costo de demolición (25% del valor del elemento nuevo)
 FACTOR_DEMOLICION = 0.25
@@ -35,11 +48,24 @@ FACTOR_DEMOLICION = 0.25
 # ─────────────────────────────────────────────────────────
 # 1. CARGA DE ARCHIVOS
 # ─────────────────────────────────────────────────────────
-def cargar_datos(rutas: dict) -> dict:
-    """Carga todos los Excel y retorna un diccionario de DataFrames."""
+def _reportar(progreso, etapa: str, fraccion: float):
+    """Informa el avance del pipeline a quien lo ejecuta (p. ej. la barra del dashboard)."""
+    if progreso is not None:
+        progreso(etapa, fraccion)
+
+
+def cargar_datos(rutas: dict, progreso=None, rango=(0.0, 1.0)) -> dict:
+    """
+    Carga todas las tablas fuente (Excel, texto delimitado de Revit o
+    Parquet) y retorna un diccionario de DataFrames.
+    `progreso(etapa, fraccion)` (opcional) se llama antes de cada archivo,
+    con la fracción repartida dentro de `rango`.
+    """
     datos = {}
-    for nombre, ruta in rutas.items():
-        datos[nombre] = pd.read_excel(ruta)
+    inicio, fin = rango
+    for i, (nombre, ruta) in enumerate(rutas.items()):
+        _reportar(progreso, f"Cargando {nombre}", inicio + (fin - inicio) * i / len(rutas))
+        datos[nombre] = leer_fuente(ruta)
         print(f"  ✓ {nombre:20s} → {datos[nombre].shape[0]:,} filas")
     return datos
 
@@ -47,9 +73,37 @@ def cargar_datos(rutas: dict) -> dict:
 # ─────────────────────────────────────────────────────────
 # 2. NORMALIZACIÓN GENERAL
 # ─────────────────────────────────────────────────────────
-def normalizar_texto(serie: pd.Series) -> pd.Series:
-    """Limpia espacios y estandariza mayúsculas/minúsculas."""
-    return serie.astype(str).str.strip()
+def normalizar_texto(serie: pd.Series, reglas: tuple = REGLAS_TEXTO) -> pd.Series:
+    """Forma canónica del texto (ver canonizacion.py): solo se procesan los valores distintos."""
+    return canonizar(serie, reglas)
+
+
+def _columna(df: pd.DataFrame, nombre: str, defecto=None):
+    """Valores de la columna, o `defecto` si el Excel no la trae."""
+    return df[nombre].to_numpy() if nombre in df.columns else defecto
+
+
+def _estado_final(df_final: pd.DataFrame) -> np.ndarray:
+    """Estado de cada elemento del estado final según su fase de creación."""
+    fase = normalizar_texto(df_final["Phase Created"]) if "Phase Created" in df_final.columns \
+        else pd.Series("", index=df_final.index)
+    return np.select([fase == "Nueva Construcción", fase == "Existente"],
+                     ["NUEVO", "PERSISTENTE"], default="DESCONOCIDO")  # DESCONOCIDO → auditoría
+
+
+def _registros(df: pd.DataFrame, categoria: str, estado, diametro, cantidad, unidad: str) -> pd.DataFrame:
+    """Filas del maestro para los elementos de `df` (vectorizado, sin iterar filas)."""
+    return pd.DataFrame({
+        "categoria"   : categoria,
+        "family"      : normalizar_texto(df["Family"]).to_numpy(),
+        "type"        : normalizar_texto(df["Type"]).to_numpy(),
+        "diametro"    : diametro,
+        "nombre_sistema": _columna(df, "NombreSistema"),
+        "categoria_sistema": _columna(df, "CategoriaSistema"),
+        "estado"      : estado,
+        "cantidad"    : cantidad,
+        "unidad"      : unidad,
+    }, index=pd.RangeIndex(len(df)))
 
 
 # ─────────────────────────────────────────────────────────
@@ -60,64 +114,36 @@ def procesar_conduits(df_inicial: pd.DataFrame, df_final: pd.DataFrame) -> pd.Da
     """
     Procesa tuberías (Conduits).
     
-    - Unidad de cantidad: longitud en metros (columna 'Length')
+    - Unidad de cantidad: longitud en metros (columna 'Length'); la unidad
+      de cada archivo se infiere y se convierte a m (unidades_longitud.py)
     - Join con maestro: por Type + Diameter(Trade Size)
     - Estado:
         * Inicial + Phase Demolished = 'Demolición' → DEMOLIDO
         * Final   + Phase Created   = 'Nueva Construcción' → NUEVO
         * Final   + Phase Created   = 'Existente'          → PERSISTENTE
+
+    Las decisiones de unidad quedan en attrs["unidades_longitud"].
     """
-    #  Diagnóstico de unidades de Length
-    # Revit puede exportar en mm, cm, ft o m según la plantilla de exportación.
-    # Para telecomunicaciones urbanas, el promedio por elemento debería ser < 50 m.
-    length_vals = pd.to_numeric(df_final["Length"], errors="coerce").dropna()
-    if len(length_vals) > 0:
-        length_mean = length_vals.mean()
-        length_max  = length_vals.max()
-        print(f"  📏 Length conduits: media={length_mean:.1f}  max={length_max:.1f}")
-        if length_mean > 500:
-            print(f"     ⚠️  Media muy alta — posibles mm en lugar de m en el Excel de Revit.")
-
-    registros = []
+    # Diámetro y longitud en metros de cada archivo completo (una pasada)
+    archivos = {}
+    for nombre, df in (("Conduits estado inicial", df_inicial), ("Conduits estado final", df_final)):
+        diametro = normalizar_texto(df["Diameter(Trade Size)"], REGLAS_DIAMETRO)
+        longitud, decision = longitudes_en_metros(df, diametro, nombre)
+        print(f"  📏 Length {nombre}: {describir(decision)} — {decision['motivo']}")
+        archivos[nombre] = (diametro.to_numpy(), longitud, decision)
 
     # --- DEMOLIDOS (vienen del estado inicial) ---
-    demolidos = df_inicial[df_inicial["Phase Demolished"] == "Demolición"].copy()
-    for _, fila in demolidos.iterrows():
-        registros.append({
-            "categoria"   : "Conduits",
-            "family"      : normalizar_texto(pd.Series([fila["Family"]]))[0],
-            "type"        : normalizar_texto(pd.Series([fila["Type"]]))[0],
-            "diametro"    : normalizar_texto(pd.Series([fila["Diameter(Trade Size)"]]))[0],
-            "nombre_sistema": fila.get("NombreSistema", None),
-            "categoria_sistema": fila.get("CategoriaSistema", None),
-            "estado"      : "DEMOLIDO",
-            "cantidad"    : fila["Length"],  # metros
-            "unidad"      : "ML",
-        })
-
+    diam_ini, long_ini, _ = archivos["Conduits estado inicial"]
+    demolido = (df_inicial["Phase Demolished"] == "Demolición").to_numpy()
     # --- NUEVOS y PERSISTENTES (vienen del estado final) ---
-    for _, fila in df_final.iterrows():
-        fase = str(fila.get("Phase Created", "")).strip()
-        if fase == "Nueva Construcción":
-            estado = "NUEVO"
-        elif fase == "Existente":
-            estado = "PERSISTENTE"
-        else:
-            estado = "DESCONOCIDO"  # para auditoría
-
-        registros.append({
-            "categoria"   : "Conduits",
-            "family"      : normalizar_texto(pd.Series([fila["Family"]]))[0],
-            "type"        : normalizar_texto(pd.Series([fila["Type"]]))[0],
-            "diametro"    : normalizar_texto(pd.Series([fila["Diameter(Trade Size)"]]))[0],
-            "nombre_sistema": fila.get("NombreSistema", None),
-            "categoria_sistema": fila.get("CategoriaSistema", None),
-            "estado"      : estado,
-            "cantidad"    : fila["Length"],  # metros
-            "unidad"      : "ML",
-        })
-
-    return pd.DataFrame(registros)
+    diam_fin, long_fin, _ = archivos["Conduits estado final"]
+    conduits = pd.concat([
+        _registros(df_inicial[demolido], "Conduits", "DEMOLIDO",
+                   diam_ini[demolido], long_ini[demolido], "ML"),   # metros
+        _registros(df_final, "Conduits", _estado_final(df_final), diam_fin, long_fin, "ML"),
+    ], ignore_index=True)
+    conduits.attrs["unidades_longitud"] = [decision for _, _, decision in archivos.values()]
+    return conduits
 
 
 def procesar_fittings(df_inicial: pd.DataFrame, df_final: pd.DataFrame) -> pd.DataFrame:
@@ -127,46 +153,15 @@ def procesar_fittings(df_inicial: pd.DataFrame, df_final: pd.DataFrame) -> pd.Da
     - Unidad de cantidad: unidades (columna 'Count', siempre = 1 por fila)
     - Join con maestro: por Family + Size
     """
-    registros = []
-
-    # --- DEMOLIDOS ---
-    demolidos = df_inicial[df_inicial["Phase Demolished"] == "Demolición"].copy()
-    for _, fila in demolidos.iterrows():
-        registros.append({
-            "categoria"   : "Fittings",
-            "family"      : normalizar_texto(pd.Series([fila["Family"]]))[0],
-            "type"        : normalizar_texto(pd.Series([fila["Type"]]))[0],
-            "diametro"    : normalizar_texto(pd.Series([fila["Size"]]))[0],
-            "nombre_sistema": fila.get("NombreSistema", None),
-            "categoria_sistema": fila.get("CategoriaSistema", None),
-            "estado"      : "DEMOLIDO",
-            "cantidad"    : fila.get("Count", 1),
-            "unidad"      : "UND",
-        })
-
-    # --- NUEVOS y PERSISTENTES ---
-    for _, fila in df_final.iterrows():
-        fase = str(fila.get("Phase Created", "")).strip()
-        if fase == "Nueva Construcción":
-            estado = "NUEVO"
-        elif fase == "Existente":
-            estado = "PERSISTENTE"
-        else:
-            estado = "DESCONOCIDO"
-
-        registros.append({
-            "categoria"   : "Fittings",
-            "family"      : normalizar_texto(pd.Series([fila["Family"]]))[0],
-            "type"        : normalizar_texto(pd.Series([fila["Type"]]))[0],
-            "diametro"    : normalizar_texto(pd.Series([fila["Size"]]))[0],
-            "nombre_sistema": fila.get("NombreSistema", None),
-            "categoria_sistema": fila.get("CategoriaSistema", None),
-            "estado"      : estado,
-            "cantidad"    : fila.get("Count", 1),
-            "unidad"      : "UND",
-        })
-
-    return pd.DataFrame(registros)
+    demolidos = df_inicial[df_inicial["Phase Demolished"] == "Demolición"]
+    return pd.concat([
+        _registros(demolidos, "Fittings", "DEMOLIDO",
+                   normalizar_texto(demolidos["Size"], REGLAS_DIAMETRO).to_numpy(),
+                   _columna(demolidos, "Count", 1), "UND"),
+        _registros(df_final, "Fittings", _estado_final(df_final),
+                   normalizar_texto(df_final["Size"], REGLAS_DIAMETRO).to_numpy(),
+                   _columna(df_final, "Count", 1), "UND"),
+    ], ignore_index=True)
 
 
 def procesar_fixtures(df_inicial: pd.DataFrame, df_final: pd.DataFrame) -> pd.DataFrame:
@@ -177,46 +172,13 @@ def procesar_fixtures(df_inicial: pd.DataFrame, df_final: pd.DataFrame) -> pd.Da
     - Join con maestro: solo por Family (no tienen diámetro)
     - Nota: diámetro se deja como 'N/A'
     """
-    registros = []
-
-    # --- DEMOLIDOS ---
-    demolidos = df_inicial[df_inicial["Phase Demolished"] == "Demolición"].copy()
-    for _, fila in demolidos.iterrows():
-        registros.append({
-            "categoria"   : "Fixtures",
-            "family"      : normalizar_texto(pd.Series([fila["Family"]]))[0],
-            "type"        : normalizar_texto(pd.Series([fila["Type"]]))[0],
-            "diametro"    : "N/A",
-            "nombre_sistema": fila.get("NombreSistema", None),
-            "categoria_sistema": fila.get("CategoriaSistema", None),
-            "estado"      : "DEMOLIDO",
-            "cantidad"    : fila.get("Count", 1),
-            "unidad"      : "UND",
-        })
-
-    # --- NUEVOS y PERSISTENTES ---
-    for _, fila in df_final.iterrows():
-        fase = str(fila.get("Phase Created", "")).strip()
-        if fase == "Nueva Construcción":
-            estado = "NUEVO"
-        elif fase == "Existente":
-            estado = "PERSISTENTE"
-        else:
-            estado = "DESCONOCIDO"
-
-        registros.append({
-            "categoria"   : "Fixtures",
-            "family"      : normalizar_texto(pd.Series([fila["Family"]]))[0],
-            "type"        : normalizar_texto(pd.Series([fila["Type"]]))[0],
-            "diametro"    : "N/A",
-            "nombre_sistema": fila.get("NombreSistema", None),
-            "categoria_sistema": fila.get("CategoriaSistema", None),
-            "estado"      : estado,
-            "cantidad"    : fila.get("Count", 1),
-            "unidad"      : "UND",
-        })
-
-    return pd.DataFrame(registros)
+    demolidos = df_inicial[df_inicial["Phase Demolished"] == "Demolición"]
+    return pd.concat([
+        _registros(demolidos, "Fixtures", "DEMOLIDO", "N/A",
+                   _columna(demolidos, "Count", 1), "UND"),
+        _registros(df_final, "Fixtures", _estado_final(df_final), "N/A",
+                   _columna(df_final, "Count", 1), "UND"),
+    ], ignore_index=True)
 
 
 # ─────────────────────────────────────────────────────────
@@ -226,17 +188,18 @@ def procesar_fixtures(df_inicial: pd.DataFrame, df_final: pd.DataFrame) -> pd.Da
 def preparar_maestro(df_maestro: pd.DataFrame) -> pd.DataFrame:
     """
     Prepara el maestro de precios para el join.
-    Normaliza nombres y crea las claves de unión.
+    Canoniza los textos con las mismas reglas que los datos de Revit y
+    crea las claves de unión (en casefold).
     """
     df = df_maestro.copy()
-    df["Familia"]        = df["Familia"].astype(str).str.strip()
-    df["Tipo"]           = df["Tipo"].astype(str).str.strip()
-    df["Tamaño_Diametro"] = df["Tamaño_Diametro"].astype(str).str.strip()
+    df["Familia"]        = normalizar_texto(df["Familia"])
+    df["Tipo"]           = normalizar_texto(df["Tipo"])
+    df["Tamaño_Diametro"] = normalizar_texto(df["Tamaño_Diametro"], REGLAS_DIAMETRO)
 
     # Clave para Conduits y Fittings: Tipo + Diámetro
-    df["key_tipo_diam"] = df["Tipo"] + "|" + df["Tamaño_Diametro"]
+    df["key_tipo_diam"] = clave_union(df["Tipo"], df["Tamaño_Diametro"])
     # Clave para Fixtures: solo Familia
-    df["key_familia"]   = df["Familia"]
+    df["key_familia"]   = clave_union(df["Familia"])
 
     return df[["Categoria", "Familia", "Tipo", "Tamaño_Diametro",
                "Unidad", "Precio_Unitario_COP",
@@ -255,20 +218,18 @@ def asignar_precios(df_consolidado: pd.DataFrame,
     df = df_consolidado.copy()
 
     # Crear clave de join en el consolidado
-    df["key_tipo_diam"] = df["type"] + "|" + df["diametro"]
-    df["key_familia"]   = df["family"]
+    df["key_tipo_diam"] = clave_union(df["type"], df["diametro"])
+    df["key_familia"]   = clave_union(df["family"])
 
     # Separar el maestro en dos lookup tables
     lookup_tipo_diam = df_maestro_prep.set_index("key_tipo_diam")["Precio_Unitario_COP"].to_dict()
     lookup_familia   = df_maestro_prep.set_index("key_familia")["Precio_Unitario_COP"].to_dict()
 
-    def obtener_precio(fila):
-        if fila["categoria"] in ("Conduits", "Fittings"):
-            return lookup_tipo_diam.get(fila["key_tipo_diam"], np.nan)
-        else:  # Fixtures
-            return lookup_familia.get(fila["key_familia"], np.nan)
-
-    df["precio_unitario"] = df.apply(obtener_precio, axis=1)
+    por_tipo_diam = df["categoria"].isin(["Conduits", "Fittings"])
+    df["precio_unitario"] = pd.to_numeric(pd.concat([
+        df.loc[por_tipo_diam, "key_tipo_diam"].map(lookup_tipo_diam),
+        df.loc[~por_tipo_diam, "key_familia"].map(lookup_familia),   # Fixtures
+    ]).reindex(df.index))
 
     # Registrar si el precio fue encontrado (útil para auditoría)
     df["precio_encontrado"] = df["precio_unitario"].notna()
@@ -280,46 +241,47 @@ def asignar_precios(df_consolidado: pd.DataFrame,
 # 5. CÁLCULO DE COSTOS
 # ─────────────────────────────────────────────────────────
 
-def _validar_y_limpiar(df: pd.DataFrame) -> pd.DataFrame:
-    """
-    Valida tipos numéricos y detecta valores imposibles ANTES de calcular costos.
-    Registra en consola qué filas fueron corregidas. No elimina filas, solo las
-    marca como NaN para que no contaminen los cálculos.
-
-    Umbrales para telecomunicaciones urbanas (Metro Medellín):
-      - Conduit individual > 2 000 m→ probable error de unidades (mm en vez de m)
-      - Precio unitario > 5 000 M COP → valor claramente imposible
-    """
-    df = df.copy()
-
-    # ── Coerción de tipos ──
-    df["cantidad"]        = pd.to_numeric(df["cantidad"],        errors="coerce")
-    df["precio_unitario"] = pd.to_numeric(df["precio_unitario"], errors="coerce")
-
-    # ── Longitudes imposibles (Conduits) ──
-    UMBRAL_ML = 2_000
-    mask_ml = (df["categoria"] == "Conduits") & df["cantidad"].notna() & (df["cantidad"] > UMBRAL_ML)
-    if mask_ml.sum() > 0:
-        print(f"\n  ⚠️  {mask_ml.sum()} conduits con longitud > {UMBRAL_ML} m — posible error de unidades en Revit")
-        print(df[mask_ml][["id","family","type","diametro","cantidad"]].head(5).to_string(index=False))
-        df.loc[mask_ml, "cantidad"] = np.nan
-        df.loc[mask_ml, "dato_corregido"] = True
-
-    # ── Precios unitarios imposibles ──
-    UMBRAL_PU = 5_000_000_000
-    mask_pu = df["precio_unitario"].notna() & (df["precio_unitario"] > UMBRAL_PU)
-    if mask_pu.sum() > 0:
-        print(f"\n  ⚠️  {mask_pu.sum()} elementos con precio_unitario > $5 000 M COP — se anulan")
-        df.loc[mask_pu, "precio_unitario"] = np.nan
-        df.loc[mask_pu, "dato_corregido"] = True
+# Umbrales para telecomunicaciones urbanas (Metro Medellín):
+#   - Conduit individual > 2 000 m→ probable error de unidades (mm en vez de m)
+#   - Precio unitario > 5 000 M COP → valor claramente imposible
+# Son cotas absolutas contra overflow; las cantidades atípicas para su
+# tipo y diámetro se detectan por grupo en atipicos.py.
+UMBRAL_ML = 2_000
+UMBRAL_PU = 5_000_000_000
+# Costo de un elemento por encima de 2^53 pesos: el producto en float64 ya
+# no es un entero exacto y las sumas en int64 podrían desbordarse
+LIMITE_PESOS = 2.0 ** 53
 
-    if "dato_corregido" not in df.columns:
-        df["dato_corregido"] = False
-
-    return df
 
-
-def calcular_costos(df: pd.DataFrame, factor_demolicion: float = 0.25) -> pd.DataFrame:
+def costos_en_pesos(es_conduit, nuevo, demolido, cantidad, precio, factor_demolicion: float) -> dict:
+    """
+    Núcleo del cálculo de costos sobre arreglos NumPy, en una sola pasada:
+    validación de umbrales, NaN → 0, factor de demolición y redondeo a
+    pesos enteros (int64, mitad al par como round(0)).
+
+    Retorna dict con costo_nuevo, costo_demolicion, costo_total (int64) y
+    las máscaras cantidad_invalida, precio_invalido y desborde.
+    Cada costo depende solo de su fila → el total es el mismo para
+    cualquier partición en lotes y se suma sin error en int64.
+    """
+    with np.errstate(invalid="ignore", over="ignore"):
+        cantidad_invalida = es_conduit & (cantidad > UMBRAL_ML)
+        precio_invalido   = precio > UMBRAL_PU
+        escala = np.where(demolido, factor_demolicion, np.where(nuevo, 1.0, 0.0))
+        bruto  = cantidad * precio * escala
+        valido = np.isfinite(bruto) & ~cantidad_invalida & ~precio_invalido
+        desborde = valido & (np.abs(bruto) >= LIMITE_PESOS)
+        pesos = np.rint(np.where(valido & ~desborde, bruto, 0.0)).astype(np.int64)
+    costo_nuevo      = np.where(nuevo, pesos, 0)
+    costo_demolicion = np.where(demolido, pesos, 0)
+    return dict(costo_nuevo=costo_nuevo, costo_demolicion=costo_demolicion,
+                costo_total=costo_nuevo + costo_demolicion,
+                cantidad_invalida=cantidad_invalida, precio_invalido=precio_invalido,
+                desborde=desborde)
+
+
+def calcular_costos(df: pd.DataFrame, factor_demolicion: float = 0.25,
+                    verbose: bool = True) -> pd.DataFrame:
     """
     Calcula los costos según el estado de cada elemento.
 
@@ -327,40 +289,55 @@ def calcular_costos(df: pd.DataFrame, factor_demolicion: float = 0.25) -> pd.Dat
     - DEMOLIDO→ costo_demolicion = cantidad × precio_unitario × factor_demolicion
     - PERSISTENTE → ambos costos = 0 (no genera inversión nueva)
 
-    Incluye validación de datos para evitar overflows por errores de unidades en Revit.
+    Los costos son pesos enteros (int64) calculados por costos_en_pesos.
+    Las cantidades y precios imposibles (UMBRAL_ML, UMBRAL_PU) se anulan
+    y se marcan en dato_corregido; no se eliminan filas.
+    Con verbose=False no se imprime nada (cálculo por lotes).
     """
-    df = _validar_y_limpiar(df)
-
-    # Inicializar columnas en cero
-    df["costo_nuevo"]      = 0.0
-    df["costo_demolicion"] = 0.0
-
-    mask_nuevo    = df["estado"] == "NUEVO"
-    mask_demolido = df["estado"] == "DEMOLIDO"
-
-    df.loc[mask_nuevo, "costo_nuevo"] = (
-        (df.loc[mask_nuevo, "cantidad"] * df.loc[mask_nuevo, "precio_unitario"])
-        .fillna(0.0)
-    )
-    df.loc[mask_demolido, "costo_demolicion"] = (
-        (df.loc[mask_demolido, "cantidad"]
-         * df.loc[mask_demolido, "precio_unitario"]
-         * factor_demolicion)
-        .fillna(0.0)
-    )
+    df = df.copy(deep=False)            # copy-on-write: solo se copian las columnas que cambian
+    if "dato_corregido" not in df.columns:
+        df["dato_corregido"] = False
 
-    df["costo_total"] = df["costo_nuevo"] + df["costo_demolicion"]
+    # ── Coerción de tipos ──
+    df["cantidad"]        = pd.to_numeric(df["cantidad"],        errors="coerce")
+    df["precio_unitario"] = pd.to_numeric(df["precio_unitario"], errors="coerce")
 
-    # Redondear costos a pesos enteros (COP)
-    df["costo_nuevo"] = df["costo_nuevo"].round(0)
-    df["costo_demolicion"] = df["costo_demolicion"].round(0)
-    df["costo_total"] = df["costo_total"].round(0)
+    r = costos_en_pesos(
+        (df["categoria"] == "Conduits").to_numpy(dtype=bool, na_value=False),
+        (df["estado"] == "NUEVO").to_numpy(dtype=bool, na_value=False),
+        (df["estado"] == "DEMOLIDO").to_numpy(dtype=bool, na_value=False),
+        df["cantidad"].to_numpy(dtype="float64", na_value=np.nan),
+        df["precio_unitario"].to_numpy(dtype="float64", na_value=np.nan),
+        factor_demolicion)
+
+    # ── Datos imposibles: se anulan y quedan marcados para auditoría ──
+    for mascara, columna, mensaje in (
+            (r["cantidad_invalida"], "cantidad",
+             f"conduits con longitud > {UMBRAL_ML} m — posible error de unidades en Revit"),
+            (r["precio_invalido"], "precio_unitario",
+             "elementos con precio_unitario > $5 000 M COP — se anulan")):
+        if mascara.any():
+            if verbose:
+                print(f"\n  ⚠️  {mascara.sum()} {mensaje}")
+                if columna == "cantidad":
+                    print(df[mascara][["id","family","type","diametro","cantidad"]].head(5).to_string(index=False))
+            df.loc[mascara, columna] = np.nan
+            df.loc[mascara, "dato_corregido"] = True
+    if r["desborde"].any():
+        if verbose:
+            print(f"\n  ⚠️  {r['desborde'].sum()} elementos con costo > 2^53 COP — se dejan en 0")
+        df.loc[r["desborde"], "dato_corregido"] = True
+
+    df["costo_nuevo"]      = r["costo_nuevo"]
+    df["costo_demolicion"] = r["costo_demolicion"]
+    df["costo_total"]      = r["costo_total"]
 
     # Reporte de rango para auditoría
-    print(f"  📊 costo_total por elemento → "
-          f"min=${df['costo_total'].min():,.0f}  "
-          f"max=${df['costo_total'].max():,.0f}  "
-          f"suma=${df['costo_total'].sum():,.0f}")
+    if verbose:
+        print(f"  📊 costo_total por elemento → "
+              f"min=${df['costo_total'].min():,.0f}  "
+              f"max=${df['costo_total'].max():,.0f}  "
+              f"suma=${df['costo_total'].sum():,.0f}")
 
     return df
 
@@ -369,35 +346,67 @@ def calcular_costos(df: pd.DataFrame, factor_demolicion: float = 0.25) -> pd.Dat
 # 6. CONSTRUCCIÓN FINAL DEL DATAFRAME MAESTRO
 # ─────────────────────────────────────────────────────────
 
-def construir_dataframe_maestro(rutas: dict,
-                                 factor_demolicion: float = FACTOR_DEMOLICION
-                                 ) -> pd.DataFrame:
+# Archivos fuente (inicial, final) y función de procesamiento de cada categoría
+CATEGORIAS = {
+    "Conduits": ("conduits_inicial", "conduits_final", procesar_conduits),
+    "Fittings": ("fittings_inicial", "fittings_final", procesar_fittings),
+    "Fixtures": ("fixtures_inicial", "fixtures_final", procesar_fixtures),
+}
+
+
+def procesar_categorias(rutas: dict, categorias=None, progreso=None) -> dict:
     """
-    Función principal. Ejecuta todo el pipeline y retorna
-    el DataFrame Maestro Consolidado listo para el dashboard.
+    Carga y procesa solo las categorías indicadas (por defecto todas).
+    Retorna {categoria: DataFrame procesado}. Permite reconstrucciones
+    incrementales: si solo cambió el Excel de Fittings, solo se relee ese.
     """
+    categorias = list(CATEGORIAS) if categorias is None else list(categorias)
+    if not categorias:
+        return {}
+
     print("\n📂 Cargando archivos...")
-    datos = cargar_datos(rutas)
+    nombres = [n for cat in categorias for n in CATEGORIAS[cat][:2]]
+    datos = cargar_datos({n: rutas[n] for n in nombres}, progreso, rango=(0.0, 0.6))
 
     print("\n🔧 Procesando categorías...")
-    df_conduits = procesar_conduits(datos["conduits_inicial"], datos["conduits_final"])
-    print(f"  ✓ Conduits  → {len(df_conduits):,} registros")
+    parciales = {}
+    for i, cat in enumerate(categorias):
+        _reportar(progreso, f"Procesando {cat}", 0.6 + 0.2 * i / len(categorias))
+        inicial, final, procesar = CATEGORIAS[cat]
+        parciales[cat] = procesar(datos[inicial], datos[final])
+        print(f"  ✓ {cat:9s} → {len(parciales[cat]):,} registros")
+    return parciales
+
 
-    df_fittings = procesar_fittings(datos["fittings_inicial"], datos["fittings_final"])
-    print(f"  ✓ Fittings  → {len(df_fittings):,} registros")
+def construir_dataframe_maestro(rutas: dict,
+                                 factor_demolicion: float = FACTOR_DEMOLICION,
+                                 parciales: dict = None,
+                                 progreso=None
+                                 ) -> pd.DataFrame:
+    """
+    Función principal. Ejecuta todo el pipeline y retorna
+    el DataFrame Maestro Consolidado listo para el dashboard.
 
-    df_fixtures = procesar_fixtures(datos["fixtures_inicial"], datos["fixtures_final"])
-    print(f"  ✓ Fixtures  → {len(df_fixtures):,} registros")
+    `parciales` (opcional) trae categorías ya procesadas en una
+    construcción anterior — {categoria: DataFrame}; solo se procesan
+    las que falten.
+    `progreso(etapa, fraccion)` (opcional) recibe el avance por etapa.
+    """
+    parciales = dict(parciales or {})
+    faltantes = [cat for cat in CATEGORIAS if cat not in parciales]
+    parciales.update(procesar_categorias(rutas, faltantes, progreso))
 
     # Unir las 3 categorías
-    df_consolidado = pd.concat([df_conduits, df_fittings, df_fixtures],
+    df_consolidado = pd.concat([parciales[cat] for cat in CATEGORIAS],
                                 ignore_index=True)
     df_consolidado["id"] = df_consolidado.index + 1  # ID único
 
     print(f"\n🔗 Total elementos consolidados: {len(df_consolidado):,}")
 
     print("\n💲 Asignando precios del maestro...")
-    maestro_prep = preparar_maestro(datos["maestro_precios"])
+    _reportar(progreso, "Asignando precios", 0.8)
+    df_precios = cargar_datos({"maestro_precios": rutas["maestro_precios"]})["maestro_precios"]
+    maestro_prep = preparar_maestro(df_precios)
     df_consolidado = asignar_precios(df_consolidado, maestro_prep)
 
     sin_precio = df_consolidado[~df_consolidado["precio_encontrado"]]
@@ -408,7 +417,17 @@ def construir_dataframe_maestro(rutas: dict,
     else:
         print("  ✓ Todos los elementos tienen precio asignado")
 
+    # Cantidades atípicas para su categoría / tipo / diámetro (ver atipicos.py)
+    if ANULAR_ATIPICOS:
+        df_consolidado = anular_atipicos(df_consolidado)
+    else:
+        n_atipicos = int(detectar_atipicos(df_consolidado).sum())
+        if n_atipicos > 0:
+            print(f"\n  📏 {n_atipicos:,} elementos con cantidad atípica para su tipo y diámetro "
+                  f"(se reportan en Integridad del Modelo)")
+
     print(f"\n💰 Calculando costos (factor demolición = {factor_demolicion*100:.0f}%)...")
+    _reportar(progreso, "Calculando costos", 0.85)
     df_consolidado = calcular_costos(df_consolidado, factor_demolicion)
 
     # Ordenar columnas finales
@@ -425,6 +444,9 @@ def construir_dataframe_maestro(rutas: dict,
     if "dato_corregido" not in df_consolidado.columns:
         df_consolidado["dato_corregido"] = False
     df_consolidado = df_consolidado[columnas_orden]
+    # Unidad inferida de cada archivo de longitudes (auditoría, ver unidades_longitud.py)
+    df_consolidado.attrs["unidades_longitud"] = [
+        d for cat in CATEGORIAS for d in parciales[cat].attrs.get("unidades_longitud", [])]
 
     return df_consolidado
 
@@ -0,0 +1,125 @@
+"""
+=========================================================
+SISTEMA DE ANÁLISIS BIM – TRAMO 1 | Metro 80, Medellín
+=========================================================
+Canonización de textos de Revit y del maestro de precios
+
+El join con el maestro depende de textos exactos: `1"`, `1 "`, `1 in`,
+`25 mm` y `1”` son el mismo diámetro pero no la misma clave. Aquí cada
+texto se lleva a una forma canónica con reglas configurables:
+
+  - espacios   : recorta y colapsa espacios internos
+  - comillas   : ” ″ '' → "   y   ’ ′ → '
+  - medidas    : tamaños comerciales en pulgadas o mm → `N"` (o `N M/D"`),
+                 p. ej. `1 in`, `1pulg`, `25 mm`, `27mm` → `1"`;
+                 `4"ø - 4"ø` → `4"ø-4"ø`
+  - mayusculas : casefold (solo para las claves de unión; lo que se
+                 muestra en el dashboard conserva mayúsculas)
+
+Las reglas se aplican SOLO a los valores distintos de cada columna
+(pd.factorize) y el resultado se guarda en una tabla memo por proceso:
+las reconstrucciones siguientes solo canonizan textos nunca vistos.
+El costo escala con los valores distintos, no con las filas.
+=========================================================
+"""
+
+import re
+import threading
+from fractions import Fraction
+
+import numpy as np
+import pandas as pd
+
+REGLAS_TEXTO    = ("espacios", "comillas")
+REGLAS_DIAMETRO = ("espacios", "comillas", "medidas")
+REGLAS_CLAVE    = ("mayusculas",)
+
+# Tamaño comercial en mm → pulgadas: diámetro nominal (DN) y designador
+# métrico de tubería conduit (NTC 979 / NEC)
+PULGADAS_POR_MM = {
+    15: Fraction(1, 2), 16: Fraction(1, 2), 20: Fraction(3, 4), 21: Fraction(3, 4),
+    25: Fraction(1),    27: Fraction(1),    32: Fraction(5, 4), 35: Fraction(5, 4),
+    40: Fraction(3, 2), 41: Fraction(3, 2), 50: Fraction(2),    53: Fraction(2),
+    63: Fraction(5, 2), 65: Fraction(5, 2), 78: Fraction(3),    80: Fraction(3),
+    90: Fraction(7, 2), 91: Fraction(7, 2), 100: Fraction(4),   103: Fraction(4),
+    125: Fraction(5),   129: Fraction(5),   150: Fraction(6),   155: Fraction(6),
+}
+
+_COMILLAS = str.maketrans({"”": '"', "“": '"', "″": '"', "’": "'", "′": "'"})
+_MEDIDA = re.compile(
+    r"(?P<num>\d+(?:[.,]\d+)?(?:[\s-]+\d+/\d+)?|\d+/\d+)\s*"
+    r"(?P<unidad>mm\b|pulgadas\b|pulg\b|in\b|\"|'')",
+    re.IGNORECASE)
+_RANGO = re.compile(r"(?<=[\"ø])\s*-\s*(?=\d)")
+
+_MEMO = {}                       # (reglas, texto) → texto canónico
+_LOCK = threading.Lock()
+
+
+# ─────────────────────────────────────────────────────────
+# 1. REGLAS
+# ─────────────────────────────────────────────────────────
+def _a_fraccion(numero: str) -> Fraction:
+    partes = re.split(r"[\s-]+", numero.replace(",", ".").strip())
+    return sum((Fraction(p).limit_denominator(16) for p in partes), Fraction(0))
+
+
+def _pulgadas(fraccion: Fraction) -> str:
+    entero, resto = divmod(fraccion, 1)
+    if resto == 0:
+        return f'{entero}"'
+    return f'{entero} {resto}"' if entero else f'{resto}"'
+
+
+def _medida_canonica(coincidencia) -> str:
+    unidad = coincidencia["unidad"].lower()
+    valor = _a_fraccion(coincidencia["num"])
+    if unidad == "mm":
+        pulgadas = PULGADAS_POR_MM.get(int(valor)) if valor.denominator == 1 else None
+        return _pulgadas(pulgadas) if pulgadas is not None else coincidencia[0]
+    return _pulgadas(valor)
+
+
+def canonizar_valor(texto: str, reglas: tuple) -> str:
+    """Aplica `reglas` (en orden) a un texto. Sin memo: usar canonizar()."""
+    if "espacios" in reglas:
+        texto = " ".join(texto.split())
+    if "comillas" in reglas:
+        texto = texto.translate(_COMILLAS).replace("''", '"')
+    if "medidas" in reglas:
+        texto = _MEDIDA.sub(_medida_canonica, texto)
+        texto = _RANGO.sub("-", texto)          # 4"ø - 4"ø → 4"ø-4"ø
+    if "mayusculas" in reglas:
+        texto = texto.casefold()
+    return texto
+
+
+# ─────────────────────────────────────────────────────────
+# 2. CANONIZACIÓN POR VALORES DISTINTOS
+# ─────────────────────────────────────────────────────────
+def canonizar(serie: pd.Series, reglas: tuple = REGLAS_TEXTO) -> pd.Series:
+    """
+    Versión canónica de `serie` como texto (NaN → "nan", igual que
+    astype(str)). Solo se canonizan los valores distintos, con memo.
+    """
+    codigos, unicos = pd.factorize(serie, use_na_sentinel=False)
+    canonicos = np.empty(len(unicos), dtype=object)
+    with _LOCK:
+        for i, valor in enumerate(unicos):
+            clave = (reglas, str(valor))
+            if clave not in _MEMO:
+                _MEMO[clave] = canonizar_valor(clave[1], reglas)
+            canonicos[i] = _MEMO[clave]
+    return pd.Series(canonicos[codigos], index=serie.index, dtype="str")
+
+
+def clave_union(*partes: pd.Series) -> pd.Series:
+    """Clave de unión con el maestro: partes canónicas unidas por "|" y en casefold."""
+    clave = partes[0].astype(str)
+    for parte in partes[1:]:
+        clave = clave + "|" + parte.astype(str)
+    return canonizar(clave, REGLAS_CLAVE)
+
+
+def tamano_memo() -> int:
+    return len(_MEMO)
@@ -0,0 +1,191 @@
+"""
+=========================================================
+SISTEMA DE ANÁLISIS BIM – TRAMO 1 | Metro 80, Medellín
+=========================================================
+Cantidades de obra (presupuesto) por ítem del maestro de precios
+
+Un ítem es una entrada del maestro de precios, con la misma clave con
+la que asignar_precios le dio precio a cada elemento:
+  - Conduits / Fittings → Tipo|Diámetro
+  - Fixtures            → Familia
+
+Por tramo × estado (NUEVO = construcción, DEMOLIDO = demolición) y
+ítem: cantidad, unidad, precio unitario, factor (1 ó el de demolición),
+precio aplicado, subtotal y número de elementos.
+
+Una sola agregación vectorizada sobre los elementos (groupby de las
+columnas categóricas), y luego se juntan las filas del mismo ítem sobre
+el resultado (pocas filas). El subtotal es la suma de los costos en
+pesos enteros de cada elemento (calcular_costos), así que los totales
+concilian al peso con los KPIs económicos (calcular_kpis).
+
+La exportación escribe fila a fila: CSV por bloques y XLSX con el modo
+write_only de openpyxl (memoria constante).
+=========================================================
+"""
+
+import csv
+import io
+
+import numpy as np
+import pandas as pd
+
+from canonizacion import clave_union
+from simulacion_precios import CAMPO_POR_CATEGORIA
+
+ESTADOS_OBRA = {"NUEVO": "Construcción", "DEMOLIDO": "Demolición"}
+COLUMNAS_OBRA = ["categoria", "family", "type", "diametro", "estado", "cantidad", "unidad",
+                 "precio_unitario", "precio_encontrado", "costo_nuevo", "costo_demolicion"]
+ENCABEZADOS = {
+    "tramo"          : "Tramo",
+    "capitulo"       : "Capítulo",
+    "item"           : "Ítem",
+    "categoria"      : "Categoría",
+    "descripcion"    : "Descripción (ítem del maestro)",
+    "unidad"         : "Unidad",
+    "cantidad"       : "Cantidad",
+    "precio_unitario": "Precio Unitario (COP)",
+    "factor"         : "Factor",
+    "precio_aplicado": "Precio Aplicado (COP)",
+    "subtotal"       : "Subtotal (COP)",
+    "elementos"      : "Elementos",
+}
+FILAS_POR_BLOQUE = 10_000
+DECIMALES_CANTIDAD = 2           # cm / centésimas de unidad (no afecta los subtotales)
+
+
+# ─────────────────────────────────────────────────────────
+# 1. AGREGACIÓN
+# ─────────────────────────────────────────────────────────
+def agregar_elementos(df: pd.DataFrame, tramo: str = None) -> pd.DataFrame:
+    """
+    Paso vectorizado sobre los elementos (con costos): un groupby por las
+    columnas que forman la clave del ítem. El resultado es sumable: los
+    parciales de varios lotes se combinan con combinar_parciales().
+    """
+    df = df[df["estado"].isin(list(ESTADOS_OBRA))]
+    base = pd.DataFrame({
+        "tramo"    : df["tramo"] if "tramo" in df.columns else tramo,
+        **{c: df[c] for c in ["categoria", "family", "type", "diametro", "estado", "unidad"]},
+        "precio_unitario": df["precio_unitario"].where(df["precio_encontrado"].astype(bool)),
+        "cantidad" : df["cantidad"],
+        "subtotal" : df["costo_nuevo"].fillna(0).astype("int64") + df["costo_demolicion"].fillna(0).astype("int64"),
+        "elementos": np.ones(len(df), dtype="int64"),
+    })
+    claves = ["tramo", "categoria", "family", "type", "diametro", "estado", "unidad", "precio_unitario"]
+    return (base.groupby(claves, observed=True, dropna=False, sort=False)
+                [["cantidad", "subtotal", "elementos"]].sum().reset_index())
+
+
+def combinar_parciales(parciales: list) -> pd.DataFrame:
+    claves = ["tramo", "categoria", "family", "type", "diametro", "estado", "unidad", "precio_unitario"]
+    todos = pd.concat(parciales, ignore_index=True)
+    for c in claves:
+        todos[c] = todos[c].astype(object)
+    return (todos.groupby(claves, dropna=False, sort=False)[["cantidad", "subtotal", "elementos"]]
+                 .sum().reset_index())
+
+
+def cantidades_por_item(parcial: pd.DataFrame, factor_demolicion: float) -> pd.DataFrame:
+    """Junta las filas del mismo ítem del maestro y arma la tabla final (pocas filas)."""
+    p = parcial.copy()
+    for c in ["tramo", "categoria", "family", "type", "diametro", "estado", "unidad"]:
+        p[c] = p[c].astype(object).where(p[c].notna(), "").astype(str)
+    por_tipo_diam = p["categoria"].map(CAMPO_POR_CATEGORIA).fillna("key_familia") == "key_tipo_diam"
+    p["clave"] = clave_union(p["type"], p["diametro"]).where(por_tipo_diam, clave_union(p["family"]))
+    p["descripcion"] = (p["type"] + " | " + p["diametro"]).where(por_tipo_diam, p["family"])
+
+    obra = (p.groupby(["tramo", "estado", "categoria", "clave", "precio_unitario"], dropna=False, sort=False)
+             .agg(descripcion=("descripcion", "first"), unidad=("unidad", "first"),
+                  cantidad=("cantidad", "sum"), subtotal=("subtotal", "sum"),
+                  elementos=("elementos", "sum"))
+             .reset_index())
+    obra["capitulo"] = obra["estado"].map(ESTADOS_OBRA)
+    obra["factor"] = np.where(obra["estado"] == "DEMOLIDO", factor_demolicion, 1.0)
+    obra["precio_aplicado"] = obra["precio_unitario"] * obra["factor"]
+    obra["subtotal"] = obra["subtotal"].astype("int64")
+    obra["cantidad"] = obra["cantidad"].round(DECIMALES_CANTIDAD)
+
+    orden_estado = {e: i for i, e in enumerate(ESTADOS_OBRA)}
+    obra = obra.sort_values(["tramo", "estado", "categoria", "descripcion"],
+                            key=lambda s: s.map(orden_estado) if s.name == "estado" else s)
+    obra["item"] = obra.groupby(["tramo", "estado"], sort=False).cumcount() + 1
+    return obra[list(ENCABEZADOS)].reset_index(drop=True)
+
+
+def cantidades_obra(df: pd.DataFrame, factor_demolicion: float, tramo: str = None) -> pd.DataFrame:
+    """Cantidades de obra de un maestro con costos (en memoria)."""
+    return cantidades_por_item(agregar_elementos(df, tramo), factor_demolicion)
+
+
+def cantidades_obra_portafolio(factor_demolicion: float, tramos: list = None) -> pd.DataFrame:
+    """Cantidades de obra de varios tramos, leyendo el dataset particionado por lotes."""
+    from build_maestro import calcular_costos
+    from kpis import lotes_dataset
+    parciales = [agregar_elementos(calcular_costos(lote, factor_demolicion, verbose=False))
+                 for lote in lotes_dataset(tramos, columnas=COLUMNAS_OBRA)]
+    return cantidades_por_item(combinar_parciales(parciales), factor_demolicion)
+
+
+# ─────────────────────────────────────────────────────────
+# 2. CONCILIACIÓN CON LOS KPIs
+# ─────────────────────────────────────────────────────────
+def conciliar(obra: pd.DataFrame, kpi_eco: dict) -> dict:
+    """
+    Diferencias (en pesos) entre los subtotales y los KPIs económicos.
+    Todas deben ser 0.
+    """
+    por_estado = obra.groupby("capitulo")["subtotal"].sum()
+    construccion = int(por_estado.get(ESTADOS_OBRA["NUEVO"], 0))
+    demolicion   = int(por_estado.get(ESTADOS_OBRA["DEMOLIDO"], 0))
+    return dict(costo_nuevo=construccion - int(kpi_eco["costo_nuevo"]),
+                costo_demolicion=demolicion - int(kpi_eco["costo_demolicion"]),
+                inversion_total=construccion + demolicion - int(kpi_eco["inversion_total"]))
+
+
+# ─────────────────────────────────────────────────────────
+# 3. EXPORTACIÓN POR BLOQUES
+# ─────────────────────────────────────────────────────────
+def _filas(obra: pd.DataFrame):
+    """Filas de la tabla como tipos de Python (None para precios faltantes), por bloques."""
+    for inicio in range(0, len(obra), FILAS_POR_BLOQUE):
+        bloque = obra.iloc[inicio:inicio + FILAS_POR_BLOQUE].astype(object)
+        yield from bloque.where(bloque.notna(), None).itertuples(index=False, name=None)
+
+
+def escribir_csv(obra: pd.DataFrame, destino):
+    """Escribe la tabla en `destino` (archivo de texto abierto) fila a fila."""
+    escritor = csv.writer(destino)
+    escritor.writerow(ENCABEZADOS.values())
+    escritor.writerows(_filas(obra))
+
+
+def escribir_xlsx(obra: pd.DataFrame, destino, totales: bool = True):
+    """
+    Escribe la tabla en `destino` (ruta o archivo binario) con el libro
+    write_only de openpyxl: las filas no se guardan en memoria.
+    """
+    from openpyxl import Workbook
+    libro = Workbook(write_only=True)
+    hoja = libro.create_sheet("Cantidades de Obra")
+    hoja.append(list(ENCABEZADOS.values()))
+    for fila in _filas(obra):
+        hoja.append(list(fila))
+    if totales:
+        hoja.append([])
+        col_subtotal = list(ENCABEZADOS).index("subtotal")
+        for capitulo, subtotal in obra.groupby("capitulo", sort=False)["subtotal"].sum().items():
+            hoja.append([None] * (col_subtotal - 1) + [f"Total {capitulo}", int(subtotal)])
+        hoja.append([None] * (col_subtotal - 1) + ["TOTAL", int(obra["subtotal"].sum())])
+    libro.save(destino)
+
+
+def exportar(obra: pd.DataFrame, formato: str = "xlsx") -> bytes:
+    """Bytes del archivo (para st.download_button)."""
+    if formato == "csv":
+        texto = io.StringIO()
+        escribir_csv(obra, texto)
+        return texto.getvalue().encode("utf-8-sig")     # BOM → Excel abre bien las tildes
+    binario = io.BytesIO()
+    escribir_xlsx(obra, binario)
+    return binario.getvalue()
@@ -0,0 +1,175 @@
+"""
+=========================================================
+SISTEMA DE ANÁLISIS BIM – TRAMO 1 | Metro 80, Medellín
+=========================================================
+Comparación entre dos versiones (snapshots) del DataFrame maestro
+
+Las tablas de Revit no traen ElementId, así que un elemento se
+identifica por su clave (categoria, family, type, diametro) más su
+ordinal dentro de esa clave. La comparación se hace en dos pasadas,
+ambas con hash joins (tiempo lineal):
+
+  1. Filas idénticas: hash de la fila normalizada (clave + atributos)
+     + ordinal → se emparejan y quedan fuera del reporte
+  2. Filas restantes: hash de la clave + ordinal → las parejas son
+     elementos MODIFICADOS; lo que sobra en la versión anterior son
+     ELIMINADOS y lo que sobra en la nueva son AGREGADOS
+
+Los deltas de cantidad y costo por categoría, tipo y diámetro se
+obtienen agregando cada versión una sola vez y uniendo los agregados.
+=========================================================
+"""
+
+import numpy as np
+import pandas as pd
+
+from build_maestro import calcular_costos
+
+CLAVE_ELEMENTO = ["categoria", "family", "type", "diametro"]
+ATRIBUTOS      = ["nombre_sistema", "categoria_sistema", "estado", "cantidad", "precio_unitario"]
+AGRUPACION     = ["categoria", "type", "diametro"]
+DECIMALES_CANTIDAD = 3          # diferencias < 1 mm no cuentan como cambio
+
+_PRIMO = np.uint64(0x100000001B3)
+_HASH_VACIO = pd.util.hash_array(np.array([""], dtype=object))[0]
+
+
+# ─────────────────────────────────────────────────────────
+# 1. HASH DE FILAS NORMALIZADAS
+# ─────────────────────────────────────────────────────────
+def _normalizar_texto(valores) -> np.ndarray:
+    serie = pd.Series(valores, dtype=object)
+    return serie.where(serie.notna(), "").astype(str).str.strip().to_numpy(dtype=object)
+
+
+def _hash_columna(serie: pd.Series) -> np.ndarray:
+    if isinstance(serie.dtype, pd.CategoricalDtype):
+        # Se hashean solo las categorías y se reparten por código
+        h_cat = pd.util.hash_array(_normalizar_texto(serie.cat.categories))
+        codigos = serie.cat.codes.to_numpy()
+        return np.where(codigos >= 0, h_cat[np.maximum(codigos, 0)], _HASH_VACIO)
+    if serie.dtype.kind == "f":
+        valores = np.round(serie.to_numpy(), DECIMALES_CANTIDAD) + 0.0   # -0.0 → 0.0
+        return pd.util.hash_array(np.nan_to_num(valores, nan=-1.0))
+    if serie.dtype.kind in "biu":
+        return pd.util.hash_array(serie.to_numpy())
+    return pd.util.hash_array(_normalizar_texto(serie.to_numpy()))
+
+
+def hash_filas(df: pd.DataFrame, columnas: list) -> np.ndarray:
+    """Hash uint64 por fila de `columnas` (texto sin espacios, NaN = vacío, cantidades redondeadas)."""
+    h = np.zeros(len(df), dtype="uint64")
+    with np.errstate(over="ignore"):
+        for col in columnas:
+            h = (h * _PRIMO) ^ _hash_columna(df[col])
+    return h
+
+
+def emparejar_hashes(h_a: np.ndarray, h_b: np.ndarray):
+    """
+    Hash join multiconjunto: la k-ésima fila con hash h en A se empareja
+    con la k-ésima fila con hash h en B. Retorna (posiciones_a, posiciones_b).
+    """
+    a = pd.DataFrame({"h": h_a, "pos_a": np.arange(len(h_a))})
+    b = pd.DataFrame({"h": h_b, "pos_b": np.arange(len(h_b))})
+    a["n"] = a.groupby("h", sort=False).cumcount()
+    b["n"] = b.groupby("h", sort=False).cumcount()
+    pares = a.merge(b, on=["h", "n"], how="inner", sort=False)
+    return pares["pos_a"].to_numpy(), pares["pos_b"].to_numpy()
+
+
+# ─────────────────────────────────────────────────────────
+# 2. COMPARACIÓN
+# ─────────────────────────────────────────────────────────
+def _sin(n: int, posiciones: np.ndarray) -> np.ndarray:
+    mascara = np.ones(n, dtype=bool)
+    mascara[posiciones] = False
+    return np.flatnonzero(mascara)
+
+
+def _por_grupo(df: pd.DataFrame, sufijo: str) -> pd.DataFrame:
+    g = (df.groupby(AGRUPACION, observed=True, dropna=False)
+           .agg(**{f"elementos{sufijo}": ("id", "count"),
+                   f"cantidad{sufijo}": ("cantidad", "sum"),
+                   f"costo{sufijo}": ("costo_total", "sum")})
+           .reset_index())
+    for col in AGRUPACION:
+        g[col] = _normalizar_texto(g[col].to_numpy())
+    return g
+
+
+def _conteo_por_grupo(df: pd.DataFrame, nombre: str) -> pd.DataFrame:
+    g = df[AGRUPACION].copy()
+    for col in AGRUPACION:
+        g[col] = _normalizar_texto(g[col].to_numpy())
+    return g.groupby(AGRUPACION, sort=False).size().rename(nombre).reset_index()
+
+
+def comparar_snapshots(df_antes: pd.DataFrame, df_despues: pd.DataFrame,
+                       factor_demolicion: float = None) -> dict:
+    """
+    Compara dos versiones del maestro. Con `factor_demolicion` los costos
+    de ambas se recalculan con ese factor; si no, se usan los guardados.
+
+    Retorna un dict con:
+      - resumen    : conteos y deltas totales
+      - por_grupo  : deltas por categoria/type/diametro (solo grupos con cambios)
+      - agregados, eliminados : filas completas
+      - modificados: clave del elemento + atributos antes/después
+    """
+    if factor_demolicion is not None:
+        df_antes   = calcular_costos(df_antes, factor_demolicion, verbose=False)
+        df_despues = calcular_costos(df_despues, factor_demolicion, verbose=False)
+
+    # ── Pasada 1: filas idénticas ──
+    iguales_a, iguales_b = emparejar_hashes(hash_filas(df_antes, CLAVE_ELEMENTO + ATRIBUTOS),
+                                            hash_filas(df_despues, CLAVE_ELEMENTO + ATRIBUTOS))
+    resto_a = _sin(len(df_antes), iguales_a)
+    resto_b = _sin(len(df_despues), iguales_b)
+
+    # ── Pasada 2: mismo elemento, atributos distintos ──
+    antes   = df_antes.iloc[resto_a].reset_index(drop=True)
+    despues = df_despues.iloc[resto_b].reset_index(drop=True)
+    mod_a, mod_b = emparejar_hashes(hash_filas(antes, CLAVE_ELEMENTO), hash_filas(despues, CLAVE_ELEMENTO))
+    eliminados = antes.iloc[_sin(len(antes), mod_a)].reset_index(drop=True)
+    agregados  = despues.iloc[_sin(len(despues), mod_b)].reset_index(drop=True)
+
+    viejo = antes.iloc[mod_a].reset_index(drop=True)
+    nuevo = despues.iloc[mod_b].reset_index(drop=True)
+    modificados = pd.DataFrame({c: nuevo[c].astype(object) for c in CLAVE_ELEMENTO})
+    distintos = pd.DataFrame({col: _hash_columna(viejo[col]) != _hash_columna(nuevo[col])
+                              for col in ATRIBUTOS})
+    for col in ATRIBUTOS:
+        modificados[f"{col}_antes"]   = viejo[col].astype(object)
+        modificados[f"{col}_despues"] = nuevo[col].astype(object)
+    modificados.insert(len(CLAVE_ELEMENTO), "campos_modificados",
+                       distintos.dot(distintos.columns + ", ").str.rstrip(", "))
+    modificados["delta_cantidad"] = nuevo["cantidad"].to_numpy() - viejo["cantidad"].to_numpy()
+    modificados["delta_costo"]    = nuevo["costo_total"].to_numpy() - viejo["costo_total"].to_numpy()
+
+    # ── Deltas por categoría / tipo / diámetro ──
+    por_grupo = _por_grupo(df_antes, "_antes").merge(_por_grupo(df_despues, "_despues"),
+                                                     on=AGRUPACION, how="outer")
+    for nombre, filas in (("agregados", agregados), ("eliminados", eliminados), ("modificados", nuevo)):
+        por_grupo = por_grupo.merge(_conteo_por_grupo(filas, nombre), on=AGRUPACION, how="left")
+    por_grupo = por_grupo.fillna(0)
+    for col in ("elementos_antes", "elementos_despues", "agregados", "eliminados", "modificados"):
+        por_grupo[col] = por_grupo[col].astype(int)
+    por_grupo["delta_cantidad"] = por_grupo["cantidad_despues"] - por_grupo["cantidad_antes"]
+    por_grupo["delta_costo"]    = por_grupo["costo_despues"] - por_grupo["costo_antes"]
+    con_cambios = por_grupo[["agregados", "eliminados", "modificados"]].sum(axis=1) > 0
+    por_grupo = (por_grupo[con_cambios]
+                 .sort_values("delta_costo", key=np.abs, ascending=False)
+                 .reset_index(drop=True))
+
+    resumen = dict(
+        elementos_antes=len(df_antes), elementos_despues=len(df_despues),
+        sin_cambios=len(iguales_a), agregados=len(agregados),
+        eliminados=len(eliminados), modificados=len(modificados),
+        delta_longitud_conduits=float(
+            df_despues.loc[df_despues["categoria"] == "Conduits", "cantidad"].sum()
+            - df_antes.loc[df_antes["categoria"] == "Conduits", "cantidad"].sum()),
+        delta_costo=float(df_despues["costo_total"].sum() - df_antes["costo_total"].sum()),
+    )
+    return dict(resumen=resumen, por_grupo=por_grupo, agregados=agregados,
+                eliminados=eliminados, modificados=modificados)
@@ -0,0 +1,143 @@
+"""
+=========================================================
+SISTEMA DE ANÁLISIS BIM – TRAMO 1 | Metro 80, Medellín
+=========================================================
+Tablas dinámicas sobre el DataFrame maestro
+
+Motor SQL analítico embebido (DuckDB, en el mismo proceso, sin
+servidor). El maestro se registra como tabla virtual sin copiarlo
+y cada tabla dinámica se resuelve con UNA sola consulta agregada
+(filtros en el WHERE + GROUP BY), en lugar de máscaras de pandas
+encadenadas con marcos intermedios.
+
+DuckDB es opcional: si no está instalado se usa un único groupby
+de pandas con el mismo resultado. Se importa en la primera consulta
+(~40 ms), no al importar este módulo.
+=========================================================
+"""
+
+import importlib.util
+
+import pandas as pd
+
+DUCKDB_INSTALADO = importlib.util.find_spec("duckdb") is not None   # motor opcional
+
+
+# ─────────────────────────────────────────────────────────
+# 1. DIMENSIONES Y MEDIDAS PERMITIDAS
+# Solo se aceptan nombres de esta lista → no hay SQL construido
+# a partir de texto libre del usuario.
+# ─────────────────────────────────────────────────────────
+DIMENSIONES = {
+    "categoria"         : "Categoría",
+    "family"            : "Familia",
+    "type"              : "Tipo",
+    "diametro"          : "Diámetro",
+    "nombre_sistema"    : "Nombre de Sistema",
+    "categoria_sistema" : "Categoría de Sistema",
+    "estado"            : "Estado",
+}
+
+# medida → (etiqueta, expresión SQL, (columna, función) para pandas)
+MEDIDAS = {
+    "elementos"        : ("Elementos",          "COUNT(*)",                 ("id", "count")),
+    "cantidad"         : ("Cantidad",           "SUM(cantidad)",            ("cantidad", "sum")),
+    "costo_nuevo"      : ("Costo Nuevo",        "SUM(costo_nuevo)",         ("costo_nuevo", "sum")),
+    "costo_demolicion" : ("Costo Demolición",   "SUM(costo_demolicion)",    ("costo_demolicion", "sum")),
+    "costo_total"      : ("Costo Total",        "SUM(costo_total)",         ("costo_total", "sum")),
+    "precio_promedio"  : ("Precio Unit. Prom.", "AVG(precio_unitario)",     ("precio_unitario", "mean")),
+}
+
+
+def motor_disponible() -> str:
+    return "DuckDB" if DUCKDB_INSTALADO else "pandas"
+
+
+# ─────────────────────────────────────────────────────────
+# 2. AGREGADO ÚNICO
+# ─────────────────────────────────────────────────────────
+def _validar(dimensiones, medidas, filtros):
+    desconocidas = [d for d in list(dimensiones) + list(filtros) if d not in DIMENSIONES]
+    if desconocidas:
+        raise ValueError(f"Dimensiones no permitidas: {desconocidas}")
+    desconocidas = [m for m in medidas if m not in MEDIDAS]
+    if desconocidas:
+        raise ValueError(f"Medidas no permitidas: {desconocidas}")
+    if not medidas:
+        raise ValueError("Selecciona al menos una medida")
+
+
+def agregar(df: pd.DataFrame, dimensiones: list, medidas: list,
+            filtros: dict = None) -> pd.DataFrame:
+    """
+    Agregado plano: una fila por combinación de `dimensiones`, una
+    columna por medida. `filtros` = {dimension: [valores permitidos]};
+    una lista vacía o None no filtra.
+    """
+    filtros = {d: list(v) for d, v in (filtros or {}).items() if v}
+    _validar(dimensiones, medidas, filtros)
+
+    if DUCKDB_INSTALADO:
+        return _agregar_duckdb(df, dimensiones, medidas, filtros)
+    return _agregar_pandas(df, dimensiones, medidas, filtros)
+
+
+def _agregar_duckdb(df, dimensiones, medidas, filtros):
+    select = [f'"{d}"' for d in dimensiones] + [f'{MEDIDAS[m][1]} AS "{m}"' for m in medidas]
+    where, parametros = [], []
+    for dim, valores in filtros.items():
+        where.append(f'CAST("{dim}" AS VARCHAR) IN ({", ".join("?" * len(valores))})')
+        parametros.extend(str(v) for v in valores)
+
+    sql = f"SELECT {', '.join(select)} FROM maestro"
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    if dimensiones:
+        sql += f" GROUP BY {', '.join(select[:len(dimensiones)])} ORDER BY {', '.join(select[:len(dimensiones)])}"
+
+    import duckdb                   # diferido hasta la primera consulta
+    con = duckdb.connect()          # conexión en memoria por consulta (segura entre hilos)
+    try:
+        con.register("maestro", df)   # vista sobre el DataFrame, sin copiarlo
+        return con.execute(sql, parametros).fetchdf()
+    finally:
+        con.close()
+
+
+def _agregar_pandas(df, dimensiones, medidas, filtros):
+    mascara = pd.Series(True, index=df.index)
+    for dim, valores in filtros.items():
+        mascara &= df[dim].astype(str).isin([str(v) for v in valores])
+    base = df.loc[mascara]
+    agregaciones = {m: MEDIDAS[m][2] for m in medidas}
+    if not dimensiones:
+        return pd.DataFrame([{m: base[c].agg(f) for m, (c, f) in agregaciones.items()}])
+    return (base.groupby(dimensiones, observed=True, dropna=False, sort=True)
+                .agg(**agregaciones).reset_index())
+
+
+# ─────────────────────────────────────────────────────────
+# 3. TABLA DINÁMICA (filas × columnas)
+# ─────────────────────────────────────────────────────────
+def tabla_dinamica(df: pd.DataFrame, filas: list, columnas: list, medidas: list,
+                   filtros: dict = None) -> pd.DataFrame:
+    """
+    Tabla dinámica con las dimensiones `filas` en el eje vertical y
+    `columnas` abiertas horizontalmente. La agregación se hace en una
+    sola pasada sobre el maestro; el reacomodo posterior opera sobre el
+    resultado agregado (pocas filas).
+    """
+    plano = agregar(df, list(filas) + list(columnas), medidas, filtros)
+    for d in list(filas) + list(columnas):
+        plano[d] = plano[d].astype(object).where(plano[d].notna(), "(sin dato)").astype(str)
+    if not columnas or plano.empty:
+        return plano.rename(columns={**DIMENSIONES, **{m: MEDIDAS[m][0] for m in medidas}})
+
+    indice = list(filas) or ["_total"]
+    if not filas:
+        plano["_total"] = "Total"
+    pivote = plano.pivot_table(index=indice, columns=list(columnas), values=list(medidas),
+                               aggfunc="sum", observed=True)
+    pivote.columns = [" · ".join([MEDIDAS[c[0]][0]] + [str(v) for v in c[1:]])
+                      for c in pivote.columns]
+    return pivote.reset_index().rename(columns={**DIMENSIONES, "_total": ""})
@@ -0,0 +1,265 @@
+"""
+=========================================================
+SISTEMA DE ANÁLISIS BIM – TRAMO 1 | Metro 80, Medellín
+=========================================================
+Coordinador de construcción del DataFrame maestro
+
+El pipeline de Excel (construir_dataframe_maestro) NUNCA corre en
+el hilo de una petición del dashboard:
+
+- Un único trabajo en vuelo por tramo (single-flight): si varios
+  visitantes o el vigilante de archivos piden una reconstrucción
+  mientras otra está en curso, se agrupan en una sola ejecución
+  adicional al terminar.
+- Avance por etapa (archivo cargado, categoría procesada, precios,
+  costos, snapshot) consultable desde cualquier sesión.
+- Además del snapshot columnar se escribe el dataset Parquet
+  particionado (dataset_particionado.py) que usan los filtros, y
+  cada versión nueva se registra en el historial (historial.py).
+- Las rutas de las tablas se vuelven a resolver en cada reconstrucción
+  y en cada pasada del vigilante: un .parquet o .txt exportado junto
+  al .xlsx se adopta sin reiniciar el proceso.
+- Mientras se reconstruye se sigue sirviendo el último snapshot
+  bueno; al arrancar el proceso se adopta el último snapshot en
+  disco, así que tras un despliegue la app responde al instante.
+- Precalentamiento: las funciones registradas con
+  registrar_precalentador() (el dashboard registra vistas.precalentar)
+  calculan las vistas por defecto de la huella nueva ANTES de
+  publicarla; para el snapshot adoptado del disco corren en un hilo
+  aparte, sin retrasar la primera respuesta.
+
+Uso como paso de despliegue (precalcula los snapshots):
+    python coordinador.py [Tramo1 ...]
+=========================================================
+"""
+
+import sys
+import threading
+import time
+
+from build_maestro import (CATEGORIAS, construir_dataframe_maestro,
+                           procesar_categorias, rutas_tramo)
+from almacen_datos import ALMACEN, huella_fuentes
+from almacen_columnar import (adjuntar_snapshot, existe_snapshot,
+                              guardar_snapshot, ruta_snapshot, ultimo_snapshot)
+from dataset_particionado import disponible as dataset_disponible, escribir_dataset, huella_dataset
+from historial import registrar_version, ultima_huella
+from vigilante_fuentes import VigilanteFuentes, archivo_completo
+
+
+# Funciones (tramo, huella, df, rutas) que precalculan vistas de un snapshot
+_PRECALENTADORES = []
+
+
+def registrar_precalentador(funcion):
+    """Registra `funcion` para cada snapshot que se publique (una vez por proceso)."""
+    if funcion not in _PRECALENTADORES:
+        _PRECALENTADORES.append(funcion)
+    return funcion
+
+
+class CoordinadorTramo:
+    """
+    Mantiene el snapshot vigente de un tramo y coordina sus reconstrucciones.
+
+    `snapshot_vigente()` retorna (huella, df) sin bloquear nunca; la
+    referencia se reemplaza en una sola asignación cuando termina una
+    reconstrucción, así que cada rerun ve el snapshot viejo o el nuevo,
+    nunca uno a medias.
+    """
+
+    def __init__(self, tramo: str, rutas: dict = None):
+        self.tramo = tramo
+        # Rutas explícitas se respetan; las de la convención se re-resuelven
+        self._resolver = None if rutas else (lambda: rutas_tramo(tramo))
+        self.rutas = rutas or rutas_tramo(tramo)
+        self._vigente = None             # (huella, df)
+        self._parciales = {}             # categoria → (huella de sus Excel, df procesado)
+        self._lock = threading.Lock()
+        self._hilo = None
+        self._pendiente = False
+        self._terminado = threading.Event()
+        self.cambios_en_curso = set()
+        self.etapa = None
+        self.fraccion = 0.0
+        self.ultimo_error = None
+        self.ultima_actualizacion = None
+        self.vigilante = None
+
+    # ── Lectura ──
+    def snapshot_vigente(self):
+        return self._vigente
+
+    def estado(self) -> dict:
+        vigente = self._vigente
+        return dict(huella_vigente=vigente[0] if vigente else None,
+                    reconstruyendo=self._hilo is not None,
+                    etapa=self.etapa, fraccion=self.fraccion,
+                    cambios_en_curso=sorted(self.cambios_en_curso),
+                    ultima_actualizacion=self.ultima_actualizacion,
+                    ultimo_error=self.ultimo_error)
+
+    # ── Arranque ──
+    def iniciar(self):
+        """
+        Adopta el último snapshot en disco (respuesta inmediata tras un
+        despliegue o reinicio), pide una reconstrucción en segundo plano si
+        los Excel no coinciden con él y arranca el vigilante de archivos.
+        """
+        huella_disco = ultimo_snapshot(self.tramo)
+        if huella_disco is not None:
+            df = adjuntar_snapshot(ruta_snapshot(self.tramo, huella_disco))
+            self._publicar(huella_disco, df)
+            if _PRECALENTADORES:
+                threading.Thread(target=self._precalentar, args=(huella_disco, df),
+                                 name=f"precalentamiento-{self.tramo}", daemon=True).start()
+        self._actualizar_rutas()
+        if huella_disco != huella_fuentes(self.rutas) or not self._derivados_al_dia(huella_disco):
+            self.solicitar()
+        if self.vigilante is None:
+            self.vigilante = VigilanteFuentes(self.rutas, self.solicitar, resolver=self._resolver)
+            self.vigilante.start()
+        return self
+
+    # ── Solicitudes (no bloquean) ──
+    def solicitar(self, cambios=()):
+        """
+        Pide una reconstrucción. Si ya hay una en curso no se lanza otra:
+        se marca como pendiente y se repite una sola vez al terminar.
+        """
+        with self._lock:
+            self.cambios_en_curso.update(cambios)
+            self._pendiente = True
+            if self._hilo is None:           # el trabajador lo anula al salir (bajo el lock)
+                self._terminado.clear()
+                self._hilo = threading.Thread(target=self._trabajar,
+                                              name=f"construccion-{self.tramo}", daemon=True)
+                self._hilo.start()
+
+    def esperar(self, timeout: float = None) -> bool:
+        """Bloquea hasta que no haya trabajos en curso (para scripts y despliegue)."""
+        with self._lock:
+            if self._hilo is None:
+                return True
+        return self._terminado.wait(timeout)
+
+    # ── Trabajador ──
+    def _trabajar(self):
+        while True:
+            with self._lock:
+                if not self._pendiente:
+                    # Se anula bajo el lock: una solicitud que llegue mientras
+                    # este hilo termina de salir lanza otro trabajador
+                    self._hilo = None
+                    self.cambios_en_curso.clear()
+                    self.etapa, self.fraccion = None, 0.0
+                    self._terminado.set()
+                    return
+                self._pendiente = False
+            try:
+                self._construir()
+                self.ultimo_error = None
+            except Exception as e:   # el snapshot anterior sigue vigente
+                self.ultimo_error = f"{type(e).__name__}: {e}"
+                print(f"  ⚠️  Reconstrucción de {self.tramo} fallida — {self.ultimo_error}")
+
+    def _progreso(self, etapa: str, fraccion: float):
+        self.etapa, self.fraccion = etapa, fraccion
+
+    def _dataset_al_dia(self, huella) -> bool:
+        return not dataset_disponible() or huella_dataset(self.tramo) == huella
+
+    def _derivados_al_dia(self, huella) -> bool:
+        """Dataset particionado e historial de versiones corresponden a `huella`."""
+        return self._dataset_al_dia(huella) and ultima_huella(self.tramo) == huella
+
+    def _actualizar_rutas(self):
+        """
+        Re-resuelve las rutas de la convención de nombres. Una tabla
+        nueva en un formato de mayor prioridad se adopta solo cuando
+        está completa; mientras se copia se sigue leyendo la anterior.
+        """
+        if self._resolver is None:
+            return
+        self.rutas = {nombre: ruta if ruta == self.rutas.get(nombre) or archivo_completo(ruta)
+                      else self.rutas.get(nombre, ruta)
+                      for nombre, ruta in self._resolver().items()}
+
+    def _construir(self):
+        self._actualizar_rutas()
+        huella = huella_fuentes(self.rutas)
+        al_dia = self._vigente is not None and self._vigente[0] == huella
+        if al_dia and self._derivados_al_dia(huella):
+            return
+        if al_dia:
+            df = self._vigente[1]
+        else:
+            if not existe_snapshot(self.tramo, huella):
+                df = self._construir_incremental()
+                self._progreso("Guardando snapshot", 0.95)
+                guardar_snapshot(df, self.tramo, huella)
+            df = adjuntar_snapshot(ruta_snapshot(self.tramo, huella))
+        # El dataset particionado se escribe ANTES de publicar: toda sesión
+        # que vea la huella nueva encuentra también su dataset.
+        if not self._dataset_al_dia(huella):
+            self._progreso("Escribiendo dataset particionado", 0.97)
+            escribir_dataset(df, self.tramo, huella)
+        if ultima_huella(self.tramo) != huella:
+            self._progreso("Registrando versión en el historial", 0.98)
+            registrar_version(self.tramo, huella, df, anterior=self._vigente)
+        if not al_dia:
+            if _PRECALENTADORES:
+                self._progreso("Precalentando vistas", 0.99)
+                self._precalentar(huella, df)
+            self._progreso("Publicando", 1.0)
+            self._publicar(huella, df)
+
+    def _construir_incremental(self):
+        """Reprocesa solo las categorías cuyos Excel cambiaron desde la última vez."""
+        huellas_cat = {cat: huella_fuentes({n: self.rutas[n] for n in fuentes[:2]})
+                       for cat, fuentes in CATEGORIAS.items()}
+        reutilizables = {cat: df for cat, (h, df) in self._parciales.items()
+                         if huellas_cat.get(cat) == h}
+        nuevas = procesar_categorias(self.rutas, [c for c in CATEGORIAS if c not in reutilizables],
+                                     progreso=self._progreso)
+        self._parciales.update({cat: (huellas_cat[cat], df) for cat, df in nuevas.items()})
+        return construir_dataframe_maestro(self.rutas, parciales={**reutilizables, **nuevas},
+                                           progreso=self._progreso)
+
+    def _precalentar(self, huella, df):
+        """Un precalentador fallido solo se reporta: la vista se calculará al pedirla."""
+        for funcion in list(_PRECALENTADORES):
+            try:
+                funcion(self.tramo, huella, df, self.rutas)
+            except Exception as e:
+                print(f"  ⚠️  Precalentamiento de {self.tramo} fallido — {type(e).__name__}: {e}")
+
+    def _publicar(self, huella, df):
+        ALMACEN.guardar(self.tramo, huella, "maestro", df)
+        self._vigente = (huella, df)                  # intercambio atómico
+        ALMACEN.invalidar(self.tramo, conservar=huella)
+        self.ultima_actualizacion = time.time()
+
+
+# Un coordinador (y un vigilante) por tramo y por proceso
+_COORDINADORES = {}
+_LOCK_COORDINADORES = threading.Lock()
+
+
+def obtener_coordinador(tramo: str) -> CoordinadorTramo:
+    with _LOCK_COORDINADORES:
+        if tramo not in _COORDINADORES:
+            _COORDINADORES[tramo] = CoordinadorTramo(tramo).iniciar()
+        return _COORDINADORES[tramo]
+
+
+if __name__ == "__main__":
+    for tramo in sys.argv[1:] or ["Tramo1"]:
+        print(f"🏗️  Precalculando snapshot de {tramo}...")
+        coordinador = CoordinadorTramo(tramo)
+        coordinador.solicitar()
+        coordinador.esperar()
+        estado = coordinador.estado()
+        if estado["ultimo_error"]:
+            sys.exit(f"  ❌ {estado['ultimo_error']}")
+        print(f"  ✅ Snapshot vigente: {estado['huella_vigente']}")
@@ -10,13 +10,24 @@ Ejecutar con:  streamlit run dashboard.py
 import streamlit as st
 import pandas as pd
 import numpy as np
-import plotly.graph_objects as go
-import plotly.express as px
 import os
 import sys
+import time
 
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
-from build_maestro import construir_dataframe_maestro, FACTOR_DEMOLICION
+from almacen_datos import ALMACEN
+from coordinador import obtener_coordinador, registrar_precalentador
+from almacen_columnar import adjuntar_snapshot, listar_snapshots, ruta_snapshot
+from comparacion_versiones import comparar_snapshots
+from historial import serie_kpis
+from atipicos import UMBRAL_Z
+from simulacion_precios import EscenarioPrecios, exportar_maestro
+from cantidades_obra import cantidades_obra, conciliar, exportar as exportar_cantidades
+from consultas_sql import DIMENSIONES, MEDIDAS, tabla_dinamica, motor_disponible
+from jerarquia_sistemas import ETIQUETAS_NIVEL, NIVELES, RollupSistemas
+from unidades_longitud import INDETERMINADA as UNIDAD_INDETERMINADA, UNIDADES, describir as describir_unidad
+from graficos import figura_tendencia
+import vistas
 
 # ─────────────────────────────────────────────────────────
 # CONFIGURACIÓN DE PÁGINA
@@ -142,23 +153,81 @@ st.markdown("""
 
 
 # ─────────────────────────────────────────────────────────
-# CARGA DE DATOS (cacheada)
+# CARGA DE DATOS (almacén compartido entre sesiones)
 # ─────────────────────────────────────────────────────────
-@st.cache_data(show_spinner="Cargando y procesando datos BIM...")
-def cargar_df_maestro():
-    base = os.path.dirname(os.path.abspath(__file__))
-    rutas = {
-        "conduits_inicial" : os.path.join(base, "Tramo1_Conduits_EstadoInicial.xlsx"),
-        "conduits_final"   : os.path.join(base, "Tramo1_Conduits_EstadoFinal.xlsx"),
-        "fittings_inicial" : os.path.join(base, "Tramo1_Fittings_EstadoInicial.xlsx"),
-        "fittings_final"   : os.path.join(base, "Tramo1_Fittings_EstadoFinal.xlsx"),
-        "fixtures_inicial" : os.path.join(base, "Tramo1_Fixtures_EstadoInicial.xlsx"),
-        "fixtures_final"   : os.path.join(base, "Tramo1_Fixtures_EstadoFinal.xlsx"),
-        "maestro_precios"  : os.path.join(base, "Maestro_Precios_Tramo1.xlsx"),
-    }
-    return construir_dataframe_maestro(rutas)
+TRAMO = "Tramo1"
+
+# Vistas por defecto precalculadas al publicar cada snapshot (antes del
+# primer obtener_coordinador: ya aplica al snapshot adoptado del disco)
+registrar_precalentador(vistas.precalentar)
+
+# API local de KPIs (JSON) en el mismo proceso → comparte el almacén
+if os.environ.get("BIM_API_PUERTO"):
+    from api_kpis import iniciar_en_segundo_plano
+    iniciar_en_segundo_plano(int(os.environ["BIM_API_PUERTO"]), (TRAMO,))
+
+
+@st.fragment(run_every=1)
+def avance_construccion():
+    """
+    Barra de avance mientras se construye el primer snapshot del tramo.
+    La construcción corre en el coordinador (segundo plano); al publicarse
+    el snapshot se relanza la app completa.
+    """
+    coordinador = obtener_coordinador(TRAMO)
+    if coordinador.snapshot_vigente() is not None:
+        st.rerun()
+    est = coordinador.estado()
+    st.progress(est["fraccion"], text=f"Cargando y procesando datos BIM... {est['etapa'] or ''}")
+    if est["ultimo_error"]:
+        st.error(f"❌ No se pudo construir el maestro: {est['ultimo_error']}")
+
+
+def cargar_df_maestro(tramo=TRAMO):
+    """
+    Retorna (huella, df_maestro) del snapshot vigente del tramo, sin
+    bloquear nunca: el pipeline de Excel corre en el coordinador, y
+    mientras reconstruye se sigue sirviendo el último snapshot bueno.
+    Si el proceso aún no tiene ninguno, se muestra el avance y se
+    detiene este rerun.
+    El maestro está adjuntado en modo memory-map desde el snapshot
+    columnar en disco (varios procesos comparten la misma copia física).
+    """
+    vigente = obtener_coordinador(tramo).snapshot_vigente()
+    if vigente is None:
+        avance_construccion()
+        st.stop()
+    return vigente
+
+
+def leer_ajustes_precios(indice):
+    """
+    Ajustes del editor de precios de la sesión → {(campo, clave): precio}.
+    Se leen del estado del widget (ediciones del rerun anterior) antes de
+    calcular nada, para que todas las pestañas usen el escenario.
+    """
+    ediciones = st.session_state.get("editor_precios", {}).get("edited_rows", {})
+    ajustes = {}
+    for fila, cambios in ediciones.items():
+        precio = cambios.get("precio_simulado")
+        base = indice.tabla.at[int(fila), "precio_base"]
+        if precio is not None and not (pd.notna(base) and precio == base):
+            ajustes[tuple(indice.tabla.loc[int(fila), ["campo", "clave"]])] = precio
+    return ajustes
+
+
+def escenario_precios(huella, factor, df_costos, indice, kpis):
+    """Escenario de precios de la sesión; se rehace si cambian los datos o el factor."""
+    escenario = st.session_state.get("escenario_precios")
+    if escenario is None or st.session_state.get("escenario_precios_id") != (huella, factor):
+        escenario = EscenarioPrecios(df_costos, indice, factor, kpis)
+        st.session_state["escenario_precios"] = escenario
+        st.session_state["escenario_precios_id"] = (huella, factor)
+    return escenario
+
 
-df_base = cargar_df_maestro()   # fuente de verdad — nunca se modifica
+def reiniciar_precios():
+    st.session_state.pop("editor_precios", None)
 
 
 # ─────────────────────────────────────────────────────────
@@ -176,111 +245,6 @@ def kpi_card(label, value, estilo=""):
         <div class="kpi-value">{value}</div>
     </div>"""
 
-def calcular_kpis_tecnicos(df):
-    cond = df[df["categoria"] == "Conduits"]
-    long_demolida    = cond[cond["estado"] == "DEMOLIDO"]["cantidad"].sum()
-    long_nueva       = cond[cond["estado"] == "NUEVO"]["cantidad"].sum()
-    long_persistente = cond[cond["estado"] == "PERSISTENTE"]["cantidad"].sum()
-    long_inicial     = long_demolida + long_persistente
-    long_final       = long_nueva + long_persistente
-    total_base       = long_inicial + long_nueva
-    pct_intervencion = (long_demolida + long_nueva) / total_base * 100 if total_base > 0 else 0
-    return dict(long_inicial=long_inicial, long_demolida=long_demolida,
-                long_nueva=long_nueva, long_persistente=long_persistente,
-                long_final=long_final, pct_intervencion=pct_intervencion)
-
-def calcular_kpis_economicos(df):
-    costo_demol = df["costo_demolicion"].sum()
-    costo_nuevo = df["costo_nuevo"].sum()
-    inversion   = costo_demol + costo_nuevo
-    return dict(costo_demolicion=costo_demol, costo_nuevo=costo_nuevo,
-                inversion_total=inversion,
-                pct_demol=costo_demol/inversion*100 if inversion>0 else 0,
-                pct_nuevo=costo_nuevo/inversion*100 if inversion>0 else 0)
-
-def calcular_kpis_conteo(df):
-    result = {}
-    for cat in ["Conduits", "Fittings", "Fixtures"]:
-        sub = df[df["categoria"] == cat]
-        es_longitud = (cat == "Conduits")
-        result[cat] = {
-            "demolido"   : sub[sub["estado"]=="DEMOLIDO"]["cantidad"].sum() if es_longitud else int(sub[sub["estado"]=="DEMOLIDO"]["cantidad"].sum()),
-            "nuevo"      : sub[sub["estado"]=="NUEVO"]["cantidad"].sum() if es_longitud else int(sub[sub["estado"]=="NUEVO"]["cantidad"].sum()),
-            "persistente": sub[sub["estado"]=="PERSISTENTE"]["cantidad"].sum() if es_longitud else int(sub[sub["estado"]=="PERSISTENTE"]["cantidad"].sum()),
-        }
-    return result
-
-def calcular_kpis_calidad(df):
-    total = len(df)
-    sin_longitud    = df[(df["categoria"]=="Conduits") & (df["cantidad"].isna() | (df["cantidad"]<=0))].shape[0]
-    sin_diametro    = df[(df["categoria"].isin(["Conduits","Fittings"])) & (df["diametro"].isin(["nan","N/A",""]))].shape[0]
-    sin_fase        = df[df["estado"]=="DESCONOCIDO"].shape[0]
-    ids_duplicados  = df.duplicated(subset=["id"]).sum()
-    sin_precio      = (~df["precio_encontrado"]).sum()
-    sin_sistema     = df["nombre_sistema"].isna().sum()
-    sin_cat_sistema = df["categoria_sistema"].isna().sum()
-    return dict(total=total,
-                sin_longitud=sin_longitud, sin_diametro=sin_diametro,
-                sin_fase=sin_fase, ids_duplicados=ids_duplicados,
-                pct_critico=(sin_longitud+sin_diametro+sin_fase+ids_duplicados)/total*100 if total>0 else 0,
-                sin_precio=sin_precio, sin_sistema=sin_sistema,
-                pct_std=sin_precio/total*100 if total>0 else 0,
-                sin_cat_sistema=sin_cat_sistema,
-                pct_nc=sin_cat_sistema/total*100 if total>0 else 0)
-
-
-# ─────────────────────────────────────────────────────────
-# FUNCIÓN UNIVERSAL DE LAYOUT PARA GRÁFICOS DE BARRAS
-# Aplica siempre el margen superior correcto para que los números
-# nunca se corten — funciona para barras grouped Y stacked.
-# ─────────────────────────────────────────────────────────
-COLORES = {
-    "DEMOLIDO"           : "#64748b",
-    "NUEVO"              : "#1a56db",
-    "PERSISTENTE"        : "#93c5fd",
-    "Demolición"         : "#64748b",
-    "Nueva Construcción" : "#1a56db",
-    "DESCONOCIDO"        : "#ef4444",
-}
-
-def barra_con_margen(fig, altura=350, margen_pct=0.20):
-    """
-    Aplica estilo y margen superior universal a cualquier figura de barras.
-    Funciona tanto para barmode='group' como 'stack'.
-    """
-    from collections import defaultdict
-    barmode = fig.layout.barmode or "group"
-    max_y = 0
-
-    if barmode == "stack":
-        sumas = defaultdict(float)
-        for trace in fig.data:
-            if hasattr(trace, "x") and hasattr(trace, "y") and trace.x is not None and trace.y is not None:
-                for xi, yi in zip(trace.x, trace.y):
-                    if yi is not None:
-                        sumas[str(xi)] += float(yi)
-        if sumas:
-            max_y = max(sumas.values())
-    else:  # group o sin barmode
-        for trace in fig.data:
-            if hasattr(trace, "y") and trace.y is not None:
-                vals = [v for v in trace.y if v is not None]
-                if vals:
-                    max_y = max(max_y, max(vals))
-
-    rango_y = [0, max_y * (1 + margen_pct)] if max_y > 0 else [0, 1]
-
-    fig.update_layout(
-        height=altura,
-        plot_bgcolor="white",
-        paper_bgcolor="white",
-        margin=dict(t=50, b=40, l=20, r=20),
-        yaxis=dict(range=rango_y),
-        font=dict(family="sans-serif"),
-        hovermode="x unified",   # muestra tooltip al pasar por la columna, incluso en barras de 1px
-    )
-    return fig
-
 
 # ─────────────────────────────────────────────────────────
 # CABECERA GLOBAL (visible en todas las pestañas)
@@ -298,7 +262,9 @@ st.markdown("""
 
 
 # ─────────────────────────────────────────────────────────
-# SIDEBAR
+# SIDEBAR — la parte que no depende de los datos se pinta antes de
+# cargarlos: con el arranque en frío (maestro en construcción) ya se
+# ven la cabecera, el sidebar y la barra de avance.
 # ─────────────────────────────────────────────────────────
 with st.sidebar:
     st.markdown("## 🏗️")
@@ -311,10 +277,34 @@ with st.sidebar:
         help="Porcentaje del valor del elemento nuevo que cuesta demolerlo"
     ) / 100
     st.markdown("---")
-    if st.button("🔄 Actualizar datos"):
-        st.cache_data.clear()
+
+huella_datos, df_base = cargar_df_maestro()   # fuente de verdad — nunca se modifica
+
+
+@st.fragment(run_every=5)
+def estado_datos():
+    """
+    Estado de los datos en el sidebar. Se refresca solo cada 5 s; cuando
+    termina una reconstrucción en segundo plano, relanza la app completa
+    para mostrar el snapshot nuevo.
+    """
+    est = obtener_coordinador(TRAMO).estado()
+    if est["huella_vigente"] != huella_datos:
         st.rerun()
-    st.caption("Úsalo si reemplazas los archivos Excel por una versión nueva.")
+    if est["reconstruyendo"]:
+        cambios = ", ".join(est["cambios_en_curso"]) or "Excel"
+        st.caption(f"🔄 Actualizando en segundo plano ({cambios}) · "
+                   f"{est['etapa'] or 'en cola'} ({est['fraccion']*100:.0f}%). "
+                   "Mientras tanto se muestran los datos anteriores.")
+    elif est["ultima_actualizacion"]:
+        hora = time.strftime("%H:%M:%S", time.localtime(est["ultima_actualizacion"]))
+        st.caption(f"🟢 Datos al día · cargados a las {hora}. "
+                   "Los Excel reemplazados se detectan automáticamente.")
+    if est["ultimo_error"]:
+        st.caption(f"⚠️ La última actualización falló: {est['ultimo_error']}")
+
+with st.sidebar:
+    estado_datos()
     st.markdown("---")
     st.markdown("**Filtros · Análisis Detallado**")
     categorias_disp = ["Todas"] + sorted(df_base["categoria"].unique().tolist())
@@ -338,14 +328,26 @@ with st.sidebar:
     )
 
 
-# Recalcular SIEMPRE desde df_base → el slider nunca acumula errores
-from build_maestro import calcular_costos
-df = calcular_costos(df_base.copy(), factor_demol)
-
-kpi_tec = calcular_kpis_tecnicos(df)
-kpi_eco = calcular_kpis_economicos(df)
-kpi_cnt = calcular_kpis_conteo(df)
-kpi_cal = calcular_kpis_calidad(df)
+# Recalcular SIEMPRE desde df_base → el slider nunca acumula errores.
+# Costos y KPIs por factor se guardan como derivados en el almacén:
+# todas las sesiones con el mismo factor comparten el mismo resultado.
+# Las claves del almacén se definen en vistas.py (las mismas que precalienta
+# el coordinador al publicar un snapshot).
+df = vistas.costos(TRAMO, huella_datos, df_base, factor_demol)
+kpi_tec, kpi_eco, kpi_cnt, kpi_cal = vistas.kpis(TRAMO, huella_datos, df, factor_demol)
+
+# Simulación de precios unitarios (por sesión): solo se recalculan las
+# filas de las claves editadas y las celdas de KPIs que dependen del precio.
+indice_precios = vistas.indice_precios(TRAMO, huella_datos, df)
+ajustes_precios = leer_ajustes_precios(indice_precios)
+kpi_eco_maestro = kpi_eco
+if ajustes_precios or "escenario_precios" in st.session_state:
+    escenario = escenario_precios(huella_datos, factor_demol, df, indice_precios,
+                                  (kpi_tec, kpi_eco, kpi_cnt, kpi_cal))
+    escenario.sincronizar(ajustes_precios)
+    if ajustes_precios:
+        df = escenario.df
+        kpi_tec, kpi_eco, kpi_cnt, kpi_cal = escenario.kpis()
 
 # ─────────────────────────────────────────────────────────
 # NAVEGACIÓN POR PESTAÑAS
@@ -379,44 +381,17 @@ with tab1:
 
     # ── Bloque C: Visualización de Progreso ──
     st.markdown('<div class="seccion-titulo">📈 Visualización de Progreso</div>', unsafe_allow_html=True)
+    figuras_resumen = vistas.figuras_resumen(kpi_tec, kpi_eco, kpi_cnt)
     col1, col2, col3 = st.columns(3)
 
     with col1:
-        fig1 = go.Figure([
-            go.Bar(name="Inicial", x=["Inicial"], y=[kpi_tec["long_inicial"]],
-                   marker_color="#1a56db",
-                   text=[f"{kpi_tec['long_inicial']:,.0f} m"], textposition="outside"),
-            go.Bar(name="Final", x=["Final"], y=[kpi_tec["long_final"]],
-                   marker_color="#60a5fa",
-                   text=[f"{kpi_tec['long_final']:,.0f} m"], textposition="outside"),
-        ])
-        fig1.update_layout(title="Comparativo: Inicial vs Final", barmode="group",
-                           showlegend=True, yaxis_title="Metros")
-        st.plotly_chart(barra_con_margen(fig1), use_container_width=True)
+        st.plotly_chart(figuras_resumen["inicial_final"], use_container_width=True)
 
     with col2:
-        fig2 = go.Figure([
-            go.Bar(name="Demolido", x=["Demolido"], y=[kpi_tec["long_demolida"]],
-                   marker_color="#64748b",
-                   text=[f"{kpi_tec['long_demolida']:,.0f} m"], textposition="outside"),
-            go.Bar(name="Nuevo", x=["Nuevo"], y=[kpi_tec["long_nueva"]],
-                   marker_color="#1a56db",
-                   text=[f"{kpi_tec['long_nueva']:,.0f} m"], textposition="outside"),
-        ])
-        fig2.update_layout(title="Demolido vs Nuevo (Conduits)", barmode="group",
-                           yaxis_title="Metros")
-        st.plotly_chart(barra_con_margen(fig2), use_container_width=True)
+        st.plotly_chart(figuras_resumen["demolido_nuevo"], use_container_width=True)
 
     with col3:
-        fig3 = go.Figure([go.Pie(
-            labels=["Demolición", "Nueva Construcción"],
-            values=[kpi_eco["costo_demolicion"], kpi_eco["costo_nuevo"]],
-            marker_colors=["#64748b", "#1a56db"],
-            hole=0.4, textinfo="label+percent",
-        )])
-        fig3.update_layout(title="Distribución de Inversión", height=350,
-                           paper_bgcolor="white", margin=dict(t=50, b=20, l=20, r=20))
-        st.plotly_chart(fig3, use_container_width=True)
+        st.plotly_chart(figuras_resumen["inversion"], use_container_width=True)
 
     st.markdown("<br>", unsafe_allow_html=True)
 
@@ -425,19 +400,138 @@ with tab1:
     col1, col2, col3 = st.columns(3)
 
     for col, cat_name in zip([col1, col2, col3], ["Conduits", "Fittings", "Fixtures"]):
-        data   = kpi_cnt[cat_name]
-        unidad = "m" if cat_name == "Conduits" else "und"
-        vals   = [data["demolido"], data["nuevo"], data["persistente"]]
         with col:
             st.markdown(f"**{cat_name}**")
-            fig = go.Figure([go.Bar(
-                x=["Demolido", "Nuevo", "Persistente"], y=vals,
-                marker_color=["#64748b", "#1a56db", "#93c5fd"],
-                text=[f"{v:,.0f}" for v in vals], textposition="outside",
-                hovertemplate="<b>%{x}</b><br>%{y:,.0f} " + unidad + "<extra></extra>",
-            )])
-            fig.update_layout(showlegend=False, yaxis_title=unidad)
-            st.plotly_chart(barra_con_margen(fig, altura=280), use_container_width=True)
+            st.plotly_chart(figuras_resumen[cat_name], use_container_width=True)
+
+    # ── Bloque E: Desglose por sistema de telecomunicaciones ──
+    # Árbol precalculado una vez por snapshot y factor (jerarquia_sistemas.py):
+    # desplegar un nodo solo lee sus hijos. Con precios simulados se arma
+    # sobre el escenario de la sesión (un solo groupby).
+    st.markdown('<div class="seccion-titulo">🛰️ Desglose por Sistema de Telecomunicaciones</div>', unsafe_allow_html=True)
+    if ajustes_precios:
+        rollup = RollupSistemas(df)
+    else:
+        rollup = vistas.rollup_sistemas(TRAMO, huella_datos, df, factor_demol)
+    col1, col2 = st.columns([3, 2])
+    with col1:
+        medida = st.radio("Tamaño de los sectores", list(vistas.MEDIDAS_ROLLUP), horizontal=True,
+                          format_func=lambda m: vistas.MEDIDAS_ROLLUP[m][0])
+        st.plotly_chart(vistas.figura_rollup(rollup, medida), use_container_width=True)
+    with col2:
+        rutas_sistema = {" › ".join(r): r for r in rollup.rutas_desplegables()}
+        ruta_sistema = rutas_sistema[st.selectbox(
+            "Desglosar", list(rutas_sistema), format_func=lambda r: r or "Todo el proyecto")]
+        nivel_hijos = ETIQUETAS_NIVEL[NIVELES[len(ruta_sistema)]]
+        st.dataframe(rollup.hijos(ruta_sistema), hide_index=True, use_container_width=True,
+                     column_config={
+                         "nombre"          : nivel_hijos,
+                         "elementos"       : st.column_config.NumberColumn("Elementos", format="%d"),
+                         "longitud"        : st.column_config.NumberColumn("Longitud (m)", format="%.1f"),
+                         "costo_nuevo"     : st.column_config.NumberColumn("Costo Nuevo", format="$ %d"),
+                         "costo_demolicion": st.column_config.NumberColumn("Costo Demolición", format="$ %d"),
+                         "costo_total"     : st.column_config.NumberColumn("Costo Total", format="$ %d"),
+                     })
+        nodo = rollup.nodo(ruta_sistema)
+        st.caption(f"{nodo['elementos']:,} elementos · {fmt_m(nodo['longitud'])} de Conduits · "
+                   f"{fmt_cop(nodo['costo_total'])}")
+
+    # ── Bloque F: Evolución entre versiones del modelo ──
+    # Lee solo los KPIs precalculados de cada versión (historial.py)
+    st.markdown('<div class="seccion-titulo">📆 Evolución del Modelo entre Versiones</div>', unsafe_allow_html=True)
+    serie = serie_kpis(TRAMO)
+    if len(serie) < 2:
+        st.info("La evolución se mostrará cuando haya al menos dos versiones del modelo "
+                "(cada reemplazo de los Excel de Revit registra una versión).")
+    else:
+        # Costos guardados con el factor de cada versión → se reescalan al factor del slider
+        inversion = serie["costo_nuevo"] + serie["costo_demolicion"] * factor_demol / serie["factor_demolicion"]
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            st.plotly_chart(figura_tendencia(serie["fecha"], serie["long_final"],
+                                             "Longitud Final (Conduits)", "Metros", sufijo=" m"),
+                            use_container_width=True)
+        with col2:
+            st.plotly_chart(figura_tendencia(serie["fecha"], serie["pct_intervencion"],
+                                             "% Intervención", "%", color="#64748b", sufijo="%"),
+                            use_container_width=True)
+        with col3:
+            st.plotly_chart(figura_tendencia(serie["fecha"], inversion,
+                                             "Inversión Total", "COP", color="#60a5fa", prefijo="$ "),
+                            use_container_width=True)
+        st.caption(f"{len(serie)} versiones registradas · la más reciente es la vigente")
+
+    # ── Bloque G: Simulación de precios unitarios ──
+    with st.expander("💲 Simulación de Precios Unitarios", expanded=bool(ajustes_precios)):
+        st.caption("Edita el precio simulado de una clave del maestro (Tipo|Diámetro para "
+                   "Conduits y Fittings, Familia para Fixtures). Todas las pestañas usan el "
+                   "escenario de esta sesión; el maestro original no se modifica.")
+        tabla_precios = indice_precios.tabla.assign(precio_simulado=indice_precios.tabla["precio_base"])
+        st.data_editor(
+            tabla_precios[["categoria", "etiqueta", "unidad", "elementos", "precio_base", "precio_simulado"]],
+            key="editor_precios", hide_index=True, use_container_width=True,
+            disabled=["categoria", "etiqueta", "unidad", "elementos", "precio_base"],
+            column_config={
+                "categoria"      : "Categoría",
+                "etiqueta"       : "Clave de precio",
+                "unidad"         : "Unidad",
+                "elementos"      : st.column_config.NumberColumn("Elementos", format="%d"),
+                "precio_base"    : st.column_config.NumberColumn("Precio maestro (COP)", format="$ %d"),
+                "precio_simulado": st.column_config.NumberColumn("Precio simulado (COP)", format="$ %d",
+                                                                 min_value=0, step=1),
+            })
+        if ajustes_precios:
+            delta = kpi_eco["inversion_total"] - kpi_eco_maestro["inversion_total"]
+            st.markdown(f"**{len(ajustes_precios)} precio(s) ajustado(s)** · "
+                        f"Inversión simulada: `{fmt_cop(kpi_eco['inversion_total'])}` "
+                        f"({'+' if delta >= 0 else '−'}{fmt_cop(abs(delta))} vs. maestro)")
+            c1, c2 = st.columns(2)
+            with c1:
+                st.download_button("⬇️ Exportar Maestro de Precios (.xlsx)",
+                                   data=exportar_maestro(obtener_coordinador(TRAMO).rutas["maestro_precios"],
+                                                         ajustes_precios, indice_precios),
+                                   file_name=f"Maestro_Precios_{TRAMO}_simulado.xlsx",
+                                   mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")
+            with c2:
+                st.button("↩️ Restablecer precios del maestro", on_click=reiniciar_precios)
+
+
+    # ── Bloque H: Cantidades de obra por ítem del maestro ──
+    with st.expander("📑 Cantidades de Obra por Ítem del Maestro de Precios"):
+        # Con precios simulados se arman sobre el escenario de la sesión
+        if ajustes_precios:
+            obra = cantidades_obra(df, factor_demol, TRAMO)
+        else:
+            obra = vistas.cantidades(TRAMO, huella_datos, df, factor_demol)
+        diferencias = conciliar(obra, kpi_eco)
+        st.dataframe(obra, hide_index=True, use_container_width=True, height=320,
+                     column_config={
+                         "tramo"          : "Tramo",
+                         "capitulo"       : "Capítulo",
+                         "item"           : st.column_config.NumberColumn("Ítem", format="%d"),
+                         "categoria"      : "Categoría",
+                         "descripcion"    : "Descripción",
+                         "unidad"         : "Unidad",
+                         "cantidad"       : st.column_config.NumberColumn("Cantidad", format="%.2f"),
+                         "precio_unitario": st.column_config.NumberColumn("Precio Unitario", format="$ %d"),
+                         "factor"         : st.column_config.NumberColumn("Factor", format="%.2f"),
+                         "precio_aplicado": st.column_config.NumberColumn("Precio Aplicado", format="$ %.0f"),
+                         "subtotal"       : st.column_config.NumberColumn("Subtotal", format="$ %d"),
+                         "elementos"      : st.column_config.NumberColumn("Elementos", format="%d"),
+                     })
+        if any(diferencias.values()):
+            st.error(f"❌ Las cantidades de obra no concilian con los KPIs: {diferencias}")
+        else:
+            st.caption(f"✅ {len(obra):,} ítems · el total ({fmt_cop(obra['subtotal'].sum())}) concilia "
+                       "al peso con la inversión total de los indicadores económicos")
+        c1, c2 = st.columns(2)
+        for col, formato, mime in ((c1, "xlsx", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"),
+                                   (c2, "csv", "text/csv")):
+            archivo = (exportar_cantidades(obra, formato) if ajustes_precios else
+                       vistas.archivo_cantidades(TRAMO, huella_datos, obra, factor_demol, formato))
+            with col:
+                st.download_button(f"⬇️ Cantidades de obra ({formato.upper()})", archivo,
+                                   f"cantidades_obra_{TRAMO}_{int(factor_demol*100)}.{formato}", mime)
 
 
 # ═══════════════════════════════════════════════════════════
@@ -445,13 +539,13 @@ with tab1:
 # ═══════════════════════════════════════════════════════════
 with tab2:
 
-    df_filtrado = df.copy()
-    if filtro_cat != "Todas":
-        df_filtrado = df_filtrado[df_filtrado["categoria"] == filtro_cat]
-    if filtro_est:
-        df_filtrado = df_filtrado[df_filtrado["estado"].isin(filtro_est)]
-    if filtro_tipo:
-        df_filtrado = df_filtrado[df_filtrado["type"].isin(filtro_tipo)]
+    if ajustes_precios:   # escenario de precios de la sesión → se filtra en memoria
+        df_filtrado = vistas.filtrar_en_memoria(df, [filtro_cat] if filtro_cat != "Todas" else [],
+                                                filtro_est, filtro_tipo)
+    else:
+        df_filtrado = vistas.detalle(TRAMO, huella_datos, factor_demol,
+                                     [filtro_cat] if filtro_cat != "Todas" else [],
+                                     filtro_est, filtro_tipo, df)
 
     etiq_est = [{"DEMOLIDO":"Demolido","NUEVO":"Proyectado","PERSISTENTE":"Existente a Mantener"}.get(e,e) for e in filtro_est]
     etiq_tipo = ", ".join(filtro_tipo) if filtro_tipo else "Todos"
@@ -470,99 +564,50 @@ with tab2:
 
     st.markdown("<br>", unsafe_allow_html=True)
 
+    figuras_det = vistas.figuras_detalle(vistas.agregados_detalle(df_filtrado))
+
     # ── Análisis por Tipo ──
     st.markdown('<div class="seccion-titulo">📊 Análisis por Tipo</div>', unsafe_allow_html=True)
     col1, col2 = st.columns(2)
-
-    with col1:
-        cond_tipo = (df_filtrado[df_filtrado["categoria"] == "Conduits"]
-                     .groupby(["type","estado"])["cantidad"].sum().reset_index())
-        if not cond_tipo.empty:
-            fig = px.bar(cond_tipo, x="type", y="cantidad", color="estado",
-                         color_discrete_map=COLORES,
-                         title="Longitud (m) por Tipo de Conduit",
-                         labels={"cantidad":"Metros","type":"Tipo","estado":"Estado"},
-                         barmode="group")
-            fig.update_traces(
-                hovertemplate="<b>Tipo:</b> %{x}<br><b>Longitud:</b> %{y:,.1f} m<extra>%{fullData.name}</extra>"
-            )
-            st.plotly_chart(barra_con_margen(fig), use_container_width=True)
-
-    with col2:
-        costo_tipo = df_filtrado.groupby(["type","estado"]).agg(
-            costo=("costo_total","sum"),
-            cantidad=("cantidad","sum"),
-            elementos=("id","count")
-        ).reset_index()
-        top10 = costo_tipo.groupby("type")["costo"].sum().nlargest(10).index
-        costo_tipo = costo_tipo[costo_tipo["type"].isin(top10)]
-        if not costo_tipo.empty:
-            fig = px.bar(costo_tipo, x="type", y="costo", color="estado",
-                         color_discrete_map=COLORES,
-                         title="Costo Total (COP) por Tipo — Top 10",
-                         labels={"costo":"COP","type":"Tipo","estado":"Estado"},
-                         barmode="stack",
-                         custom_data=["elementos","cantidad"])
-            fig.update_traces(
-                hovertemplate=(
-                    "<b>Tipo:</b> %{x}<br>"
-                    "<b>Estado:</b> %{fullData.name}<br>"
-                    "<b>Elementos:</b> %{customdata[0]:,}<br>"
-                    "<b>Cantidad:</b> %{customdata[1]:,.1f}<br>"
-                    "<b>Costo:</b> $ %{y:,.0f}"
-                    "<extra></extra>"
-                )
-            )
-            st.plotly_chart(barra_con_margen(fig), use_container_width=True)
+    for col, nombre in ((col1, "cond_tipo"), (col2, "costo_tipo")):
+        if figuras_det[nombre] is not None:
+            with col:
+                st.plotly_chart(figuras_det[nombre], use_container_width=True)
 
     # ── Análisis por Diámetro ──
     st.markdown('<div class="seccion-titulo">📏 Análisis por Diámetro</div>', unsafe_allow_html=True)
     col1, col2 = st.columns(2)
-    orden_diam = ['1"','2"','3"','4"']
-
-    with col1:
-        cond_diam = (df_filtrado[df_filtrado["categoria"] == "Conduits"]
-                     .groupby(["diametro","estado"])["cantidad"].sum().reset_index())
-        if not cond_diam.empty:
-            fig = px.bar(cond_diam, x="diametro", y="cantidad", color="estado",
-                         color_discrete_map=COLORES,
-                         title="Longitud (m) por Diámetro",
-                         labels={"cantidad":"Metros","diametro":"Diámetro","estado":"Estado"},
-                         barmode="group",
-                         category_orders={"diametro": orden_diam})
-            fig.update_traces(
-                hovertemplate="<b>Diámetro:</b> %{x}<br><b>Longitud:</b> %{y:,.1f} m<extra>%{fullData.name}</extra>"
-            )
-            fig.update_layout(xaxis=dict(type="category"))
-            st.plotly_chart(barra_con_margen(fig), use_container_width=True)
+    for col, nombre in ((col1, "cond_diam"), (col2, "costo_diam")):
+        if figuras_det[nombre] is not None:
+            with col:
+                st.plotly_chart(figuras_det[nombre], use_container_width=True)
 
-    with col2:
-        costo_diam = (df_filtrado[df_filtrado["diametro"] != "N/A"]
-                      .groupby(["diametro","estado"]).agg(
-                          costo=("costo_total","sum"),
-                          elementos=("id","count"),
-                          cantidad=("cantidad","sum")
-                      ).reset_index())
-        if not costo_diam.empty:
-            fig = px.bar(costo_diam, x="diametro", y="costo", color="estado",
-                         color_discrete_map=COLORES,
-                         title="Costo Total (COP) por Diámetro",
-                         labels={"costo":"COP","diametro":"Diámetro","estado":"Estado"},
-                         barmode="stack",
-                         category_orders={"diametro": orden_diam},
-                         custom_data=["elementos","cantidad"])
-            fig.update_traces(
-                hovertemplate=(
-                    "<b>Diámetro:</b> %{x}<br>"
-                    "<b>Estado:</b> %{fullData.name}<br>"
-                    "<b>Elementos:</b> %{customdata[0]:,}<br>"
-                    "<b>Cantidad:</b> %{customdata[1]:,.1f}<br>"
-                    "<b>Costo:</b> $ %{y:,.0f}"
-                    "<extra></extra>"
-                )
-            )
-            fig.update_layout(xaxis=dict(type="category"))
-            st.plotly_chart(barra_con_margen(fig), use_container_width=True)
+    # ── Constructor de tabla dinámica (una sola consulta agregada) ──
+    st.markdown('<div class="seccion-titulo">🧮 Constructor de Tabla Dinámica</div>', unsafe_allow_html=True)
+    c1, c2, c3 = st.columns(3)
+    with c1:
+        piv_filas = st.multiselect("Filas", options=list(DIMENSIONES), default=["type"],
+                                   format_func=DIMENSIONES.get)
+    with c2:
+        piv_columnas = st.multiselect("Columnas", options=[d for d in DIMENSIONES if d not in piv_filas],
+                                      default=["estado"] if "estado" not in piv_filas else [],
+                                      format_func=DIMENSIONES.get)
+    with c3:
+        piv_medidas = st.multiselect("Medidas", options=list(MEDIDAS), default=["cantidad", "costo_total"],
+                                     format_func=lambda m: MEDIDAS[m][0])
+    if piv_medidas:
+        pivote = tabla_dinamica(
+            df, piv_filas, piv_columnas, piv_medidas,
+            filtros={"categoria": [filtro_cat] if filtro_cat != "Todas" else [],
+                     "estado": filtro_est, "type": filtro_tipo})
+        st.dataframe(pivote, use_container_width=True, hide_index=True)
+        st.caption(f"Motor de consulta: {motor_disponible()} · {len(pivote):,} filas · "
+                   "aplica los filtros del sidebar")
+        st.download_button("⬇️ Descargar tabla dinámica (CSV)",
+                           pivote.to_csv(index=False).encode("utf-8"),
+                           "tabla_dinamica_tramo1.csv", "text/csv")
+    else:
+        st.info("Selecciona al menos una medida para construir la tabla dinámica.")
 
     # ── Tabla dinámica ──
     st.markdown('<div class="seccion-titulo">📋 Tabla Dinámica Detallada</div>', unsafe_allow_html=True)
@@ -609,27 +654,11 @@ with tab3:
 
     # Score crítico (gauge)
     score_crit = max(0, 100 - q["pct_critico"])
-    fig_gauge = go.Figure(go.Indicator(
-        mode="gauge+number+delta",
-        value=score_crit,
-        title={"text": "Score Integridad Crítica", "font": {"size": 16}},
-        delta={"reference": 100, "increasing": {"color": "#16a34a"}},
-        gauge={
-            "axis": {"range": [0, 100]},
-            "bar": {"color": "#1a56db"},
-            "steps": [
-                {"range": [0, 60],   "color": "#fee2e2"},
-                {"range": [60, 85],  "color": "#fef9c3"},
-                {"range": [85, 100], "color": "#dcfce7"},
-            ],
-            "threshold": {"line": {"color": "red", "width": 4}, "thickness": 0.75, "value": 85}
-        }
-    ))
-    fig_gauge.update_layout(height=280, margin=dict(t=40, b=20, l=40, r=40), paper_bgcolor="white")
+    figuras_int = vistas.figuras_integridad(kpi_cal, df)
 
     col1, col2 = st.columns([1, 2])
     with col1:
-        st.plotly_chart(fig_gauge, use_container_width=True)
+        st.plotly_chart(figuras_int["gauge"], use_container_width=True)
     with col2:
         st.markdown("**Interpretación del Score Crítico:**")
         st.markdown("- 🟢 **85–100** → Modelo listo para análisis")
@@ -646,10 +675,12 @@ with tab3:
     st.markdown("---")
 
     # ── Nivel Estandarización ──
+    atipicos = vistas.atipicos(TRAMO, huella_datos, df_base)
     st.markdown("#### 🟡 Nivel Estandarización — Afecta costos y análisis")
-    c1, c2 = st.columns(2)
+    c1, c2, c3 = st.columns(3)
     with c1:  st.markdown(kpi_card("🟡 Sin precio asignado",   f"{q['sin_precio']:,}  ({q['sin_precio']/q['total']*100:.2f}%)",  "muted"), unsafe_allow_html=True)
     with c2:  st.markdown(kpi_card("🟡 Sin nombre de sistema", f"{q['sin_sistema']:,}  ({q['sin_sistema']/q['total']*100:.2f}%)", "muted"), unsafe_allow_html=True)
+    with c3:  st.markdown(kpi_card("🟡 Cantidad atípica",      f"{len(atipicos):,}  ({len(atipicos)/q['total']*100:.2f}%)",     "muted"), unsafe_allow_html=True)
 
     st.markdown("<br>", unsafe_allow_html=True)
 
@@ -663,27 +694,11 @@ with tab3:
 
     # ── Distribución del modelo — 3 gráficos separados (uno por categoría) ──
     st.markdown('<div class="seccion-titulo">📊 Distribución del Modelo por Categoría y Estado</div>', unsafe_allow_html=True)
-    dist = df.groupby(["categoria","estado"]).size().reset_index(name="count")
-
     col1, col2, col3 = st.columns(3)
-    for col, cat_name in zip([col1, col2, col3], ["Conduits", "Fittings", "Fixtures"]):
-        sub = dist[dist["categoria"] == cat_name].copy()
-        unidad = "elementos"
-        vals_por_estado = {row["estado"]: row["count"] for _, row in sub.iterrows()}
+    for col, cat_name in zip([col1, col2, col3], vistas.CATEGORIAS):
         with col:
             st.markdown(f"**{cat_name}**")
-            estados  = ["DEMOLIDO", "NUEVO", "PERSISTENTE"]
-            vals     = [vals_por_estado.get(e, 0) for e in estados]
-            fig = go.Figure([go.Bar(
-                x=estados, y=vals,
-                marker_color=["#64748b", "#1a56db", "#93c5fd"],
-                text=[f"{v:,}" for v in vals],
-                textposition="outside",
-                hovertemplate="<b>%{x}</b><br>%{y:,} elementos<extra></extra>",
-            )])
-            fig.update_layout(showlegend=False, yaxis_title="Elementos",
-                              title=cat_name)
-            st.plotly_chart(barra_con_margen(fig, altura=300), use_container_width=True)
+            st.plotly_chart(figuras_int[cat_name], use_container_width=True)
 
     # ── Tabla de problemas ──
     problemas = df[~df["precio_encontrado"]]
@@ -691,9 +706,57 @@ with tab3:
         st.markdown('<div class="seccion-titulo">⚠️ Elementos sin precio asignado</div>', unsafe_allow_html=True)
         st.dataframe(problemas[["categoria","family","type","diametro","estado","cantidad"]],
                      use_container_width=True)
+
+        sugerencias = vistas.sugerencias(TRAMO, huella_datos, df_base,
+                                         obtener_coordinador(TRAMO).rutas["maestro_precios"])
+        if len(sugerencias) > 0:
+            st.markdown("##### 💡 Entradas del maestro más parecidas a cada clave sin precio")
+            tabla = sugerencias[["categoria", "clave", "elementos"]].copy()
+            for i in (1, 2, 3):
+                tabla[f"Sugerencia {i}"] = [
+                    f"{s}  ·  {fmt_cop(p)}  ·  {sim:.0%}" if isinstance(s, str) else "—"
+                    for s, p, sim in zip(sugerencias[f"sugerencia_{i}"], sugerencias[f"precio_{i}"],
+                                         sugerencias[f"similitud_{i}"])]
+            tabla = tabla.rename(columns={"categoria": "Categoría", "clave": "Clave sin precio",
+                                          "elementos": "Elementos"})
+            st.dataframe(tabla, use_container_width=True, hide_index=True)
+            st.caption("Similitud por trigramas de la clave canónica (100% = misma clave). "
+                       "Corrige el nombre en Revit o agrega la clave al maestro de precios.")
     else:
         st.success("✅ Todos los elementos tienen precio asignado en el maestro.")
 
+    if len(atipicos) > 0:
+        st.markdown('<div class="seccion-titulo">📏 Cantidades atípicas por Tipo y Diámetro</div>', unsafe_allow_html=True)
+        st.caption(f"Cada elemento se compara con los de su misma categoría, tipo y diámetro "
+                   f"(mediana y MAD de log10 de la cantidad); se reportan los de |z| > {UMBRAL_Z}. "
+                   "Revisar en Revit: pueden ser errores de unidades o tramos mal modelados.")
+        tabla = atipicos[["categoria", "type", "diametro", "estado", "cantidad", "unidad",
+                          "mediana_grupo", "razon_mediana", "z_robusto", "n_grupo"]].copy()
+        tabla["razon_mediana"] = tabla["razon_mediana"].apply(lambda x: f"{x:,.1f}×")
+        tabla.columns = ["Categoría", "Tipo", "Diámetro", "Estado", "Cantidad", "Unidad",
+                         "Mediana del grupo", "Cantidad / Mediana", "z robusto", "Elementos del grupo"]
+        st.dataframe(tabla.round({"Cantidad": 2, "Mediana del grupo": 2, "z robusto": 1}),
+                     use_container_width=True, hide_index=True)
+
+    # ── Unidad de longitud inferida por archivo de Conduits ──
+    decisiones_unidad = df_base.attrs.get("unidades_longitud", [])
+    if decisiones_unidad:
+        st.markdown('<div class="seccion-titulo">📐 Unidad de Longitud por Archivo de Conduits</div>', unsafe_allow_html=True)
+        st.dataframe(pd.DataFrame({
+            "Archivo"           : [d["archivo"] for d in decisiones_unidad],
+            "Elementos"         : [d["elementos"] for d in decisiones_unidad],
+            "Unidad detectada"  : [describir_unidad(d) for d in decisiones_unidad],
+            f"En rango ({' / '.join(UNIDADES)})": [
+                " / ".join(f"{f:.0%}" for f in d["fracciones"].values()) or "—" for d in decisiones_unidad],
+            "Motivo"            : [d["motivo"] for d in decisiones_unidad],
+        }), use_container_width=True, hide_index=True)
+        indeterminadas = [d["archivo"] for d in decisiones_unidad if d["unidad"] == UNIDAD_INDETERMINADA]
+        if indeterminadas:
+            st.warning(f"⚠️ No se pudo determinar la unidad de Length en: {', '.join(indeterminadas)}. "
+                       "Las longitudes se usan tal cual; revisar la plantilla de exportación en Revit.")
+        st.caption("Fracción de elementos cuya longitud, leída en cada unidad, cae en el rango "
+                   "esperado para su diámetro. Solo se convierte cuando una unidad es claramente la mejor.")
+
     # ── Resumen final ──
     st.markdown("---")
     st.markdown("##### 📋 Resumen General del Modelo")
@@ -704,3 +767,50 @@ with tab3:
         "Sin Precio"  : [df[(df["categoria"]==c)&~df["precio_encontrado"]].shape[0] for c in ["Conduits","Fittings","Fixtures"]] + [df[~df["precio_encontrado"]].shape[0]],
     })
     st.dataframe(resumen, use_container_width=True, hide_index=True)
+
+    # ── Cambios entre versiones del modelo (snapshots) ──
+    st.markdown('<div class="seccion-titulo">🔀 Cambios entre Versiones del Modelo</div>', unsafe_allow_html=True)
+    anteriores = [v for v in listar_snapshots(TRAMO) if v["huella"] != huella_datos]
+    if not anteriores:
+        st.info("Aún no hay una versión anterior guardada. Al reemplazar los Excel de Revit "
+                "se podrá comparar la versión vigente con la anterior.")
+    else:
+        version_ant = st.selectbox(
+            "Comparar la versión vigente con",
+            options=anteriores,
+            format_func=lambda v: f"Versión del {time.strftime('%Y-%m-%d %H:%M', time.localtime(v['fecha']))} "
+                                  f"· {v['filas']:,} elementos")
+        dif = ALMACEN.obtener(
+            TRAMO, huella_datos, ("diferencias", version_ant["huella"], factor_demol),
+            lambda: comparar_snapshots(adjuntar_snapshot(ruta_snapshot(TRAMO, version_ant["huella"])),
+                                       df_base, factor_demol))
+        r = dif["resumen"]
+        c1, c2, c3, c4, c5 = st.columns(5)
+        with c1:  st.markdown(kpi_card("Agregados",         f"{r['agregados']:,}",   "alt"),   unsafe_allow_html=True)
+        with c2:  st.markdown(kpi_card("Eliminados",        f"{r['eliminados']:,}",  "muted"), unsafe_allow_html=True)
+        with c3:  st.markdown(kpi_card("Modificados",       f"{r['modificados']:,}"),          unsafe_allow_html=True)
+        with c4:  st.markdown(kpi_card("Δ Longitud Conduits", f"{r['delta_longitud_conduits']:+,.0f} m"), unsafe_allow_html=True)
+        with c5:  st.markdown(kpi_card("Δ Inversión",       f"$ {r['delta_costo']:+,.0f}"),    unsafe_allow_html=True)
+        st.caption(f"{r['sin_cambios']:,} elementos sin cambios · "
+                   "sin ElementId en las tablas de Revit, un elemento eliminado y otro agregado "
+                   "con la misma familia, tipo y diámetro se reportan como modificado.")
+
+        if len(dif["por_grupo"]) > 0:
+            st.markdown("##### Deltas por Categoría, Tipo y Diámetro")
+            por_grupo = dif["por_grupo"][["categoria", "type", "diametro", "agregados", "eliminados",
+                                          "modificados", "delta_cantidad", "delta_costo"]].copy()
+            por_grupo["delta_cantidad"] = por_grupo["delta_cantidad"].apply(lambda x: f"{x:+,.2f}")
+            por_grupo["delta_costo"]    = por_grupo["delta_costo"].apply(lambda x: f"$ {x:+,.0f}")
+            por_grupo.columns = ["Categoría", "Tipo", "Diámetro", "Agregados", "Eliminados",
+                                 "Modificados", "Δ Cantidad", "Δ Costo"]
+            st.dataframe(por_grupo, use_container_width=True, hide_index=True)
+            with st.expander("Ver elementos agregados, eliminados y modificados"):
+                columnas = ["categoria", "family", "type", "diametro", "estado", "cantidad", "costo_total"]
+                st.markdown("**Agregados**")
+                st.dataframe(dif["agregados"][columnas], use_container_width=True, hide_index=True)
+                st.markdown("**Eliminados**")
+                st.dataframe(dif["eliminados"][columnas], use_container_width=True, hide_index=True)
+                st.markdown("**Modificados**")
+                st.dataframe(dif["modificados"], use_container_width=True, hide_index=True)
+        else:
+            st.success("✅ No hay diferencias entre las dos versiones.")
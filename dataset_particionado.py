@@ -0,0 +1,138 @@
+"""
+=========================================================
+SISTEMA DE ANÁLISIS BIM – TRAMO 1 | Metro 80, Medellín
+=========================================================
+Dataset Parquet particionado del maestro consolidado
+
+Estructura (particiones estilo Hive, un directorio por valor):
+  .dataset/tramo=<tramo>/_huella.json
+  .dataset/tramo=<tramo>/categoria=<cat>/estado=<estado>/parte-0.parquet
+
+Los filtros del dashboard se resuelven SIN cargar el maestro completo:
+  - tramo / categoria / estado → poda de particiones: los directorios
+    que no coinciden ni siquiera se abren
+  - type → predicado empujado al lector Parquet: los grupos de filas
+    cuyas estadísticas (min/max) no lo contienen se saltan, y solo se
+    materializan las filas que cumplen el filtro
+
+Así la memoria de una consulta queda acotada por el filtro activo y no
+por el tamaño del portafolio (todos los tramos).
+
+pyarrow es opcional: sin él `disponible()` es False y el dashboard
+filtra el snapshot en memoria como antes.
+=========================================================
+"""
+
+import json
+import os
+import shutil
+import tempfile
+
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+except ImportError:   # sin pyarrow no hay dataset particionado
+    pa = ds = None
+
+from build_maestro import BASE_DIR
+
+DIR_DATASET = os.path.join(BASE_DIR, ".dataset")
+PARTICIONES = ["categoria", "estado"]      # bajo tramo=<tramo>
+FILAS_POR_GRUPO = 4096                     # granularidad de las estadísticas por grupo de filas
+
+
+def disponible() -> bool:
+    return ds is not None
+
+
+# ─────────────────────────────────────────────────────────
+# 1. RUTAS Y VERSIÓN
+# ─────────────────────────────────────────────────────────
+def ruta_tramo(tramo: str, base_dir: str = DIR_DATASET) -> str:
+    return os.path.join(base_dir, f"tramo={tramo}")
+
+
+def _leer_version(tramo: str, base_dir: str) -> dict:
+    try:
+        with open(os.path.join(ruta_tramo(tramo, base_dir), "_huella.json"), encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def huella_dataset(tramo: str, base_dir: str = DIR_DATASET):
+    """Huella de las fuentes con que se escribió el dataset del tramo (o None)."""
+    return _leer_version(tramo, base_dir).get("huella")
+
+
+# ─────────────────────────────────────────────────────────
+# 2. ESCRITURA
+# ─────────────────────────────────────────────────────────
+def escribir_dataset(df: pd.DataFrame, tramo: str, huella: str,
+                     base_dir: str = DIR_DATASET) -> str:
+    """
+    Escribe el maestro de un tramo particionado por categoria/estado y
+    reemplaza la versión anterior del tramo. Dentro de cada partición
+    las filas se ordenan por `type`, de modo que las estadísticas de
+    cada grupo de filas permiten saltarlo con el filtro por tipo.
+    """
+    destino = ruta_tramo(tramo, base_dir)
+    os.makedirs(base_dir, exist_ok=True)
+    temporal = tempfile.mkdtemp(prefix=".tmp_", dir=base_dir)
+
+    ordenado = df.sort_values(PARTICIONES + ["type", "id"], kind="stable")
+    tabla = pa.Table.from_pandas(ordenado, preserve_index=False)
+    ds.write_dataset(tabla, temporal, format="parquet",
+                     partitioning=PARTICIONES, partitioning_flavor="hive",
+                     basename_template="parte-{i}.parquet",
+                     max_rows_per_group=FILAS_POR_GRUPO,
+                     existing_data_behavior="error")
+    with open(os.path.join(temporal, "_huella.json"), "w", encoding="utf-8") as f:
+        json.dump({"tramo": tramo, "huella": huella, "filas": int(len(df)),
+                   "columnas": [str(c) for c in df.columns]}, f)
+
+    # Reemplazo del directorio del tramo: los lectores de este proceso
+    # que ya abrieron archivos viejos los siguen leyendo sin problema.
+    anterior = None
+    if os.path.exists(destino):
+        anterior = tempfile.mkdtemp(prefix=".old_", dir=base_dir)
+        os.replace(destino, os.path.join(anterior, "tramo"))
+    os.replace(temporal, destino)
+    if anterior:
+        shutil.rmtree(anterior, ignore_errors=True)
+    return destino
+
+
+# ─────────────────────────────────────────────────────────
+# 3. LECTURA CON PODA Y PREDICADOS
+# ─────────────────────────────────────────────────────────
+def abrir_dataset(base_dir: str = DIR_DATASET):
+    # Los archivos "_huella.json" y los directorios ".tmp_"/".old_" se ignoran
+    particionado = ds.HivePartitioning.discover(infer_dictionary=True)
+    return ds.dataset(base_dir, format="parquet", partitioning=particionado)
+
+
+def leer_filtrado(tramo: str, categorias=None, estados=None, tipos=None,
+                  columnas: list = None, base_dir: str = DIR_DATASET) -> pd.DataFrame:
+    """
+    Lee solo la porción del maestro que cumple los filtros. Una lista
+    vacía o None no filtra esa dimensión. Las filas se retornan en el
+    orden original del maestro (por id).
+    """
+    filtro = ds.field("tramo") == tramo
+    if categorias:
+        filtro &= ds.field("categoria").isin(list(categorias))
+    if estados:
+        filtro &= ds.field("estado").isin(list(estados))
+    if tipos:
+        filtro &= ds.field("type").isin(list(tipos))
+
+    tabla = abrir_dataset(base_dir).to_table(filter=filtro, columns=columnas)
+    if "id" in tabla.column_names:
+        tabla = tabla.sort_by("id")
+    df = tabla.to_pandas()
+    # Las columnas de partición quedan al final del esquema → orden original del maestro
+    orden = _leer_version(tramo, base_dir).get("columnas") or list(df.columns)
+    return df[[c for c in orden if c in df.columns]]
@@ -0,0 +1,200 @@
+"""
+=========================================================
+SISTEMA DE ANÁLISIS BIM – TRAMO 1 | Metro 80, Medellín
+=========================================================
+Formatos de archivo fuente para cargar_datos
+
+Cada tabla de Revit puede llegar en tres formatos; todos producen
+el MISMO DataFrame (mismas columnas que el Excel) que esperan las
+funciones procesar_*:
+
+  - .xlsx            → pd.read_excel (openpyxl, el más lento)
+  - .txt / .csv      → exportación delimitada de tablas de Revit
+                       (UTF-16 con BOM, tabuladores, línea de título
+                       y filas de encabezado/pie de grupo), leída con
+                       el lector CSV columnar multihilo de pyarrow
+  - .parquet         → columnar binario
+
+Si existen varios formatos para la misma tabla, se usa el más rápido.
+=========================================================
+"""
+
+import csv
+import os
+
+import pandas as pd
+
+try:
+    import pyarrow.csv as pa_csv
+except ImportError:   # sin pyarrow se usa el lector C de pandas (un hilo)
+    pa_csv = None
+
+# Orden de preferencia: del más rápido al más lento de leer
+EXTENSIONES = (".parquet", ".txt", ".csv", ".xlsx")
+
+# Columnas numéricas de las tablas de Revit (pueden venir con unidades: "12.50 m")
+COLUMNAS_NUMERICAS = ("Length", "Count")
+# Columnas de longitud: si traen sufijo de unidad se convierten a metros al leer
+COLUMNAS_LONGITUD = ("Length",)
+# Sufijo de unidad de Revit → factor a metros
+SUFIJOS_LONGITUD = {"m": 1.0, "cm": 0.01, "mm": 0.001, "ft": 0.3048, "'": 0.3048,
+                    "in": 0.0254, '"': 0.0254}
+
+
+# ─────────────────────────────────────────────────────────
+# 1. RESOLUCIÓN DE RUTAS
+# ─────────────────────────────────────────────────────────
+def resolver_ruta(base_sin_extension: str) -> str:
+    """
+    Retorna la ruta del formato más rápido disponible para una tabla.
+    Si no existe ninguno, retorna la variante .xlsx (formato histórico).
+    """
+    for ext in EXTENSIONES:
+        ruta = base_sin_extension + ext
+        if os.path.exists(ruta):
+            return ruta
+    return base_sin_extension + ".xlsx"
+
+
+def detectar_formato(ruta: str) -> str:
+    ext = os.path.splitext(ruta)[1].lower()
+    if ext in (".xlsx", ".xlsm", ".xls"):
+        return "xlsx"
+    if ext in (".txt", ".csv", ".tsv"):
+        return "delimitado"
+    if ext == ".parquet":
+        return "parquet"
+    raise ValueError(f"Formato de archivo no soportado: {ruta}")
+
+
+# ─────────────────────────────────────────────────────────
+# 2. LECTURA
+# ─────────────────────────────────────────────────────────
+def leer_fuente(ruta: str) -> pd.DataFrame:
+    """Lee una tabla fuente en cualquiera de los formatos soportados."""
+    formato = detectar_formato(ruta)
+    if formato == "xlsx":
+        return pd.read_excel(ruta)
+    if formato == "parquet":
+        return pd.read_parquet(ruta)
+    return leer_revit_delimitado(ruta)
+
+
+def _detectar_codificacion(ruta: str) -> str:
+    with open(ruta, "rb") as f:
+        inicio = f.read(4)
+    if inicio.startswith((b"\xff\xfe", b"\xfe\xff")):
+        return "utf-16"
+    if inicio.startswith(b"\xef\xbb\xbf"):
+        return "utf-8-sig"
+    return "utf-8"
+
+
+def _detectar_estructura(ruta: str, codificacion: str):
+    """
+    Retorna (delimitador, filas_a_saltar). Revit antepone el título de la
+    tabla en su propia línea: la fila de encabezados es la primera que
+    tiene el número máximo de campos entre las primeras líneas.
+    """
+    with open(ruta, encoding=codificacion, newline="") as f:
+        muestra = [f.readline() for _ in range(10)]
+    muestra = [l for l in muestra if l]
+    texto = "".join(muestra)
+    if "\t" in texto:
+        delimitador = "\t"
+    else:
+        try:
+            delimitador = csv.Sniffer().sniff(texto, delimiters=",;|").delimiter
+        except csv.Error:
+            delimitador = ","
+    campos = [len(next(csv.reader([l], delimiter=delimitador), [])) for l in muestra]
+    maximo = max(campos, default=0)
+    saltar = next((i for i, n in enumerate(campos) if n == maximo), 0)
+    return delimitador, saltar
+
+
+def _separador_decimal(numeros: pd.Series) -> str:
+    """
+    Separador decimal de una columna ("." o ","), según la evidencia de
+    todos sus valores (Revit usa el formato regional en toda la tabla):
+      - '1,234.50' / '1.234,5'   → el último separador es el decimal
+      - '1.234.567' / '1,234,567' → el separador repetido agrupa miles
+      - unos valores con '.' y otros con ',' ('12.5' junto a '1,234')
+        → la coma agrupa miles y el punto es el decimal
+      - solo comas, sin más evidencia → la coma es el decimal ('12,5')
+    """
+    ambos = numeros[numeros.str.contains(".", regex=False) & numeros.str.contains(",", regex=False)]
+    if len(ambos):
+        return ambos.str.extract(r"([.,])\d*$", expand=False).mode().iloc[0]
+    if numeros.str.contains(r"\.\d*\.").any():
+        return ","
+    if numeros.str.contains(r",\d*,").any():
+        return "."
+    if numeros.str.contains(".", regex=False).any():
+        return "."
+    return "," if numeros.str.contains(",", regex=False).any() else "."
+
+
+def _numeros_revit(serie: pd.Series, sufijos: dict = None) -> tuple:
+    """
+    '1,234.50 m', '1.234,5 m', '12,5' → números (Revit exporta el valor
+    con el formato regional de la tabla).
+    Con `sufijos` ({sufijo: factor}) los valores que traen unidad se
+    multiplican por su factor. Retorna (serie numérica, unidad explícita
+    más frecuente o None si ningún valor trae sufijo).
+    """
+    if pd.api.types.is_numeric_dtype(serie):
+        return serie, None
+    partes = serie.astype(str).str.strip().str.extract(r"^(-?\d[\d.,]*)\s*([^\d\s.,-]*)")
+    numeros = partes[0].where(partes[0].notna(), "")
+    decimal = _separador_decimal(numeros[numeros != ""])
+    agrupador = "," if decimal == "." else "."
+    valores = pd.to_numeric(numeros.str.replace(agrupador, "", regex=False)
+                                   .str.replace(decimal, ".", regex=False), errors="coerce")
+    if not sufijos:
+        return valores, None
+    unidad = partes[1].fillna("").str.lower()
+    factor = unidad.map(sufijos)
+    if factor.notna().any():
+        return valores * factor.fillna(1.0), unidad[factor.notna()].mode().iloc[0]
+    return valores, None
+
+
+def leer_revit_delimitado(ruta: str) -> pd.DataFrame:
+    """
+    Lee una tabla de Revit exportada como texto delimitado.
+    - Codificación por BOM (Revit usa UTF-16 por defecto)
+    - Delimitador: tabulador (por defecto en Revit), coma, ; o |
+    - Se salta la línea de título y se descartan las filas vacías y las
+      de encabezado/pie de grupo (una sola celda con texto)
+    """
+    codificacion = _detectar_codificacion(ruta)
+    delimitador, saltar = _detectar_estructura(ruta, codificacion)
+
+    if pa_csv is not None:
+        tabla = pa_csv.read_csv(
+            ruta,
+            read_options=pa_csv.ReadOptions(skip_rows=saltar, encoding=codificacion,
+                                            use_threads=True),
+            # filas de pie/grupo con menos campos que el encabezado → se omiten
+            parse_options=pa_csv.ParseOptions(delimiter=delimitador,
+                                              invalid_row_handler=lambda fila: "skip"),
+            convert_options=pa_csv.ConvertOptions(strings_can_be_null=True),
+        )
+        df = tabla.to_pandas()
+    else:
+        df = pd.read_csv(ruta, sep=delimitador, skiprows=saltar, encoding=codificacion,
+                         on_bad_lines="skip")
+
+    df.columns = [str(c).strip() for c in df.columns]
+    df = df[df.notna().sum(axis=1) >= 2].reset_index(drop=True)
+    explicitas = {}
+    for col in COLUMNAS_NUMERICAS:
+        if col in df.columns:
+            df[col], unidad = _numeros_revit(df[col], SUFIJOS_LONGITUD if col in COLUMNAS_LONGITUD else None)
+            if unidad is not None:
+                explicitas[col] = unidad
+    # Longitudes con unidad indicada en el archivo: ya están en metros y no se infiere
+    # su unidad (unidades_longitud.py)
+    df.attrs["unidades_explicitas"] = explicitas
+    return df
@@ -0,0 +1,312 @@
+"""
+=========================================================
+SISTEMA DE ANÁLISIS BIM – TRAMO 1 | Metro 80, Medellín
+=========================================================
+Construcción de figuras Plotly para el dashboard
+
+Todas las figuras se construyen a partir de tablas YA agregadas
+(nunca de los elementos individuales) y se guardan en una caché
+LRU compartida por el proceso, con clave = huella de la tabla.
+Si los datos de entrada no cambian entre reruns, la figura no se
+vuelve a construir.
+
+Plotly se importa dentro de cada constructor (plotly.express tarda
+~60 ms): importar este módulo no cuesta nada en el arranque.
+=========================================================
+"""
+
+import hashlib
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+
+
+# ─────────────────────────────────────────────────────────
+# 1. PALETA DE COLORES
+# ─────────────────────────────────────────────────────────
+COLORES = {
+    "DEMOLIDO"           : "#64748b",
+    "NUEVO"              : "#1a56db",
+    "PERSISTENTE"        : "#93c5fd",
+    "Demolición"         : "#64748b",
+    "Nueva Construcción" : "#1a56db",
+    "DESCONOCIDO"        : "#ef4444",
+}
+
+# Decimales que se envían al navegador — reduce el tamaño del JSON de la figura
+DECIMALES_FIGURA = 2
+
+
+# ─────────────────────────────────────────────────────────
+# 2. CACHÉ DE FIGURAS
+# ─────────────────────────────────────────────────────────
+def huella_tabla(df: pd.DataFrame) -> str:
+    """
+    Huella (hash) estable de una tabla agregada: columnas + contenido.
+    Dos tablas con los mismos valores producen la misma huella.
+    """
+    h = hashlib.blake2b(digest_size=16)
+    h.update("|".join(map(str, df.columns)).encode("utf-8"))
+    h.update(pd.util.hash_pandas_object(df, index=False).values.tobytes())
+    return h.hexdigest()
+
+
+class CacheFiguras:
+    """
+    Caché LRU de figuras, segura entre hilos (Streamlit atiende cada
+    sesión en un hilo distinto). Las figuras guardadas NO se modifican
+    después de construidas: st.plotly_chart trabaja sobre una copia.
+    """
+
+    def __init__(self, max_entradas: int = 128):
+        self.max_entradas = max_entradas
+        self._figuras = OrderedDict()
+        self._lock = threading.Lock()
+        self.aciertos = 0
+        self.fallos = 0
+
+    def obtener(self, clave, constructor):
+        """Retorna la figura cacheada para `clave` o la construye con `constructor()`."""
+        with self._lock:
+            if clave in self._figuras:
+                self._figuras.move_to_end(clave)
+                self.aciertos += 1
+                return self._figuras[clave]
+            self.fallos += 1
+
+        fig = constructor()
+
+        with self._lock:
+            self._figuras[clave] = fig
+            self._figuras.move_to_end(clave)
+            while len(self._figuras) > self.max_entradas:
+                self._figuras.popitem(last=False)
+        return fig
+
+    def limpiar(self):
+        with self._lock:
+            self._figuras.clear()
+
+
+CACHE_FIGURAS = CacheFiguras()
+
+
+# ─────────────────────────────────────────────────────────
+# 3. LAYOUT UNIVERSAL PARA GRÁFICOS DE BARRAS
+# Aplica siempre el margen superior correcto para que los números
+# nunca se corten — funciona para barras grouped Y stacked.
+# ─────────────────────────────────────────────────────────
+def maximo_barras(agg: pd.DataFrame, x: str, y: str, barmode: str = "group") -> float:
+    """
+    Altura máxima de barra calculada sobre la tabla agregada.
+    - stack → mayor suma por categoría del eje X
+    - group → mayor valor individual
+    """
+    if agg.empty:
+        return 0.0
+    if barmode == "stack":
+        return float(agg.groupby(x, sort=False)[y].sum().max())
+    return float(agg[y].max())
+
+
+def barra_con_margen(fig, max_y, altura=350, margen_pct=0.20):
+    """
+    Aplica estilo y margen superior universal a cualquier figura de barras.
+    `max_y` es la altura máxima de barra, tomada de los datos agregados
+    (ver `maximo_barras`) — no se recorren los puntos de las trazas.
+    """
+    rango_y = [0, max_y * (1 + margen_pct)] if max_y and max_y > 0 else [0, 1]
+
+    fig.update_layout(
+        height=altura,
+        plot_bgcolor="white",
+        paper_bgcolor="white",
+        margin=dict(t=50, b=40, l=20, r=20),
+        yaxis=dict(range=rango_y),
+        font=dict(family="sans-serif"),
+        hovermode="x unified",   # muestra tooltip al pasar por la columna, incluso en barras de 1px
+    )
+    return fig
+
+
+# ─────────────────────────────────────────────────────────
+# 4. FIGURAS DESDE TABLAS AGREGADAS (px.bar)
+# ─────────────────────────────────────────────────────────
+def figura_barras_agregadas(agg: pd.DataFrame, x: str, y: str, color: str,
+                            titulo: str, labels: dict, barmode: str,
+                            hovertemplate: str, custom_data: list = None,
+                            category_orders: dict = None,
+                            eje_x_categorico: bool = False,
+                            altura: int = 350):
+    """
+    Gráfico de barras (group o stack) a partir de una tabla agregada.
+    Solo se envían al navegador las columnas que usa la figura, con los
+    valores redondeados a DECIMALES_FIGURA.
+    """
+    columnas = [x, y, color] + list(custom_data or [])
+    agg = agg[columnas].round(DECIMALES_FIGURA)
+    # Las columnas categóricas (maestro adjuntado desde el snapshot) se pasan
+    # como texto para que Plotly no dibuje categorías sin datos
+    agg = agg.astype({c: str for c in (x, color)
+                      if isinstance(agg[c].dtype, pd.CategoricalDtype)})
+    # El estilo también entra en la clave: misma tabla con otras etiquetas → otra figura
+    estilo = repr((sorted((labels or {}).items()), hovertemplate, list(custom_data or []),
+                   sorted((k, list(v)) for k, v in (category_orders or {}).items()),
+                   eje_x_categorico))
+    clave = ("barras", titulo, x, y, color, barmode, altura, estilo, huella_tabla(agg))
+
+    def construir():
+        import plotly.express as px     # diferido: solo al construir (no en el arranque)
+        fig = px.bar(agg, x=x, y=y, color=color,
+                     color_discrete_map=COLORES,
+                     title=titulo, labels=labels, barmode=barmode,
+                     custom_data=custom_data,
+                     category_orders=category_orders)
+        fig.update_traces(hovertemplate=hovertemplate)
+        if eje_x_categorico:
+            fig.update_layout(xaxis=dict(type="category"))
+        return barra_con_margen(fig, maximo_barras(agg, x, y, barmode), altura=altura)
+
+    return CACHE_FIGURAS.obtener(clave, construir)
+
+
+# ─────────────────────────────────────────────────────────
+# 5. FIGURAS DESDE VALORES ESCALARES (KPIs)
+# ─────────────────────────────────────────────────────────
+def figura_barras_pares(nombres, valores, colores, titulo, yaxis_title,
+                        sufijo=" m", altura=350):
+    """Una barra por traza (con leyenda), p. ej. Inicial vs Final."""
+    valores = [round(float(v), DECIMALES_FIGURA) for v in valores]
+    clave = ("pares", titulo, tuple(nombres), tuple(valores), tuple(colores), yaxis_title,
+             sufijo, altura)
+
+    def construir():
+        import plotly.graph_objects as go
+        fig = go.Figure([
+            go.Bar(name=n, x=[n], y=[v], marker_color=c,
+                   text=[f"{v:,.0f}{sufijo}"], textposition="outside")
+            for n, v, c in zip(nombres, valores, colores)
+        ])
+        fig.update_layout(title=titulo, barmode="group",
+                          showlegend=True, yaxis_title=yaxis_title)
+        return barra_con_margen(fig, max(valores, default=0), altura=altura)
+
+    return CACHE_FIGURAS.obtener(clave, construir)
+
+
+def figura_barras_estados(etiquetas, valores, unidad, yaxis_title,
+                          titulo=None, altura=280):
+    """Una sola traza con una barra por estado (Demolido / Nuevo / Persistente)."""
+    valores = [round(float(v), DECIMALES_FIGURA) for v in valores]
+    clave = ("estados", titulo, tuple(etiquetas), tuple(valores), unidad, yaxis_title, altura)
+
+    def construir():
+        import plotly.graph_objects as go
+        fig = go.Figure([go.Bar(
+            x=list(etiquetas), y=valores,
+            marker_color=["#64748b", "#1a56db", "#93c5fd"],
+            text=[f"{v:,.0f}" for v in valores], textposition="outside",
+            hovertemplate="<b>%{x}</b><br>%{y:,.0f} " + unidad + "<extra></extra>",
+        )])
+        fig.update_layout(showlegend=False, yaxis_title=yaxis_title, title=titulo)
+        return barra_con_margen(fig, max(valores, default=0), altura=altura)
+
+    return CACHE_FIGURAS.obtener(clave, construir)
+
+
+def figura_dona_inversion(costo_demolicion, costo_nuevo):
+    """Distribución de inversión: demolición vs nueva construcción."""
+    valores = (round(float(costo_demolicion)), round(float(costo_nuevo)))
+    clave = ("dona_inversion", valores)
+
+    def construir():
+        import plotly.graph_objects as go
+        fig = go.Figure([go.Pie(
+            labels=["Demolición", "Nueva Construcción"],
+            values=list(valores),
+            marker_colors=["#64748b", "#1a56db"],
+            hole=0.4, textinfo="label+percent",
+        )])
+        fig.update_layout(title="Distribución de Inversión", height=350,
+                          paper_bgcolor="white", margin=dict(t=50, b=20, l=20, r=20))
+        return fig
+
+    return CACHE_FIGURAS.obtener(clave, construir)
+
+
+def figura_gauge_integridad(score):
+    """Indicador 0–100 del score de integridad crítica."""
+    score = round(float(score), DECIMALES_FIGURA)
+    clave = ("gauge_integridad", score)
+
+    def construir():
+        import plotly.graph_objects as go
+        fig = go.Figure(go.Indicator(
+            mode="gauge+number+delta",
+            value=score,
+            title={"text": "Score Integridad Crítica", "font": {"size": 16}},
+            delta={"reference": 100, "increasing": {"color": "#16a34a"}},
+            gauge={
+                "axis": {"range": [0, 100]},
+                "bar": {"color": "#1a56db"},
+                "steps": [
+                    {"range": [0, 60],   "color": "#fee2e2"},
+                    {"range": [60, 85],  "color": "#fef9c3"},
+                    {"range": [85, 100], "color": "#dcfce7"},
+                ],
+                "threshold": {"line": {"color": "red", "width": 4}, "thickness": 0.75, "value": 85}
+            }
+        ))
+        fig.update_layout(height=280, margin=dict(t=40, b=20, l=40, r=40), paper_bgcolor="white")
+        return fig
+
+    return CACHE_FIGURAS.obtener(clave, construir)
+
+
+def figura_tendencia(fechas, valores, titulo, yaxis_title, color="#1a56db",
+                     prefijo="", sufijo="", altura=300):
+    """Evolución de un KPI entre versiones del modelo (una marca por versión)."""
+    fechas  = [pd.Timestamp(f).strftime("%Y-%m-%d %H:%M") for f in fechas]
+    valores = [round(float(v), DECIMALES_FIGURA) for v in valores]
+    clave = ("tendencia", titulo, tuple(fechas), tuple(valores), yaxis_title, color,
+             prefijo, sufijo, altura)
+
+    def construir():
+        import plotly.graph_objects as go
+        fig = go.Figure(go.Scatter(
+            x=fechas, y=valores, mode="lines+markers",
+            line=dict(color=color, width=2), marker=dict(size=7),
+            hovertemplate=f"%{{x}}<br>{prefijo}%{{y:,.1f}}{sufijo}<extra></extra>",
+        ))
+        fig.update_layout(title=titulo, yaxis_title=yaxis_title, height=altura,
+                          xaxis=dict(type="category"), showlegend=False,
+                          paper_bgcolor="white", margin=dict(t=50, b=20, l=20, r=20))
+        return fig
+
+    return CACHE_FIGURAS.obtener(clave, construir)
+
+
+def figura_sunburst(tabla: pd.DataFrame, valor: str, titulo: str, formato_valor: str,
+                    altura: int = 480):
+    """
+    Sunburst jerárquico desde una tabla de nodos ya agregada (id, padre,
+    etiqueta, valor): Plotly no agrupa nada, cada sector es una fila.
+    """
+    tabla = tabla[["id", "padre", "etiqueta", valor]].round(DECIMALES_FIGURA)
+    clave = ("sunburst", titulo, valor, formato_valor, altura, huella_tabla(tabla))
+
+    def construir():
+        import plotly.graph_objects as go
+        fig = go.Figure(go.Sunburst(
+            ids=tabla["id"], parents=tabla["padre"], labels=tabla["etiqueta"],
+            values=tabla[valor], branchvalues="total", maxdepth=3,
+            hovertemplate="<b>%{label}</b><br>" + formato_valor +
+                          "<br>%{percentRoot:.1%} del proyecto<extra></extra>",
+        ))
+        fig.update_layout(title=titulo, height=altura, paper_bgcolor="white",
+                          margin=dict(t=50, b=10, l=10, r=10),
+                          sunburstcolorway=["#1a56db", "#64748b", "#93c5fd", "#60a5fa", "#1e3a5f"])
+        return fig
+
+    return CACHE_FIGURAS.obtener(clave, construir)
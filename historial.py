@@ -0,0 +1,200 @@
+"""
+=========================================================
+SISTEMA DE ANÁLISIS BIM – TRAMO 1 | Metro 80, Medellín
+=========================================================
+Historial de versiones del DataFrame maestro
+
+Cada construcción del maestro (huella distinta de la anterior) se
+registra como una versión:
+
+  .historial/<tramo>/versiones.jsonl      → una línea por versión con
+                                            sus KPIs precalculados
+  .historial/<tramo>/v0001.npz ...        → contenido de la versión
+
+El contenido se guarda como DELTA contra la versión anterior:
+  - `origen`: para cada fila, su posición en la versión anterior
+    (-1 si es nueva), codificado en diferencias → una versión sin
+    cambios se comprime a casi nada
+  - solo las filas nuevas, con las columnas de texto codificadas en
+    diccionario (códigos + categorías)
+Cada INTERVALO_COMPLETO versiones se guarda una versión completa para
+acotar la cadena de deltas al reconstruir.
+
+La gráfica de tendencia lee solo versiones.jsonl: nunca se
+reconstruyen los modelos viejos para dibujarla.
+=========================================================
+"""
+
+import json
+import os
+import tempfile
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from build_maestro import BASE_DIR, FACTOR_DEMOLICION
+from comparacion_versiones import emparejar_hashes
+from kpis import calcular_kpis
+
+DIR_HISTORIAL = os.path.join(BASE_DIR, ".historial")
+INTERVALO_COMPLETO = 10
+
+_LOCK = threading.Lock()
+
+
+# ─────────────────────────────────────────────────────────
+# 1. ÍNDICE DE VERSIONES
+# ─────────────────────────────────────────────────────────
+def _dir_tramo(tramo: str, base_dir: str) -> str:
+    return os.path.join(base_dir, tramo)
+
+
+def listar_versiones(tramo: str, base_dir: str = DIR_HISTORIAL) -> list:
+    """Versiones registradas del tramo, de la más antigua a la más reciente."""
+    ruta = os.path.join(_dir_tramo(tramo, base_dir), "versiones.jsonl")
+    if not os.path.exists(ruta):
+        return []
+    with open(ruta, encoding="utf-8") as f:
+        return [json.loads(linea) for linea in f if linea.strip()]
+
+
+def ultima_huella(tramo: str, base_dir: str = DIR_HISTORIAL):
+    versiones = listar_versiones(tramo, base_dir)
+    return versiones[-1]["huella"] if versiones else None
+
+
+def serie_kpis(tramo: str, base_dir: str = DIR_HISTORIAL) -> pd.DataFrame:
+    """Una fila por versión: fecha + KPIs precalculados (sin tocar los .npz)."""
+    versiones = listar_versiones(tramo, base_dir)
+    if not versiones:
+        return pd.DataFrame()
+    return pd.DataFrame([{"version": v["version"], "huella": v["huella"],
+                          "fecha": pd.to_datetime(v["fecha"], unit="s"), **v["kpis"]}
+                         for v in versiones])
+
+
+def _kpis_version(df: pd.DataFrame) -> dict:
+    kpi_tec, kpi_eco, _, kpi_cal = calcular_kpis(df)
+    return dict(elementos=kpi_cal["total"],
+                long_inicial=kpi_tec["long_inicial"], long_final=kpi_tec["long_final"],
+                long_demolida=kpi_tec["long_demolida"], long_nueva=kpi_tec["long_nueva"],
+                pct_intervencion=kpi_tec["pct_intervencion"],
+                costo_nuevo=kpi_eco["costo_nuevo"], costo_demolicion=kpi_eco["costo_demolicion"],
+                inversion_total=kpi_eco["inversion_total"],
+                factor_demolicion=FACTOR_DEMOLICION)
+
+
+# ─────────────────────────────────────────────────────────
+# 2. CODIFICACIÓN DELTA
+# ─────────────────────────────────────────────────────────
+def _hash_exacto(df: pd.DataFrame) -> np.ndarray:
+    # Sin normalizar: la versión reconstruida debe ser idéntica a la original.
+    # `id` es la posición de la fila (+1), se regenera al reconstruir.
+    columnas = [c for c in df.columns if c != "id"]
+    return pd.util.hash_pandas_object(df[columnas], index=False).to_numpy()
+
+
+def _codificar_filas(df: pd.DataFrame) -> tuple:
+    arreglos, columnas = {}, []
+    for i, col in enumerate(c for c in df.columns if c != "id"):
+        serie = df[col]
+        if serie.dtype.kind in "biuf":
+            arreglos[f"c{i}"] = serie.to_numpy()
+            columnas.append({"nombre": col, "tipo": "numerico"})
+        else:
+            cat = serie if isinstance(serie.dtype, pd.CategoricalDtype) else serie.astype("category")
+            cat = cat.cat.remove_unused_categories()
+            arreglos[f"c{i}"] = cat.cat.codes.to_numpy()
+            arreglos[f"c{i}_categorias"] = np.array([str(c) for c in cat.cat.categories], dtype=str)
+            columnas.append({"nombre": col, "tipo": "categorico"})
+    return arreglos, columnas
+
+
+def _decodificar_filas(datos, columnas: list) -> pd.DataFrame:
+    salida = {}
+    for i, meta in enumerate(columnas):
+        if meta["tipo"] == "numerico":
+            salida[meta["nombre"]] = datos[f"c{i}"]
+        else:
+            salida[meta["nombre"]] = pd.Categorical.from_codes(
+                datos[f"c{i}"], categories=datos[f"c{i}_categorias"].tolist())
+    return pd.DataFrame(salida)
+
+
+def _escribir_npz(ruta: str, arreglos: dict):
+    directorio = os.path.dirname(ruta)
+    fd, temporal = tempfile.mkstemp(prefix=".tmp_", suffix=".npz", dir=directorio)
+    with os.fdopen(fd, "wb") as f:
+        np.savez_compressed(f, **arreglos)
+    os.replace(temporal, ruta)
+
+
+# ─────────────────────────────────────────────────────────
+# 3. REGISTRO Y RECONSTRUCCIÓN
+# ─────────────────────────────────────────────────────────
+def registrar_version(tramo: str, huella: str, df: pd.DataFrame, anterior: tuple = None,
+                      base_dir: str = DIR_HISTORIAL) -> bool:
+    """
+    Registra `df` como nueva versión del tramo si su huella difiere de la
+    última registrada. `anterior` = (huella, df) opcional de la versión
+    previa ya en memoria (evita reconstruirla). Retorna True si registró.
+    """
+    with _LOCK:
+        versiones = listar_versiones(tramo, base_dir)
+        if versiones and versiones[-1]["huella"] == huella:
+            return False
+        os.makedirs(_dir_tramo(tramo, base_dir), exist_ok=True)
+        numero = versiones[-1]["version"] + 1 if versiones else 1
+        completa = not versiones or (numero - 1) % INTERVALO_COMPLETO == 0
+
+        if completa:
+            origen = np.full(len(df), -1, dtype="int64")
+        else:
+            previa = versiones[-1]
+            if anterior is None or anterior[0] != previa["huella"]:
+                anterior = (previa["huella"], materializar_version(tramo, previa["version"], base_dir))
+            pos_prev, pos_nueva = emparejar_hashes(_hash_exacto(anterior[1]), _hash_exacto(df))
+            origen = np.full(len(df), -1, dtype="int64")
+            origen[pos_nueva] = pos_prev
+
+        nuevas = df.iloc[np.flatnonzero(origen < 0)]
+        arreglos, columnas = _codificar_filas(nuevas)
+        arreglos["origen_dif"] = np.diff(origen, prepend=0)
+        archivo = f"v{numero:04d}.npz"
+        _escribir_npz(os.path.join(_dir_tramo(tramo, base_dir), archivo), arreglos)
+
+        registro = {"version": numero, "huella": huella, "fecha": time.time(),
+                    "archivo": archivo, "base": None if completa else numero - 1,
+                    "filas": int(len(df)), "filas_nuevas": int(len(nuevas)),
+                    "columnas": columnas, "orden": [str(c) for c in df.columns],
+                    "kpis": _kpis_version(df)}
+        with open(os.path.join(_dir_tramo(tramo, base_dir), "versiones.jsonl"), "a", encoding="utf-8") as f:
+            f.write(json.dumps(registro, ensure_ascii=False) + "\n")
+        return True
+
+
+def materializar_version(tramo: str, version: int, base_dir: str = DIR_HISTORIAL) -> pd.DataFrame:
+    """Reconstruye una versión aplicando los deltas desde la última versión completa."""
+    por_numero = {v["version"]: v for v in listar_versiones(tramo, base_dir)}
+    cadena = [por_numero[version]]
+    while cadena[-1]["base"] is not None:
+        cadena.append(por_numero[cadena[-1]["base"]])
+
+    df = None
+    for registro in reversed(cadena):
+        with np.load(os.path.join(_dir_tramo(tramo, base_dir), registro["archivo"])) as datos:
+            origen = np.cumsum(datos["origen_dif"])
+            nuevas = _decodificar_filas(datos, registro["columnas"])
+        reusadas = np.flatnonzero(origen >= 0)
+        partes = [nuevas.set_axis(np.flatnonzero(origen < 0))]
+        if df is not None and len(reusadas):
+            partes.insert(0, df.drop(columns="id").iloc[origen[reusadas]].set_axis(reusadas))
+        df = pd.concat(partes).sort_index()
+        for col in df.columns:   # categorías distintas entre partes → texto; se re-codifica
+            if df[col].dtype.kind not in "biuf" and not isinstance(df[col].dtype, pd.CategoricalDtype):
+                df[col] = df[col].astype("category")
+        df.insert(0, "id", np.arange(1, len(df) + 1))
+        df = df[[c for c in registro["orden"] if c in df.columns]]
+    return df.reset_index(drop=True)
@@ -0,0 +1,89 @@
+"""
+=========================================================
+SISTEMA DE ANÁLISIS BIM – TRAMO 1 | Metro 80, Medellín
+=========================================================
+Desglose jerárquico por sistema de telecomunicaciones
+
+Jerarquía (de la raíz a las hojas):
+  categoria_sistema → nombre_sistema → categoria → type
+
+Con un solo groupby del maestro (con costos) se obtienen las hojas;
+cada nivel superior se suma a partir del nivel de abajo (pocas filas).
+Todos los nodos quedan en un diccionario ruta → medidas, y cada ruta
+tiene la lista de sus hijos: desplegar un nodo es O(hijos), sin volver
+a agrupar el maestro. Se construye una vez por snapshot y factor.
+
+Medidas por nodo: elementos, longitud (m de Conduits), costo nuevo,
+costo de demolición y costo total (pesos enteros → sumas exactas).
+=========================================================
+"""
+
+import numpy as np
+import pandas as pd
+
+NIVELES = ["categoria_sistema", "nombre_sistema", "categoria", "type"]
+ETIQUETAS_NIVEL = {"categoria_sistema": "Categoría de Sistema", "nombre_sistema": "Sistema",
+                   "categoria": "Categoría", "type": "Tipo"}
+MEDIDAS = ["elementos", "longitud", "costo_nuevo", "costo_demolicion", "costo_total"]
+SIN_ASIGNAR = "(sin asignar)"
+RAIZ = ()
+
+
+class RollupSistemas:
+    """Árbol de agregados por sistema con búsqueda de hijos por ruta."""
+
+    def __init__(self, df: pd.DataFrame):
+        base = pd.DataFrame({
+            **{n: df[n] for n in NIVELES},
+            "elementos": 1,
+            "longitud": np.where(df["categoria"] == "Conduits", df["cantidad"].fillna(0), 0.0),
+            **{c: df[c].fillna(0) for c in ["costo_nuevo", "costo_demolicion", "costo_total"]},
+        })
+        hojas = base.groupby(NIVELES, observed=True, dropna=False)[MEDIDAS].sum().reset_index()
+        for n in NIVELES:
+            hojas[n] = hojas[n].astype(object).where(hojas[n].notna(), SIN_ASIGNAR).astype(str)
+
+        self.nodos = {RAIZ: self._medidas(hojas[MEDIDAS].sum())}
+        self._hijos = {}
+        for k in range(1, len(NIVELES) + 1):
+            nivel = hojas.groupby(NIVELES[:k], sort=False)[MEDIDAS].sum()
+            for clave, fila in zip(nivel.index, nivel.itertuples(index=False)):
+                ruta = clave if isinstance(clave, tuple) else (clave,)
+                self.nodos[ruta] = self._medidas(fila._asdict())
+                self._hijos.setdefault(ruta[:-1], []).append(ruta)
+        for hijos in self._hijos.values():
+            hijos.sort(key=lambda r: (-self.nodos[r]["costo_total"], r[-1]))
+
+        # Tabla plana de todos los nodos (ids / parents) para el sunburst
+        rutas = [r for r in self.nodos if r != RAIZ]
+        self.tabla = pd.DataFrame({
+            "id"     : [" › ".join(r) for r in rutas],
+            "padre"  : [" › ".join(r[:-1]) for r in rutas],
+            "etiqueta": [r[-1] for r in rutas],
+            "nivel"  : [NIVELES[len(r) - 1] for r in rutas],
+            **{m: [self.nodos[r][m] for r in rutas] for m in MEDIDAS},
+        })
+
+    @staticmethod
+    def _medidas(valores) -> dict:
+        return {m: float(valores[m]) if m == "longitud" else int(valores[m]) for m in MEDIDAS}
+
+    # ── Consultas O(hijos) ──
+    def nodo(self, ruta: tuple = RAIZ) -> dict:
+        return self.nodos[tuple(ruta)]
+
+    def hijos(self, ruta: tuple = RAIZ) -> pd.DataFrame:
+        """Hijos directos de `ruta` con sus medidas, de mayor a menor costo total."""
+        rutas = self._hijos.get(tuple(ruta), [])
+        return pd.DataFrame([{"nombre": r[-1], **self.nodos[r]} for r in rutas],
+                            columns=["nombre"] + MEDIDAS)
+
+    def rutas_desplegables(self) -> list:
+        """Rutas con hijos (raíz incluida), en orden de recorrido del árbol."""
+        orden, pila = [], [RAIZ]
+        while pila:
+            ruta = pila.pop()
+            if ruta in self._hijos:
+                orden.append(ruta)
+                pila.extend(reversed(self._hijos[ruta]))
+        return orden
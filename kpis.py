@@ -0,0 +1,245 @@
+"""
+=========================================================
+SISTEMA DE ANÁLISIS BIM – TRAMO 1 | Metro 80, Medellín
+=========================================================
+KPIs técnicos, económicos, de conteo y de calidad
+
+Los KPIs se calculan combinando agregados parciales (sumas, conteos e
+ids distintos) por lotes de filas, así que el maestro nunca tiene que
+estar completo en memoria:
+
+  - En el dashboard, un solo lote = el maestro del tramo
+  - Para el portafolio (todas las líneas / tramos), los lotes son los
+    grupos de filas del dataset Parquet particionado o rebanadas del
+    snapshot memory-mapped; la memoria queda acotada por el tamaño del
+    lote y no por el número de elementos
+
+Las cantidades se acumulan de forma EXACTA (sumandos de math.fsum) y
+los costos son pesos enteros sumados como enteros, por lo que el
+resultado es idéntico bit a bit sin importar cómo se partan las filas
+en lotes.
+
+Uso (KPIs del portafolio desde el dataset particionado):
+    python kpis.py [Tramo1 ...]
+=========================================================
+"""
+
+import math
+import sys
+
+import numpy as np
+import pandas as pd
+
+from build_maestro import FACTOR_DEMOLICION, calcular_costos
+
+CATEGORIAS_KPI = ("Conduits", "Fittings", "Fixtures")
+ESTADOS_KPI    = ("DEMOLIDO", "NUEVO", "PERSISTENTE")
+
+# Columnas que necesitan los KPIs (y calcular_costos) — lo único que se lee por lote
+COLUMNAS_KPI = ["id", "categoria", "estado", "cantidad", "diametro", "precio_unitario",
+                "precio_encontrado", "nombre_sistema", "categoria_sistema", "dato_corregido",
+                "costo_nuevo", "costo_demolicion"]
+FILAS_POR_LOTE = 65_536
+
+
+# ─────────────────────────────────────────────────────────
+# 1. SUMA EXACTA
+# ─────────────────────────────────────────────────────────
+def _sumandos(valores) -> list:
+    """
+    Descompone la suma de `valores` (sin NaN) en unos pocos floats cuya
+    suma exacta es la suma exacta de los valores. Juntando los sumandos
+    de todos los lotes, math.fsum da el total correctamente redondeado,
+    el mismo para cualquier partición en lotes.
+    """
+    restantes = [v for v in np.asarray(valores, dtype="float64").tolist() if v == v]
+    sumandos = []
+    while restantes:
+        parcial = math.fsum(restantes)
+        if parcial == 0.0:
+            break
+        sumandos.append(parcial)
+        restantes.append(-parcial)
+    return sumandos
+
+
+def _pesos(serie: pd.Series) -> int:
+    """Suma exacta de una columna de costos (pesos enteros; int64 o float64 de snapshots viejos)."""
+    if serie.dtype.kind in "iu":
+        # La suma en int64 se desborda sin aviso (hasta 2^53 por elemento):
+        # se suman por separado los 32 bits altos y bajos y se juntan como int
+        valores = serie.to_numpy(dtype="int64")
+        return int((valores >> 32).sum()) * 2**32 + int((valores & 0xFFFFFFFF).sum())
+    return int(round(math.fsum(_sumandos(serie))))
+
+
+# ─────────────────────────────────────────────────────────
+# 2. AGREGADO COMBINABLE
+# ─────────────────────────────────────────────────────────
+class AgregadoKPI:
+    """
+    Agregados parciales de los KPIs. `agregar(lote)` acumula un lote de
+    filas (ya con costos), `combinar(otro)` une dos agregados y
+    `resultado()` retorna (kpi_tec, kpi_eco, kpi_cnt, kpi_cal).
+    """
+
+    def __init__(self):
+        self.filas = 0
+        self.cantidad = {(c, e): [] for c in CATEGORIAS_KPI for e in ESTADOS_KPI}
+        self.costo_nuevo = 0             # pesos enteros (int de Python: sin desborde)
+        self.costo_demolicion = 0
+        self.conteos = dict(sin_longitud=0, sin_diametro=0, sin_fase=0,
+                            sin_precio=0, sin_sistema=0, sin_cat_sistema=0)
+        self.ids = {}                    # tramo → [arreglos de ids distintos]
+
+    def agregar(self, df: pd.DataFrame):
+        self.filas += len(df)
+        categoria = df["categoria"].astype(str).to_numpy()
+        estado    = df["estado"].astype(str).to_numpy()
+        cantidad  = df["cantidad"].to_numpy(dtype="float64", na_value=np.nan)
+
+        for (cat, est), sumandos in self.cantidad.items():
+            sumandos.extend(_sumandos(cantidad[(categoria == cat) & (estado == est)]))
+        self.costo_nuevo      += _pesos(df["costo_nuevo"])
+        self.costo_demolicion += _pesos(df["costo_demolicion"])
+
+        es_conduit = categoria == "Conduits"
+        self.conteos["sin_longitud"]    += int(np.count_nonzero(es_conduit & ~(cantidad > 0)))
+        self.conteos["sin_diametro"]    += int(np.count_nonzero(
+            np.isin(categoria, ["Conduits", "Fittings"])
+            & df["diametro"].isin(["nan", "N/A", ""]).to_numpy()))
+        self.conteos["sin_fase"]        += int(np.count_nonzero(estado == "DESCONOCIDO"))
+        self.conteos["sin_precio"]      += int((~df["precio_encontrado"].astype(bool)).sum())
+        self.conteos["sin_sistema"]     += int(df["nombre_sistema"].isna().sum())
+        self.conteos["sin_cat_sistema"] += int(df["categoria_sistema"].isna().sum())
+
+        # Los ids son únicos por tramo: en el portafolio se deduplican por (tramo, id)
+        if "tramo" in df.columns:
+            for tramo, ids in df["id"].groupby(df["tramo"].astype(str).to_numpy(), sort=False):
+                self._agregar_ids(tramo, np.unique(ids.to_numpy()))
+        else:
+            self._agregar_ids(None, np.unique(df["id"].to_numpy()))
+        return self
+
+    def _agregar_ids(self, tramo, distintos):
+        lista = self.ids.setdefault(tramo, [])
+        lista.append(distintos)
+        if len(lista) >= 64:             # compactar → memoria ~ ids distintos, no lotes
+            self.ids[tramo] = [np.unique(np.concatenate(lista))]
+
+    def combinar(self, otro: "AgregadoKPI"):
+        self.filas += otro.filas
+        for clave, sumandos in otro.cantidad.items():
+            self.cantidad[clave].extend(sumandos)
+        self.costo_nuevo      += otro.costo_nuevo
+        self.costo_demolicion += otro.costo_demolicion
+        for clave, n in otro.conteos.items():
+            self.conteos[clave] += n
+        for tramo, lista in otro.ids.items():
+            for distintos in lista:
+                self._agregar_ids(tramo, distintos)
+        return self
+
+    def _ids_duplicados(self) -> int:
+        distintos = sum(len(np.unique(np.concatenate(lista))) for lista in self.ids.values() if lista)
+        return self.filas - distintos
+
+    def resultado(self):
+        long = {clave: math.fsum(s) for clave, s in self.cantidad.items()}
+
+        long_demolida    = long[("Conduits", "DEMOLIDO")]
+        long_nueva       = long[("Conduits", "NUEVO")]
+        long_persistente = long[("Conduits", "PERSISTENTE")]
+        long_inicial     = long_demolida + long_persistente
+        long_final       = long_nueva + long_persistente
+        total_base       = long_inicial + long_nueva
+        pct_intervencion = (long_demolida + long_nueva) / total_base * 100 if total_base > 0 else 0
+        kpi_tec = dict(long_inicial=long_inicial, long_demolida=long_demolida,
+                       long_nueva=long_nueva, long_persistente=long_persistente,
+                       long_final=long_final, pct_intervencion=pct_intervencion)
+
+        costo_demol = float(self.costo_demolicion)
+        costo_nuevo = float(self.costo_nuevo)
+        inversion   = costo_demol + costo_nuevo
+        kpi_eco = dict(costo_demolicion=costo_demol, costo_nuevo=costo_nuevo,
+                       inversion_total=inversion,
+                       pct_demol=costo_demol/inversion*100 if inversion>0 else 0,
+                       pct_nuevo=costo_nuevo/inversion*100 if inversion>0 else 0)
+
+        kpi_cnt = {}
+        for cat in CATEGORIAS_KPI:
+            convertir = float if cat == "Conduits" else int   # longitud vs. unidades
+            kpi_cnt[cat] = {est.lower(): convertir(long[(cat, est)]) for est in ESTADOS_KPI}
+
+        total = self.filas
+        c = self.conteos
+        ids_duplicados = self._ids_duplicados()
+        kpi_cal = dict(total=total,
+                       sin_longitud=c["sin_longitud"], sin_diametro=c["sin_diametro"],
+                       sin_fase=c["sin_fase"], ids_duplicados=ids_duplicados,
+                       pct_critico=(c["sin_longitud"]+c["sin_diametro"]+c["sin_fase"]+ids_duplicados)/total*100 if total>0 else 0,
+                       sin_precio=c["sin_precio"], sin_sistema=c["sin_sistema"],
+                       pct_std=c["sin_precio"]/total*100 if total>0 else 0,
+                       sin_cat_sistema=c["sin_cat_sistema"],
+                       pct_nc=c["sin_cat_sistema"]/total*100 if total>0 else 0)
+        return kpi_tec, kpi_eco, kpi_cnt, kpi_cal
+
+
+def calcular_kpis(df: pd.DataFrame):
+    """KPIs de un maestro (con costos) en memoria: un solo lote."""
+    return AgregadoKPI().agregar(df).resultado()
+
+
+# ─────────────────────────────────────────────────────────
+# 3. MOTOR POR LOTES (fuera de memoria)
+# ─────────────────────────────────────────────────────────
+def kpis_por_lotes(lotes, factor_demolicion: float = None):
+    """
+    KPIs a partir de un iterable de lotes del maestro. Si se da
+    `factor_demolicion`, los costos de cada lote se recalculan con ese
+    factor (el cálculo es fila a fila, así que es exacto por lotes).
+    """
+    agregado = AgregadoKPI()
+    for lote in lotes:
+        if factor_demolicion is not None:
+            lote = calcular_costos(lote, factor_demolicion, verbose=False)
+        agregado.agregar(lote)
+    return agregado.resultado()
+
+
+def lotes_snapshot(ruta: str, filas_por_lote: int = FILAS_POR_LOTE):
+    """Rebanadas del snapshot memory-mapped: solo se tocan las páginas de cada lote."""
+    from almacen_columnar import adjuntar_snapshot
+    df = adjuntar_snapshot(ruta, columnas=COLUMNAS_KPI)
+    for inicio in range(0, len(df), filas_por_lote):
+        yield df.iloc[inicio:inicio + filas_por_lote]
+
+
+def lotes_dataset(tramos: list = None, filas_por_lote: int = FILAS_POR_LOTE, base_dir: str = None,
+                  columnas: list = None):
+    """Lotes del dataset Parquet particionado (todos los tramos o solo `tramos`)."""
+    from dataset_particionado import DIR_DATASET, abrir_dataset, ds
+    filtro = ds.field("tramo").isin(list(tramos)) if tramos else None
+    # Sin hilos el escáner no lee por adelantado: un solo lote en memoria a la vez
+    escaner = abrir_dataset(base_dir or DIR_DATASET).scanner(
+        columns=(columnas or COLUMNAS_KPI) + ["tramo"], filter=filtro, batch_size=filas_por_lote,
+        use_threads=False)
+    for lote in escaner.to_batches():
+        if lote.num_rows:
+            yield lote.to_pandas()
+
+
+def kpis_portafolio(factor_demolicion: float = FACTOR_DEMOLICION, tramos: list = None):
+    return kpis_por_lotes(lotes_dataset(tramos), factor_demolicion)
+
+
+if __name__ == "__main__":
+    tramos = sys.argv[1:] or None
+    print(f"📊 KPIs del portafolio ({', '.join(tramos) if tramos else 'todos los tramos'})...")
+    kpi_tec, kpi_eco, kpi_cnt, kpi_cal = kpis_portafolio(FACTOR_DEMOLICION, tramos)
+    print(f"  Elementos           : {kpi_cal['total']:,}")
+    print(f"  Longitud inicial    : {kpi_tec['long_inicial']:,.0f} m")
+    print(f"  Longitud final      : {kpi_tec['long_final']:,.0f} m")
+    print(f"  % Intervención      : {kpi_tec['pct_intervencion']:.1f}%")
+    print(f"  Inversión total     : $ {kpi_eco['inversion_total']:,.0f}")
+    print(f"  % Datos críticos    : {kpi_cal['pct_critico']:.1f}%")
@@ -0,0 +1,136 @@
+"""
+=========================================================
+SISTEMA DE ANÁLISIS BIM – TRAMO 1 | Metro 80, Medellín
+=========================================================
+Perfil de arranque del dashboard (tiempo de importación)
+
+Importa, en un proceso nuevo (caché de módulos vacía, como un
+contenedor recién levantado), exactamente los módulos que importa
+dashboard.py, con `python -X importtime`, y reporta:
+
+  - costo acumulado de cada import de dashboard.py (lo que tarda en
+    terminar esa línea, incluidas sus dependencias aún no cargadas)
+  - costo propio por paquete raíz (pandas, streamlit, pyarrow, ...)
+    → qué librería se lleva el tiempo de arranque
+  - opcionalmente (--rerun), el primer rerun completo de la app en
+    frío con el API de pruebas de Streamlit
+
+Las dependencias pesadas que no hacen falta para pintar la primera
+pantalla (plotly.express, duckdb) se importan de forma diferida donde
+se usan; este reporte sirve para vigilar que no vuelvan al arranque.
+
+Uso:
+    python perfil_arranque.py            # imports
+    python perfil_arranque.py --rerun    # + primer rerun en frío
+=========================================================
+"""
+
+import argparse
+import ast
+import os
+import re
+import subprocess
+import sys
+from collections import defaultdict
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DASHBOARD = os.path.join(BASE_DIR, "dashboard.py")
+_LINEA = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+
+# ─────────────────────────────────────────────────────────
+# 1. IMPORTS DE dashboard.py
+# ─────────────────────────────────────────────────────────
+def modulos_dashboard(ruta: str = DASHBOARD) -> list:
+    """Módulos importados en el nivel superior de `ruta`, en orden."""
+    with open(ruta, encoding="utf-8") as f:
+        arbol = ast.parse(f.read())
+    modulos = []
+    for nodo in arbol.body:
+        if isinstance(nodo, ast.Import):
+            modulos.extend(a.name for a in nodo.names)
+        elif isinstance(nodo, ast.ImportFrom) and nodo.module:
+            modulos.append(nodo.module)
+    return list(dict.fromkeys(modulos))
+
+
+def medir_importaciones(modulos: list) -> list:
+    """
+    Importa `modulos` en un proceso nuevo con -X importtime.
+    Retorna [(módulo, propio_ms, acumulado_ms, nivel)] en orden de carga.
+    """
+    codigo = f"import sys; sys.path.insert(0, {BASE_DIR!r})\n" + \
+             "\n".join(f"import {m}" for m in modulos)
+    salida = subprocess.run([sys.executable, "-X", "importtime", "-c", codigo],
+                            capture_output=True, text=True, cwd=BASE_DIR)
+    if salida.returncode != 0:
+        raise RuntimeError(salida.stderr.strip().splitlines()[-1])
+    registros = []
+    for linea in salida.stderr.splitlines():
+        coincidencia = _LINEA.match(linea)
+        if coincidencia:
+            propio, acumulado, sangria, nombre = coincidencia.groups()
+            registros.append((nombre, int(propio) / 1000, int(acumulado) / 1000, len(sangria) // 2))
+    return registros
+
+
+# ─────────────────────────────────────────────────────────
+# 2. REPORTE
+# ─────────────────────────────────────────────────────────
+def perfil_importaciones(modulos: list = None) -> dict:
+    modulos = modulos or modulos_dashboard()
+    registros = medir_importaciones(modulos)
+    # Cada import de dashboard.py: la entrada de nivel 0 con ese nombre
+    # (si ya lo había cargado un import anterior, su costo es 0)
+    acumulado = {nombre: ms for nombre, _, ms, nivel in registros if nivel == 0}
+    por_import = [(m, acumulado.get(m, 0.0)) for m in modulos]
+    por_paquete = defaultdict(float)
+    for nombre, propio, _, _ in registros:
+        por_paquete[nombre.split(".")[0]] += propio
+    return dict(
+        total_ms=sum(ms for _, ms in por_import),
+        por_import=sorted(por_import, key=lambda x: -x[1]),
+        por_paquete=sorted(por_paquete.items(), key=lambda x: -x[1]),
+        modulos_cargados=len(registros),
+    )
+
+
+def medir_primer_rerun() -> float:
+    """Segundos del primer rerun de la app en un proceso nuevo (imports + datos + pestañas)."""
+    codigo = ("import sys, time; sys.path.insert(0, {base!r})\n"
+              "t = time.perf_counter()\n"
+              "from streamlit.testing.v1 import AppTest\n"
+              "at = AppTest.from_file({app!r}, default_timeout=600).run()\n"
+              "assert not at.exception, at.exception\n"
+              "print(time.perf_counter() - t)").format(base=BASE_DIR, app=DASHBOARD)
+    salida = subprocess.run([sys.executable, "-c", codigo], capture_output=True, text=True, cwd=BASE_DIR)
+    if salida.returncode != 0:
+        raise RuntimeError(salida.stderr.strip().splitlines()[-1])
+    return float(salida.stdout.strip().splitlines()[-1])
+
+
+def imprimir_perfil(perfil: dict, top: int = 12, primer_rerun: float = None):
+    print("\n" + "="*55)
+    print("  ⏱️  PERFIL DE ARRANQUE – dashboard.py")
+    print("="*55)
+    print(f"  Imports de dashboard.py  : {perfil['total_ms']:,.0f} ms "
+          f"({perfil['modulos_cargados']:,} módulos cargados)")
+    print("\n  Por import (acumulado):")
+    for nombre, ms in perfil["por_import"][:top]:
+        print(f"     {nombre:<28} {ms:>8,.1f} ms")
+    print("\n  Por paquete (tiempo propio):")
+    for nombre, ms in perfil["por_paquete"][:top]:
+        print(f"     {nombre:<28} {ms:>8,.1f} ms")
+    if primer_rerun is not None:
+        print(f"\n  Primer rerun en frío      : {primer_rerun:,.2f} s")
+    print("="*55)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Perfil de importación del arranque de dashboard.py")
+    parser.add_argument("--top", type=int, default=12)
+    parser.add_argument("--rerun", action="store_true",
+                        help="Mide también el primer rerun completo en frío")
+    args = parser.parse_args()
+    imprimir_perfil(perfil_importaciones(), args.top,
+                    medir_primer_rerun() if args.rerun else None)
@@ -0,0 +1,246 @@
+"""
+=========================================================
+SISTEMA DE ANÁLISIS BIM – TRAMO 1 | Metro 80, Medellín
+=========================================================
+Prueba de carga local del dashboard (sin red)
+
+Simula N sesiones concurrentes con el API de pruebas de Streamlit
+(streamlit.testing.v1.AppTest): todas corren en este proceso y comparten
+el almacén de datos y el caché de figuras, igual que las sesiones de un
+servidor real. Cada sesión hace una secuencia de interacciones al azar
+(semilla fija → reproducible):
+
+  - barrido del slider del factor de demolición
+  - combinaciones de filtros (categoría, estado, tipo)
+  - versión a comparar en Integridad del Modelo (si hay)
+
+Streamlit ejecuta todas las pestañas en cada rerun, así que cada
+interacción ya recorre las tres pestañas.
+
+Reporta latencia de rerun (p50 / p95 / p99), RSS pico del proceso y
+tasa de aciertos del almacén y del caché de figuras. Con --p95-max el
+proceso termina con código 1 si se supera → sirve de compuerta antes
+de desplegar.
+
+Uso:
+    python prueba_carga.py --sesiones 8 --interacciones 15 --p95-max 2.5
+=========================================================
+"""
+
+import argparse
+import json
+import os
+import random
+import resource
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from streamlit.testing.v1 import AppTest
+
+from almacen_datos import ALMACEN
+from coordinador import obtener_coordinador
+from graficos import CACHE_FIGURAS
+
+DASHBOARD = os.path.join(os.path.dirname(os.path.abspath(__file__)), "dashboard.py")
+TRAMO = "Tramo1"
+TIMEOUT_RERUN = 300
+FACTORES = [10, 15, 20, 25, 30, 35, 40]
+ESTADOS = ["DEMOLIDO", "NUEVO", "PERSISTENTE"]
+
+
+# ─────────────────────────────────────────────────────────
+# 1. MEDICIÓN
+# ─────────────────────────────────────────────────────────
+def rss_mb() -> float:
+    """RSS actual del proceso (Linux: /proc; en otro sistema, el pico)."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1024 / 1024
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+class MonitorMemoria:
+    """Muestrea el RSS en segundo plano y guarda el pico."""
+
+    def __init__(self, intervalo: float = 0.05):
+        self.intervalo = intervalo
+        self.pico = rss_mb()
+        self._parar = threading.Event()
+        self._hilo = threading.Thread(target=self._muestrear, daemon=True)
+
+    def _muestrear(self):
+        while not self._parar.wait(self.intervalo):
+            self.pico = max(self.pico, rss_mb())
+
+    def __enter__(self):
+        self._hilo.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._parar.set()
+        self._hilo.join()
+        self.pico = max(self.pico, rss_mb())
+
+
+def _medir(latencias: list, errores: list, etiqueta: str, accion):
+    inicio = time.perf_counter()
+    at = accion()
+    latencias.append((etiqueta, time.perf_counter() - inicio))
+    errores.extend(f"{etiqueta}: {e.value}" for e in at.exception)
+
+
+# ─────────────────────────────────────────────────────────
+# 2. SESIÓN SIMULADA
+# ─────────────────────────────────────────────────────────
+def compartir_cache_de_scripts():
+    """
+    Una sola ScriptCache para todas las sesiones, como en el servidor real
+    (AppTest crea una por sesión). Además evita compilar dashboard.py en
+    varios hilos a la vez: ast.parse de Python 3.11 no es seguro entre
+    hilos y deja reruns sin elementos.
+    """
+    from streamlit.runtime.scriptrunner.script_cache import ScriptCache
+    from streamlit.testing.v1 import app_test, local_script_runner
+
+    compartida = ScriptCache()
+    app_test.ScriptCache = local_script_runner.ScriptCache = lambda: compartida
+
+
+def _widget(lista, etiqueta):
+    return next((w for w in lista if w.label == etiqueta), None)
+
+
+def simular_sesion(numero: int, interacciones: int, semilla: int) -> tuple:
+    """Corre una sesión; retorna ([(interacción, segundos)], [errores])."""
+    azar = random.Random(semilla + numero)
+    latencias, errores = [], []
+    at = AppTest.from_file(DASHBOARD, default_timeout=TIMEOUT_RERUN)
+    _medir(latencias, errores, "inicial", at.run)
+
+    for _ in range(interacciones):
+        accion = azar.choice(["factor", "categoria", "estado", "tipo", "version"])
+        if not at.slider or _widget(at.selectbox, "Categoría") is None:
+            errores.append(f"{accion}: el rerun anterior no dibujó los filtros")
+            _medir(latencias, errores, "rerun", at.run)
+        elif accion == "factor":
+            _medir(latencias, errores, accion,
+                   lambda: at.slider[0].set_value(azar.choice(FACTORES)).run())
+        elif accion == "categoria":
+            widget = _widget(at.selectbox, "Categoría")
+            _medir(latencias, errores, accion,
+                   lambda: widget.set_value(azar.choice(widget.options)).run())
+        elif accion == "estado":
+            estados = azar.sample(ESTADOS, azar.randint(1, len(ESTADOS)))
+            _medir(latencias, errores, accion,
+                   lambda: _widget(at.multiselect, "Estado").set_value(estados).run())
+        elif accion == "tipo":
+            widget = _widget(at.multiselect, "Tipo / Familia")
+            tipos = azar.sample(list(widget.options), min(len(widget.options), azar.randint(0, 2)))
+            _medir(latencias, errores, accion, lambda: widget.set_value(tipos).run())
+        else:
+            widget = _widget(at.selectbox, "Comparar la versión vigente con")
+            if widget is None:           # sin versiones anteriores → rerun simple
+                _medir(latencias, errores, "rerun", at.run)
+            else:
+                _medir(latencias, errores, accion,
+                       lambda: widget.select_index(azar.randrange(len(widget.options))).run())
+    return latencias, errores
+
+
+# ─────────────────────────────────────────────────────────
+# 3. PRUEBA COMPLETA
+# ─────────────────────────────────────────────────────────
+def prueba_carga(sesiones: int = 4, interacciones: int = 10, semilla: int = 80) -> dict:
+    compartir_cache_de_scripts()
+    # Calentamiento: el primer rerun del proceso carga (o construye) el maestro
+    print("🔥 Calentando (carga del maestro)...")
+    AppTest.from_file(DASHBOARD, default_timeout=TIMEOUT_RERUN).run()
+    obtener_coordinador(TRAMO).esperar(TIMEOUT_RERUN)
+
+    almacen_0 = ALMACEN.estadisticas()
+    figuras_0 = (CACHE_FIGURAS.aciertos, CACHE_FIGURAS.fallos)
+    rss_inicial = rss_mb()
+
+    print(f"🚦 {sesiones} sesiones concurrentes × {interacciones} interacciones...")
+    inicio = time.perf_counter()
+    with MonitorMemoria() as memoria, ThreadPoolExecutor(max_workers=sesiones) as ejecutor:
+        resultados = list(ejecutor.map(lambda n: simular_sesion(n, interacciones, semilla),
+                                       range(sesiones)))
+    duracion = time.perf_counter() - inicio
+
+    latencias = [l for lat, _ in resultados for l in lat]
+    errores = [e for _, err in resultados for e in err]
+    segundos = np.array([s for _, s in latencias])
+    almacen_1 = ALMACEN.estadisticas()
+    aciertos = almacen_1["aciertos"] - almacen_0["aciertos"]
+    fallos = almacen_1["fallos"] - almacen_0["fallos"]
+    fig_aciertos = CACHE_FIGURAS.aciertos - figuras_0[0]
+    fig_fallos = CACHE_FIGURAS.fallos - figuras_0[1]
+
+    por_accion = {}
+    for accion, s in latencias:
+        por_accion.setdefault(accion, []).append(s)
+
+    return dict(
+        sesiones=sesiones, interacciones=interacciones, reruns=len(segundos),
+        duracion_s=duracion, reruns_por_s=len(segundos) / duracion if duracion else 0.0,
+        p50_s=float(np.percentile(segundos, 50)), p95_s=float(np.percentile(segundos, 95)),
+        p99_s=float(np.percentile(segundos, 99)), max_s=float(segundos.max()),
+        p95_por_accion={a: float(np.percentile(v, 95)) for a, v in sorted(por_accion.items())},
+        rss_inicial_mb=rss_inicial, rss_pico_mb=memoria.pico,
+        almacen_aciertos=aciertos, almacen_fallos=fallos,
+        almacen_tasa=aciertos / (aciertos + fallos) if aciertos + fallos else 0.0,
+        almacen_mb=almacen_1["mb_usados"], almacen_expulsiones=almacen_1["expulsiones"] - almacen_0["expulsiones"],
+        figuras_tasa=fig_aciertos / (fig_aciertos + fig_fallos) if fig_aciertos + fig_fallos else 0.0,
+        errores=errores,
+    )
+
+
+def imprimir_reporte(r: dict):
+    print("\n" + "="*55)
+    print("  🚦 PRUEBA DE CARGA – dashboard.py")
+    print("="*55)
+    print(f"  Sesiones × interacciones : {r['sesiones']} × {r['interacciones']}  ({r['reruns']} reruns)")
+    print(f"  Duración                 : {r['duracion_s']:.1f} s  ({r['reruns_por_s']:.1f} reruns/s)")
+    print(f"  Latencia p50 / p95 / p99 : {r['p50_s']:.2f} / {r['p95_s']:.2f} / {r['p99_s']:.2f} s"
+          f"  (máx {r['max_s']:.2f} s)")
+    for accion, p95 in r["p95_por_accion"].items():
+        print(f"     p95 {accion:<10}         : {p95:.2f} s")
+    print(f"  RSS inicial → pico       : {r['rss_inicial_mb']:,.0f} → {r['rss_pico_mb']:,.0f} MB")
+    print(f"  Almacén de datos         : {r['almacen_tasa']:.1%} aciertos "
+          f"({r['almacen_aciertos']:,} / {r['almacen_fallos']:,} fallos) · "
+          f"{r['almacen_mb']:,.0f} MB · {r['almacen_expulsiones']} expulsiones")
+    print(f"  Caché de figuras         : {r['figuras_tasa']:.1%} aciertos")
+    print(f"  Errores                  : {len(r['errores'])}")
+    for error in r["errores"][:5]:
+        print(f"     ❌ {error}")
+    print("="*55)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Prueba de carga local de dashboard.py")
+    parser.add_argument("--sesiones", type=int, default=4)
+    parser.add_argument("--interacciones", type=int, default=10)
+    parser.add_argument("--semilla", type=int, default=80)
+    parser.add_argument("--p95-max", type=float, default=None,
+                        help="Falla (código 1) si la latencia p95 supera estos segundos")
+    parser.add_argument("--json", default=None, help="Guarda el reporte en este archivo")
+    args = parser.parse_args()
+
+    reporte = prueba_carga(args.sesiones, args.interacciones, args.semilla)
+    imprimir_reporte(reporte)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(reporte, f, ensure_ascii=False, indent=2)
+
+    fallo = bool(reporte["errores"])
+    if args.p95_max is not None and reporte["p95_s"] > args.p95_max:
+        print(f"\n  ❌ p95 {reporte['p95_s']:.2f} s > límite {args.p95_max:.2f} s")
+        fallo = True
+    sys.exit(1 if fallo else 0)
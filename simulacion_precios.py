@@ -0,0 +1,178 @@
+"""
+=========================================================
+SISTEMA DE ANÁLISIS BIM – TRAMO 1 | Metro 80, Medellín
+=========================================================
+Simulación de precios unitarios sin reconstruir el maestro
+
+Los precios se asignan por clave canónica (ver asignar_precios):
+  - Conduits / Fittings → key_tipo_diam = type|diametro
+  - Fixtures            → key_familia   = family
+
+IndicePrecios: índice invertido clave → posiciones de las filas del
+maestro que usan ese precio (se construye una vez por snapshot).
+
+EscenarioPrecios: copia por sesión de las columnas de precio y costo.
+Cada ajuste recalcula SOLO las filas de su clave (con la misma
+calcular_costos del pipeline) y corrige las celdas de los KPIs que
+dependen del precio (costos, inversión, % y elementos sin precio)
+con la diferencia de esas filas. Los costos son pesos enteros, así
+que el resultado es idéntico a recalcular todo el maestro.
+
+Los ajustes se exportan como un nuevo Maestro de Precios (.xlsx).
+=========================================================
+"""
+
+import io
+
+import numpy as np
+import pandas as pd
+
+from build_maestro import calcular_costos, preparar_maestro
+from canonizacion import clave_union
+from formatos_fuente import leer_fuente
+
+CAMPO_POR_CATEGORIA = {"Conduits": "key_tipo_diam", "Fittings": "key_tipo_diam",
+                       "Fixtures": "key_familia"}
+CATEGORIAS_POR_CAMPO = {"key_tipo_diam": ("Conduits", "Fittings"), "key_familia": ("Fixtures",)}
+COLUMNAS_PRECIO = ["precio_unitario", "precio_encontrado",
+                   "costo_nuevo", "costo_demolicion", "costo_total"]
+
+
+# ─────────────────────────────────────────────────────────
+# 1. ÍNDICE INVERTIDO CLAVE → FILAS
+# ─────────────────────────────────────────────────────────
+class IndicePrecios:
+    """Índice invertido (campo, clave) → posiciones de filas del maestro."""
+
+    def __init__(self, df: pd.DataFrame):
+        # Se agrupa por las columnas (categóricas) que forman las claves y
+        # luego se juntan los grupos de la misma clave: no hay que construir
+        # un texto por fila.
+        grupos = df.groupby(["categoria", "family", "type", "diametro"],
+                            observed=True, sort=False, dropna=False).indices
+        valores = pd.DataFrame(list(grupos), columns=["categoria", "family", "type", "diametro"]).astype(str)
+        campos = valores["categoria"].map(CAMPO_POR_CATEGORIA).fillna("key_familia")
+        claves = clave_union(valores["type"], valores["diametro"]).where(
+            campos == "key_tipo_diam", clave_union(valores["family"]))
+        partes = {}
+        for campo, clave, posiciones in zip(campos, claves, grupos.values()):
+            partes.setdefault((campo, clave), []).append(posiciones)
+        self.filas = {clave: np.sort(np.concatenate(pos)) for clave, pos in partes.items()}
+
+        primera = {clave: pos[0] for clave, pos in self.filas.items()}
+        self.tabla = pd.DataFrame({
+            "campo"      : [c for c, _ in primera],
+            "clave"      : [k for _, k in primera],
+            "categoria"  : [str(df["categoria"].iat[p]) for p in primera.values()],
+            "family"     : [str(df["family"].iat[p]) for p in primera.values()],
+            "type"       : [str(df["type"].iat[p]) for p in primera.values()],
+            "diametro"   : [str(df["diametro"].iat[p]) for p in primera.values()],
+            "unidad"     : [str(df["unidad"].iat[p]) for p in primera.values()],
+            "elementos"  : [len(pos) for pos in self.filas.values()],
+            "precio_base": [df["precio_unitario"].iat[p] for p in primera.values()],
+        })
+        self.tabla.insert(2, "etiqueta", self.tabla["family"].where(
+            self.tabla["campo"] == "key_familia", self.tabla["type"] + "|" + self.tabla["diametro"]))
+        self.tabla = self.tabla.sort_values(["categoria", "etiqueta"]).reset_index(drop=True)
+
+
+# ─────────────────────────────────────────────────────────
+# 2. ESCENARIO DE UNA SESIÓN
+# ─────────────────────────────────────────────────────────
+class EscenarioPrecios:
+    """
+    Maestro con costos (`df`, compartido, nunca se modifica) + ajustes
+    de precio de una sesión. `ajustar(campo, clave, precio)` aplica o
+    (con precio=None) revierte un ajuste tocando solo las filas de la clave.
+    """
+
+    def __init__(self, df: pd.DataFrame, indice: IndicePrecios, factor: float, kpis: tuple):
+        self.indice = indice
+        self.factor = factor
+        self.ajustes = {}
+        # Copia superficial + columnas de precio/costo propias de la sesión
+        self.df = df.copy(deep=False)
+        for col in COLUMNAS_PRECIO:
+            self.df[col] = df[col].to_numpy(copy=True)
+        self.df["precio_unitario"] = self.df["precio_unitario"].astype("float64")
+        kpi_tec, kpi_eco, kpi_cnt, kpi_cal = kpis
+        self._kpis = (kpi_tec, dict(kpi_eco), kpi_cnt, dict(kpi_cal))
+        self._base = df
+
+    def ajustar(self, campo: str, clave: str, precio):
+        posiciones = self.indice.filas[(campo, clave)]
+        if precio is None:
+            self.ajustes.pop((campo, clave), None)
+            nuevas = self._base.iloc[posiciones][COLUMNAS_PRECIO]
+        else:
+            self.ajustes[(campo, clave)] = precio
+            filas = self._base.iloc[posiciones].copy()
+            filas["precio_unitario"] = float(precio)
+            filas["precio_encontrado"] = True      # como en asignar_precios: antes de validar
+            nuevas = calcular_costos(filas, self.factor, verbose=False)
+        anteriores = self.df.iloc[posiciones]
+
+        _, kpi_eco, _, kpi_cal = self._kpis
+        kpi_eco["costo_nuevo"]      += float(nuevas["costo_nuevo"].sum() - anteriores["costo_nuevo"].sum())
+        kpi_eco["costo_demolicion"] += float(nuevas["costo_demolicion"].sum() - anteriores["costo_demolicion"].sum())
+        kpi_cal["sin_precio"]       += int((~nuevas["precio_encontrado"]).sum() - (~anteriores["precio_encontrado"]).sum())
+
+        for col in COLUMNAS_PRECIO:
+            self.df.iloc[posiciones, self.df.columns.get_loc(col)] = nuevas[col].to_numpy()
+        self._recalcular_derivados()
+
+    def _recalcular_derivados(self):
+        _, kpi_eco, _, kpi_cal = self._kpis
+        inversion = kpi_eco["costo_demolicion"] + kpi_eco["costo_nuevo"]
+        kpi_eco.update(inversion_total=inversion,
+                       pct_demol=kpi_eco["costo_demolicion"]/inversion*100 if inversion>0 else 0,
+                       pct_nuevo=kpi_eco["costo_nuevo"]/inversion*100 if inversion>0 else 0)
+        total = kpi_cal["total"]
+        kpi_cal["pct_std"] = kpi_cal["sin_precio"]/total*100 if total>0 else 0
+
+    def kpis(self) -> tuple:
+        return self._kpis
+
+    def sincronizar(self, ajustes: dict):
+        """Lleva el escenario a `ajustes` = {(campo, clave): precio}, tocando solo lo que cambió."""
+        for clave in [c for c in self.ajustes if c not in ajustes]:
+            self.ajustar(*clave, None)
+        for clave, precio in ajustes.items():
+            if self.ajustes.get(clave) != precio:
+                self.ajustar(*clave, precio)
+
+
+# ─────────────────────────────────────────────────────────
+# 3. EXPORTACIÓN DEL MAESTRO DE PRECIOS
+# ─────────────────────────────────────────────────────────
+def exportar_maestro(ruta_maestro: str, ajustes: dict, indice: IndicePrecios) -> bytes:
+    """
+    Maestro de precios (.xlsx, mismas columnas que el original) con los
+    ajustes aplicados. Las claves que no existían en el maestro se
+    agregan como filas nuevas.
+    """
+    original = leer_fuente(ruta_maestro)
+    claves = preparar_maestro(original)
+    categoria = claves["Categoria"].astype(str).str.strip()
+    salida = original.copy()
+    nuevas = []
+    tabla = indice.tabla.set_index(["campo", "clave"])
+    for (campo, clave), precio in ajustes.items():
+        coincide = ((claves[campo] == clave) & categoria.isin(CATEGORIAS_POR_CAMPO[campo])).to_numpy()
+        if coincide.any():
+            salida.loc[coincide, "Precio_Unitario_COP"] = precio
+            if "Precio_Formateado" in salida.columns:
+                salida.loc[coincide, "Precio_Formateado"] = precio
+        else:
+            info = tabla.loc[(campo, clave)]
+            nuevas.append({"Categoria": info["categoria"], "Familia": info["family"],
+                           "Tipo": info["type"], "Tamaño_Diametro": info["diametro"],
+                           "Unidad": info["unidad"], "Precio_Unitario_COP": precio,
+                           "Precio_Formateado": precio})
+    if nuevas:
+        salida = pd.concat([salida, pd.DataFrame(nuevas)[[c for c in salida.columns
+                                                          if c in nuevas[0]]]],
+                           ignore_index=True)
+    buffer = io.BytesIO()
+    salida.to_excel(buffer, index=False)
+    return buffer.getvalue()
@@ -0,0 +1,103 @@
+"""
+=========================================================
+SISTEMA DE ANÁLISIS BIM – TRAMO 1 | Metro 80, Medellín
+=========================================================
+Sugerencias del maestro de precios para elementos sin precio
+
+Índice invertido de trigramas de caracteres sobre las claves canónicas
+del maestro (las de preparar_maestro):
+  - key_tipo_diam (filas de Conduits / Fittings)
+  - key_familia   (filas de Fixtures)
+
+Para cada clave SIN precio (distinta, no por elemento) se buscan las
+entradas del maestro que comparten trigramas y se ordenan por el
+coeficiente de Dice:  2·|A ∩ B| / (|A| + |B|)  (1 = clave idéntica).
+El índice se construye una vez por maestro.
+=========================================================
+"""
+
+from collections import Counter
+
+import pandas as pd
+
+from canonizacion import clave_union
+from simulacion_precios import CAMPO_POR_CATEGORIA, CATEGORIAS_POR_CAMPO
+
+N_SUGERENCIAS = 3
+SIMILITUD_MINIMA = 0.3
+
+
+# ─────────────────────────────────────────────────────────
+# 1. ÍNDICE DE TRIGRAMAS
+# ─────────────────────────────────────────────────────────
+def trigramas(texto: str) -> set:
+    relleno = f"  {texto} "
+    return {relleno[i:i + 3] for i in range(len(relleno) - 2)}
+
+
+class IndiceSugerencias:
+    """Índice (campo, trigrama) → entradas del maestro de precios."""
+
+    def __init__(self, maestro_prep: pd.DataFrame):
+        categoria = maestro_prep["Categoria"].astype(str).str.strip()
+        self.entradas = []               # (campo, clave, etiqueta, precio)
+        self.indice = {}
+        for campo, categorias in CATEGORIAS_POR_CAMPO.items():
+            filas = maestro_prep[categoria.isin(categorias)].drop_duplicates(campo, keep="last")
+            etiquetas = (filas["Familia"] if campo == "key_familia"
+                         else filas["Tipo"] + "|" + filas["Tamaño_Diametro"])
+            for clave, etiqueta, precio in zip(filas[campo], etiquetas, filas["Precio_Unitario_COP"]):
+                posicion = len(self.entradas)
+                tri = trigramas(clave)
+                self.entradas.append((campo, clave, etiqueta, precio, len(tri)))
+                for t in tri:
+                    self.indice.setdefault((campo, t), []).append(posicion)
+
+    def sugerir(self, campo: str, clave: str, n: int = N_SUGERENCIAS,
+                minimo: float = SIMILITUD_MINIMA) -> list:
+        """[(etiqueta, precio, similitud)] de mayor a menor similitud."""
+        tri = trigramas(clave)
+        comunes = Counter(p for t in tri for p in self.indice.get((campo, t), ()))
+        puntajes = [(2 * k / (len(tri) + self.entradas[p][4]), p) for p, k in comunes.items()]
+        puntajes = sorted((s for s in puntajes if s[0] >= minimo), reverse=True)[:n]
+        return [(self.entradas[p][2], self.entradas[p][3], similitud) for similitud, p in puntajes]
+
+
+# ─────────────────────────────────────────────────────────
+# 2. SUGERENCIAS POR CLAVE SIN PRECIO
+# ─────────────────────────────────────────────────────────
+def sugerencias_sin_precio(df: pd.DataFrame, indice: IndiceSugerencias,
+                           n: int = N_SUGERENCIAS) -> pd.DataFrame:
+    """
+    Una fila por clave sin precio (categoria, family, type, diametro) con
+    el número de elementos afectados y las `n` mejores entradas del maestro.
+    """
+    sin_precio = df[~df["precio_encontrado"].astype(bool)]
+    if len(sin_precio) == 0:
+        return pd.DataFrame()
+    grupos = (sin_precio.groupby(["categoria", "family", "type", "diametro"],
+                                 observed=True, sort=False, dropna=False)
+                        .size().rename("elementos").reset_index())
+    for col in ["categoria", "family", "type", "diametro"]:
+        grupos[col] = grupos[col].astype(str)
+    grupos["campo"] = grupos["categoria"].map(CAMPO_POR_CATEGORIA).fillna("key_familia")
+    grupos["clave"] = clave_union(grupos["type"], grupos["diametro"]).where(
+        grupos["campo"] == "key_tipo_diam", clave_union(grupos["family"]))
+    grupos["etiqueta"] = grupos["family"].where(
+        grupos["campo"] == "key_familia", grupos["type"] + "|" + grupos["diametro"])
+
+    # Varias combinaciones pueden compartir clave (p. ej. Fixtures de distinto type)
+    por_clave = grupos.groupby(["campo", "clave"], sort=False).agg(
+        categoria=("categoria", "first"), etiqueta=("etiqueta", "first"),
+        elementos=("elementos", "sum")).reset_index()
+    filas = []
+    for campo, clave, categoria, etiqueta, elementos in por_clave.itertuples(index=False):
+        sugerencias = indice.sugerir(campo, clave, n)
+        fila = {"categoria": categoria, "clave": etiqueta, "elementos": elementos}
+        for i in range(n):
+            etiqueta_s, precio, similitud = sugerencias[i] if i < len(sugerencias) else (None, None, None)
+            fila[f"sugerencia_{i + 1}"] = etiqueta_s
+            fila[f"precio_{i + 1}"] = precio
+            fila[f"similitud_{i + 1}"] = similitud
+        filas.append(fila)
+    return pd.DataFrame(filas).sort_values("elementos", ascending=False).reset_index(drop=True)
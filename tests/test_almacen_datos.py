@@ -0,0 +1,47 @@
+import threading
+import time
+
+import pytest
+
+from almacen_datos import AlmacenCompartido
+
+
+def test_construccion_fallida_no_duplica_constructores():
+    """Tras un constructor fallido, los que esperaban y los que llegan comparten un solo lock."""
+    almacen = AlmacenCompartido()
+    activos, maximo, llamadas = [0], [0], [0]
+    candado = threading.Lock()
+
+    def constructor():
+        with candado:
+            llamadas[0] += 1
+            activos[0] += 1
+            maximo[0] = max(maximo[0], activos[0])
+            primera = llamadas[0] == 1
+        time.sleep(0.1)
+        with candado:
+            activos[0] -= 1
+        if primera:
+            raise ValueError("fallo simulado")
+        return 1
+
+    def pedir():
+        try:
+            almacen.obtener("Tramo1", "h", "costos", constructor)
+        except ValueError:
+            pass
+
+    hilos = [threading.Thread(target=pedir) for _ in range(5)]
+    for h in hilos:
+        h.start()
+    time.sleep(0.15)                 # llegan más tras el fallo, mientras otro reintenta
+    tardios = [threading.Thread(target=pedir) for _ in range(3)]
+    for h in tardios:
+        h.start()
+    for h in hilos + tardios:
+        h.join()
+
+    assert maximo[0] == 1
+    assert llamadas[0] == 2          # el fallido y un solo reintento
+    assert almacen.obtener("Tramo1", "h", "costos", pytest.fail) == 1
+    assert almacen._locks_construccion == {}
@@ -0,0 +1,73 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from formatos_fuente import SUFIJOS_LONGITUD, _numeros_revit, leer_revit_delimitado
+from unidades_longitud import longitudes_en_metros
+
+
+def numeros(valores, sufijos=None):
+    serie, unidad = _numeros_revit(pd.Series(valores, dtype=object), sufijos)
+    return serie.tolist(), unidad
+
+
+@pytest.mark.parametrize("valores, esperado", [
+    (["1,234.50", "12.5", "0.28"], [1234.5, 12.5, 0.28]),          # punto decimal, coma de miles
+    (["1.234,50", "12,5", "0,28"], [1234.5, 12.5, 0.28]),          # coma decimal, punto de miles
+    (["1,234,567", "3.5"], [1234567.0, 3.5]),                      # separador repetido → miles
+    (["1.234.567", "3,5"], [1234567.0, 3.5]),
+    (["12,5", "3,25"], [12.5, 3.25]),                              # un solo separador → decimal
+    (["1,234", "12.5", "3.75"], [1234.0, 12.5, 3.75]),             # '.' y ',' en valores distintos
+    (["-2.5", "7"], [-2.5, 7.0]),
+])
+def test_separador_decimal_por_columna(valores, esperado):
+    assert numeros(valores)[0] == pytest.approx(esperado)
+
+
+@pytest.mark.parametrize("valores, esperado, unidad", [
+    (["1,234.50 m", "12.5 m"], [1234.5, 12.5], "m"),
+    (["1.234,5 m", "12,5 m"], [1234.5, 12.5], "m"),
+    (["1500 mm", "280 mm"], [1.5, 0.28], "mm"),
+    (["1.500,0 mm", "280,0 mm"], [1.5, 0.28], "mm"),
+    (["28 cm", "150 cm"], [0.28, 1.5], "cm"),
+    (["3 ft", "10 FT"], [0.9144, 3.048], "ft"),
+    (["10'", "2'"], [3.048, 0.6096], "'"),
+    (["12 in", "6 in"], [0.3048, 0.1524], "in"),
+])
+def test_sufijo_de_unidad_a_metros(valores, esperado, unidad):
+    convertidos, detectada = numeros(valores, SUFIJOS_LONGITUD)
+    assert convertidos == pytest.approx(esperado)
+    assert detectada == unidad
+
+
+def test_sin_sufijo_no_hay_unidad_explicita():
+    assert numeros(["12.5", "0.28"], SUFIJOS_LONGITUD) == ([12.5, 0.28], None)
+
+
+def test_valores_no_numericos_quedan_nan():
+    convertidos, _ = numeros(["12.5 m", "", None, "sin dato"], SUFIJOS_LONGITUD)
+    assert convertidos[0] == 12.5 and all(np.isnan(convertidos[1:]))
+
+
+def _tabla_revit(tmp_path, longitudes):
+    filas = ["Tabla de Conduits"] + ["Family\tType\tDiameter(Trade Size)\tLength"] + \
+            [f"Conduit\tTubo_PVC_4In\t4\"\t{l}" for l in longitudes]
+    ruta = tmp_path / "conduits.txt"
+    ruta.write_text("\n".join(filas) + "\n", encoding="utf-16")
+    return str(ruta)
+
+
+def test_unidad_explicita_no_se_infiere(tmp_path):
+    df = leer_revit_delimitado(_tabla_revit(tmp_path, ["1.234,5 mm", "280,0 mm"] * 20))
+    assert df["Length"].tolist()[:2] == pytest.approx([1.2345, 0.28])
+    longitud, decision = longitudes_en_metros(df, df["Diameter(Trade Size)"], "prueba")
+    assert decision["unidad"] == "mm" and not decision["fracciones"]
+    np.testing.assert_allclose(longitud, df["Length"].to_numpy())
+
+
+def test_sin_sufijo_se_infiere(tmp_path):
+    df = leer_revit_delimitado(_tabla_revit(tmp_path, ["1234,5", "280", "30000", "150000"] * 10))
+    assert df.attrs["unidades_explicitas"] == {}
+    longitud, decision = longitudes_en_metros(df, df["Diameter(Trade Size)"], "prueba")
+    assert decision["unidad"] == "mm" and decision["fracciones"]
+    assert longitud[:4] == pytest.approx([1.2345, 0.28, 30.0, 150.0])
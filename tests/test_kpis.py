@@ -0,0 +1,67 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from build_maestro import calcular_costos
+from cantidades_obra import (agregar_elementos, cantidades_obra, cantidades_por_item,
+                             combinar_parciales, conciliar)
+from kpis import AgregadoKPI, _pesos, calcular_kpis, kpis_por_lotes
+
+FACTOR = 0.25
+
+
+@pytest.fixture(scope="module")
+def maestro():
+    """Maestro sintético con costos: cantidades y precios con decimales, algunos sin precio."""
+    rng = np.random.default_rng(80)
+    n = 20_000
+    categoria = rng.choice(["Conduits", "Fittings", "Fixtures"], n)
+    es_conduit = categoria == "Conduits"
+    tipo = rng.choice(["Tubo_PVC_2In", "Tubo_PVC_4In", "Codo_90"], n)
+    diametro = np.where(categoria == "Fixtures", "N/A", rng.choice(['2"', '4"'], n))
+    precio = rng.choice([8_000.5, 22_000.0, 1_234_567.89, np.nan], n, p=[0.4, 0.4, 0.15, 0.05])
+    df = pd.DataFrame({
+        "id"               : np.arange(1, n + 1),
+        "categoria"        : categoria,
+        "family"           : np.where(es_conduit, "Conduit", rng.choice(["Caja_A", "Camara_B"], n)),
+        "type"             : tipo,
+        "diametro"         : diametro,
+        "nombre_sistema"   : rng.choice(["Fibra", None], n),
+        "categoria_sistema": rng.choice(["Telecom", None], n),
+        "estado"           : rng.choice(["DEMOLIDO", "NUEVO", "PERSISTENTE"], n),
+        "cantidad"         : np.where(es_conduit, rng.uniform(0.01, 180, n).round(3), 1.0),
+        "unidad"           : np.where(es_conduit, "ML", "UND"),
+        "precio_unitario"  : precio,
+        "precio_encontrado": ~np.isnan(precio),
+    })
+    return calcular_costos(df, FACTOR, verbose=False)
+
+
+def _lotes(df, tamano):
+    return [df.iloc[i:i + tamano] for i in range(0, len(df), tamano)]
+
+
+@pytest.mark.parametrize("tamano", [1_000, 4_096, 7_919])
+def test_kpis_invariantes_a_la_particion(maestro, tamano):
+    kpi_tec, kpi_eco, kpi_cnt, kpi_cal = calcular_kpis(maestro)
+    por_lotes = kpis_por_lotes(_lotes(maestro, tamano))
+    assert por_lotes == (kpi_tec, kpi_eco, kpi_cnt, kpi_cal)
+
+    # combinar() de agregados parciales da lo mismo que un solo agregado
+    mitades = _lotes(maestro, len(maestro) // 2 + 1)
+    combinado = AgregadoKPI().agregar(mitades[0]).combinar(AgregadoKPI().agregar(mitades[1]))
+    assert combinado.resultado() == (kpi_tec, kpi_eco, kpi_cnt, kpi_cal)
+
+
+def test_cantidades_concilian_con_kpis(maestro):
+    kpi_eco = calcular_kpis(maestro)[1]
+    assert set(conciliar(cantidades_obra(maestro, FACTOR), kpi_eco).values()) == {0}
+
+    parciales = [agregar_elementos(lote) for lote in _lotes(maestro, 3_000)]
+    por_lotes = cantidades_por_item(combinar_parciales(parciales), FACTOR)
+    assert set(conciliar(por_lotes, kpi_eco).values()) == {0}
+
+
+def test_suma_de_pesos_sin_desborde():
+    valores = np.array([2**53 - 1] * 5_000 + [-(2**52)] * 7 + [123], dtype="int64")
+    assert _pesos(pd.Series(valores)) == sum(int(v) for v in valores)
@@ -0,0 +1,134 @@
+"""
+=========================================================
+SISTEMA DE ANÁLISIS BIM – TRAMO 1 | Metro 80, Medellín
+=========================================================
+Unidad de la columna Length de cada archivo de Conduits
+
+Revit exporta la longitud en la unidad de la plantilla del proyecto
+(m, cm, mm, ft o in) sin indicarla en la tabla. Un archivo completo en
+mm o ft terminaba anulado por UMBRAL_ML o, peor, con cantidades
+plausibles pero equivocadas.
+
+Si la tabla trae la unidad en cada valor ("12.50 m", "1500 mm"), el
+lector ya la convirtió a metros (formatos_fuente.py) y no se infiere
+nada. Si no, por archivo, en una sola pasada vectorizada: para cada
+unidad candidata se cuenta qué fracción de los elementos queda,
+convertida a metros, dentro del rango esperado para su diámetro
+(RANGOS_LONGITUD_M).
+
+  - Metros es la hipótesis por defecto: si es plausible y no hay otra
+    unidad claramente mejor, no se toca nada.
+  - Se convierte la columna completa (una multiplicación) solo si una
+    unidad es plausible y supera a todas las demás por MARGEN.
+  - Si varias unidades explican igual de bien los datos (m/ft o cm/in
+    difieren por un factor pequeño) la unidad queda "indeterminada":
+    no se convierte y se reporta en la auditoría.
+
+Cada decisión (archivo, unidad, factor, fracciones plausibles) se
+guarda en df.attrs["unidades_longitud"] del maestro, viaja en el
+manifiesto del snapshot y se muestra en Integridad del Modelo.
+=========================================================
+"""
+
+import numpy as np
+import pandas as pd
+
+# Unidad → factor a metros (metros primero: gana los empates)
+UNIDADES = {"m": 1.0, "cm": 0.01, "mm": 0.001, "ft": 0.3048, "in": 0.0254}
+
+# Longitud plausible de un elemento (m) por diámetro canónico, para
+# ductos de telecomunicaciones urbanas: de un recorte de 1 cm a un
+# tramo completo entre cámaras
+RANGOS_LONGITUD_M = {
+    '1"': (0.01, 100.0),
+    '2"': (0.01, 150.0),
+    '3"': (0.01, 200.0),
+    '4"': (0.01, 250.0),
+}
+RANGO_POR_DEFECTO = (0.01, 250.0)
+
+UMBRAL_PLAUSIBLE = 0.98          # fracción mínima de elementos dentro del rango
+MARGEN = 0.05                    # ventaja mínima sobre la segunda unidad
+MIN_ELEMENTOS = 30               # con menos longitudes válidas no se decide
+
+INDETERMINADA = "indeterminada"
+
+
+# ─────────────────────────────────────────────────────────
+# 1. EVIDENCIA POR UNIDAD
+# ─────────────────────────────────────────────────────────
+def _rangos(diametro: pd.Series) -> tuple:
+    """Límites (mín, máx) en metros de cada elemento según su diámetro (por valores distintos)."""
+    codigos, distintos = pd.factorize(diametro, use_na_sentinel=False)
+    limites = np.array([RANGOS_LONGITUD_M.get(d, RANGO_POR_DEFECTO) for d in distintos],
+                       dtype="float64").reshape(-1, 2)
+    return limites[codigos, 0], limites[codigos, 1]
+
+
+def fracciones_plausibles(longitud: np.ndarray, diametro: pd.Series) -> dict:
+    """
+    {unidad: fracción de las longitudes válidas (> 0) que, leídas en esa
+    unidad, caen en el rango de su diámetro}. Una matriz elementos ×
+    unidades: una sola pasada sobre la columna.
+    """
+    valida = longitud > 0
+    if not valida.any():
+        return dict.fromkeys(UNIDADES, 0.0)
+    minimo, maximo = _rangos(diametro)
+    en_metros = longitud[valida, None] * np.fromiter(UNIDADES.values(), dtype="float64")
+    dentro = (en_metros >= minimo[valida, None]) & (en_metros <= maximo[valida, None])
+    return dict(zip(UNIDADES, dentro.mean(axis=0).round(4).tolist()))
+
+
+# ─────────────────────────────────────────────────────────
+# 2. DECISIÓN Y CONVERSIÓN
+# ─────────────────────────────────────────────────────────
+def inferir_unidad(longitud: np.ndarray, diametro: pd.Series, archivo: str) -> dict:
+    """Decisión para un archivo (registro JSON para la auditoría)."""
+    elementos = int(np.count_nonzero(longitud > 0))
+    fracciones = fracciones_plausibles(longitud, diametro)
+    decision = dict(archivo=archivo, elementos=elementos, unidad="m", factor=1.0,
+                    convertido=False, fracciones=fracciones, rivales=[])
+    if elementos < MIN_ELEMENTOS:
+        return dict(decision, motivo=f"menos de {MIN_ELEMENTOS} longitudes válidas — se asume m")
+
+    mejor = max(fracciones, key=fracciones.get)
+    rivales = [u for u, f in fracciones.items() if f >= fracciones[mejor] - MARGEN]
+    decision["rivales"] = rivales
+    if fracciones[mejor] >= UMBRAL_PLAUSIBLE and rivales == [mejor]:
+        return dict(decision, unidad=mejor, factor=UNIDADES[mejor], convertido=mejor != "m",
+                    motivo=f"{fracciones[mejor]:.1%} de los elementos en rango solo en {mejor}")
+    if "m" in rivales and fracciones["m"] >= UMBRAL_PLAUSIBLE:
+        return dict(decision, motivo=f"{fracciones['m']:.1%} de los elementos en rango en m")
+    return dict(decision, unidad=INDETERMINADA,
+                motivo=f"evidencia insuficiente ({' / '.join(rivales)}) — se deja sin convertir")
+
+
+def longitudes_en_metros(df: pd.DataFrame, diametro: pd.Series, archivo: str,
+                         columna: str = "Length") -> tuple:
+    """
+    (longitud en metros como float64, decisión) de un archivo de Conduits.
+    `diametro` es el diámetro ya canonizado de cada fila de `df`.
+    """
+    longitud = pd.to_numeric(df[columna], errors="coerce").to_numpy(dtype="float64", na_value=np.nan)
+    explicita = df.attrs.get("unidades_explicitas", {}).get(columna)
+    if explicita is not None:       # convertida a metros al leer el archivo
+        return longitud, dict(archivo=archivo, elementos=int(np.count_nonzero(longitud > 0)),
+                              unidad=explicita, factor=1.0, convertido=False, fracciones={},
+                              rivales=[], motivo=f"unidad indicada en el archivo ({explicita}) "
+                                             "— convertida a m al leer")
+    decision = inferir_unidad(longitud, diametro, archivo)
+    if decision["convertido"]:
+        longitud = longitud * decision["factor"]
+    return longitud, decision
+
+
+def describir(decision: dict) -> str:
+    """Texto corto de la decisión (consola y dashboard)."""
+    if decision["convertido"]:
+        return f"{decision['unidad']} → m (×{decision['factor']:g})"
+    if decision["unidad"] == INDETERMINADA:
+        return "indeterminada (sin convertir)"
+    if not decision["fracciones"]:
+        return f"{decision['unidad']} (indicada en el archivo)"
+    return "m (sin conversión)"
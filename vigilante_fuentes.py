@@ -0,0 +1,103 @@
+"""
+=========================================================
+SISTEMA DE ANÁLISIS BIM – TRAMO 1 | Metro 80, Medellín
+=========================================================
+Vigilancia de los Excel fuente de un tramo
+
+VigilanteFuentes es un hilo que sondea los archivos fuente. Un
+archivo cambiado solo se reporta cuando lleva ESPERA_ESTABLE
+segundos sin cambiar y está completo (un .xlsx a medio copiar no
+es un ZIP válido). Con `resolver` las rutas se vuelven a resolver
+en cada pasada: una tabla exportada en un formato de mayor
+prioridad (.parquet, .txt junto al .xlsx) se vigila desde que
+aparece y cuenta como cambio. La reconstrucción la hace el coordinador
+(coordinador.py), fuera del hilo de la petición.
+=========================================================
+"""
+
+import os
+import threading
+import time
+import zipfile
+
+INTERVALO_SONDEO = 2.0   # segundos entre revisiones de los archivos
+ESPERA_ESTABLE   = 3.0   # segundos sin cambios antes de dar un archivo por terminado
+
+
+def _firma(ruta: str):
+    try:
+        info = os.stat(ruta)
+        return (info.st_size, info.st_mtime_ns)
+    except FileNotFoundError:
+        return None
+
+
+def archivo_completo(ruta: str) -> bool:
+    """
+    Un Excel a medio escribir todavía no tiene el directorio central del
+    ZIP; un Parquet incompleto no termina con la firma "PAR1".
+    """
+    if not os.path.exists(ruta):
+        return False
+    if ruta.lower().endswith(".xlsx"):
+        return zipfile.is_zipfile(ruta)
+    if ruta.lower().endswith(".parquet"):
+        with open(ruta, "rb") as f:
+            f.seek(0, os.SEEK_END)
+            if f.tell() < 8:
+                return False
+            f.seek(-4, os.SEEK_END)
+            return f.read(4) == b"PAR1"
+    return True
+
+
+class VigilanteFuentes(threading.Thread):
+    """
+    Sondea `rutas` cada `intervalo` segundos y llama a
+    `al_cambiar(nombres)` con los archivos que cambiaron y ya están estables.
+    `resolver()` (opcional) retorna las rutas vigentes en cada pasada.
+    """
+
+    def __init__(self, rutas: dict, al_cambiar,
+                 intervalo: float = INTERVALO_SONDEO,
+                 espera_estable: float = ESPERA_ESTABLE,
+                 resolver=None):
+        super().__init__(name="vigilante-fuentes", daemon=True)
+        self.rutas = dict(rutas)
+        self.al_cambiar = al_cambiar
+        self.resolver = resolver
+        self.intervalo = intervalo
+        self.espera_estable = espera_estable
+        self._conocidas = {n: _firma(r) for n, r in self.rutas.items()}
+        self._pendientes = {}            # nombre → momento del último cambio visto
+        self._detener = threading.Event()
+
+    def revisar(self, ahora: float = None) -> set:
+        """Una pasada de sondeo. Retorna los archivos listos para reconstruir."""
+        ahora = time.monotonic() if ahora is None else ahora
+        if self.resolver is not None:
+            for nombre, ruta in self.resolver().items():
+                if self.rutas.get(nombre) != ruta:        # otro formato de la misma tabla
+                    self.rutas[nombre] = ruta
+                    self._conocidas[nombre] = _firma(ruta)
+                    self._pendientes[nombre] = ahora
+        for nombre, ruta in self.rutas.items():
+            firma = _firma(ruta)
+            if firma != self._conocidas[nombre]:
+                self._conocidas[nombre] = firma
+                self._pendientes[nombre] = ahora      # se reinicia la espera (debounce)
+
+        listos = {n for n, t in self._pendientes.items()
+                  if ahora - t >= self.espera_estable and archivo_completo(self.rutas[n])}
+        for nombre in listos:
+            del self._pendientes[nombre]
+        return listos
+
+    def run(self):
+        while not self._detener.wait(self.intervalo):
+            listos = self.revisar()
+            if listos:
+                self.al_cambiar(listos)
+
+    def detener(self):
+        self._detener.set()
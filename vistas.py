@@ -0,0 +1,306 @@
+"""
+=========================================================
+SISTEMA DE ANÁLISIS BIM – TRAMO 1 | Metro 80, Medellín
+=========================================================
+Vistas del dashboard: derivados del almacén, figuras y
+precalentamiento
+
+Todo lo que el dashboard guarda en el almacén compartido y en el caché
+de figuras se construye aquí, con una sola definición de cada clave.
+Así el precalentamiento produce EXACTAMENTE las entradas que pedirá el
+primer rerun:
+
+  - por cada factor preestablecido del slider (10 % … 40 %): costos,
+    KPIs, figuras del Resumen Ejecutivo, desglose por sistema,
+    cantidades de obra (tabla y archivos), vista por defecto del
+    Análisis Detallado (todas las categorías y estados) e Integridad
+    del Modelo
+  - una vez por snapshot: índice de precios, atípicos y sugerencias de
+    precio (no dependen del factor)
+
+Los factores distintos del de por defecto solo se precalientan mientras
+quepan en el presupuesto del almacén; el de por defecto se renueva al
+final para ser el último que expulse el LRU.
+
+El coordinador llama a precalentar() en su hilo de construcción, después
+de escribir el snapshot y ANTES de publicarlo: la primera sesión que ve
+la huella nueva ya encuentra todo calculado. Al adoptar el snapshot en
+disco tras un despliegue corre en un hilo aparte.
+=========================================================
+"""
+
+import time
+
+from almacen_datos import ALMACEN
+from atipicos import tabla_atipicos
+from build_maestro import FACTOR_DEMOLICION, calcular_costos, preparar_maestro
+from cantidades_obra import cantidades_obra, exportar as exportar_cantidades
+from dataset_particionado import disponible as dataset_disponible, huella_dataset, leer_filtrado
+from formatos_fuente import leer_fuente
+from graficos import (figura_barras_agregadas, figura_barras_estados, figura_barras_pares,
+                      figura_dona_inversion, figura_gauge_integridad, figura_sunburst)
+from jerarquia_sistemas import RollupSistemas
+from kpis import calcular_kpis
+from simulacion_precios import IndicePrecios
+from sugerencias_precios import IndiceSugerencias, sugerencias_sin_precio
+
+FACTORES_PRESET = tuple(p / 100 for p in range(10, 45, 5))     # pasos del slider
+ESTADOS = ["DEMOLIDO", "NUEVO", "PERSISTENTE"]
+CATEGORIAS = ["Conduits", "Fittings", "Fixtures"]
+FORMATOS_CANTIDADES = ("xlsx", "csv")
+MEDIDAS_ROLLUP = {
+    "costo_total": ("Costo total", "$ %{value:,.0f}"),
+    "elementos"  : ("Elementos",   "%{value:,} elementos"),
+    "longitud"   : ("Longitud de Conduits", "%{value:,.1f} m"),
+}
+
+
+# ─────────────────────────────────────────────────────────
+# 1. DERIVADOS DEL ALMACÉN (una definición por clave)
+# ─────────────────────────────────────────────────────────
+def costos(tramo, huella, df_base, factor):
+    return ALMACEN.obtener(tramo, huella, ("costos", factor),
+                           lambda: calcular_costos(df_base, factor))
+
+
+def kpis(tramo, huella, df, factor):
+    return ALMACEN.obtener(tramo, huella, ("kpis", factor), lambda: calcular_kpis(df))
+
+
+def indice_precios(tramo, huella, df):
+    return ALMACEN.obtener(tramo, huella, ("indice_precios",), lambda: IndicePrecios(df))
+
+
+def filtrar_en_memoria(df_completo, categorias, estados, tipos):
+    porcion = df_completo
+    if categorias:
+        porcion = porcion[porcion["categoria"].isin(categorias)]
+    if estados:
+        porcion = porcion[porcion["estado"].isin(estados)]
+    if tipos:
+        porcion = porcion[porcion["type"].isin(tipos)]
+    return porcion
+
+
+def detalle(tramo, huella, factor, categorias, estados, tipos, df_completo):
+    """
+    Elementos que cumplen los filtros del Análisis Detallado, con costos.
+    Se leen del dataset Parquet particionado: categoría/estado podan
+    particiones y el tipo se empuja al lector, así que solo se carga la
+    porción filtrada. Si el dataset aún no corresponde a la huella
+    vigente (o no hay pyarrow), se filtra el maestro en memoria.
+    Si ningún filtro deja fuera filas, es el propio `df_completo` (ya con
+    costos): no se guarda una segunda copia del maestro por factor.
+    """
+    if (not categorias and not tipos
+            and set(df_completo["estado"].unique()) <= set(estados)):
+        return df_completo
+
+    def construir():
+        if dataset_disponible() and huella_dataset(tramo) == huella:
+            porcion = leer_filtrado(tramo, categorias, estados, tipos)
+            return calcular_costos(porcion, factor, verbose=False)
+        return filtrar_en_memoria(df_completo, categorias, estados, tipos)
+
+    clave = ("detalle", factor, tuple(categorias), tuple(sorted(estados)), tuple(sorted(tipos)))
+    return ALMACEN.obtener(tramo, huella, clave, construir)
+
+
+def rollup_sistemas(tramo, huella, df, factor):
+    return ALMACEN.obtener(tramo, huella, ("rollup_sistemas", factor), lambda: RollupSistemas(df))
+
+
+def cantidades(tramo, huella, df, factor):
+    return ALMACEN.obtener(tramo, huella, ("cantidades_obra", factor),
+                           lambda: cantidades_obra(df, factor, tramo))
+
+
+def archivo_cantidades(tramo, huella, obra, factor, formato):
+    return ALMACEN.obtener(tramo, huella, ("cantidades_obra_archivo", factor, formato),
+                           lambda: exportar_cantidades(obra, formato))
+
+
+def atipicos(tramo, huella, df_base):
+    """Dependen solo de las cantidades → un cálculo por huella."""
+    return ALMACEN.obtener(tramo, huella, ("atipicos",), lambda: tabla_atipicos(df_base))
+
+
+def sugerencias(tramo, huella, df_base, ruta_maestro):
+    """Sugerencias por clave distinta (no por elemento) desde el maestro de precios."""
+    return ALMACEN.obtener(
+        tramo, huella, ("sugerencias_precios",),
+        lambda: sugerencias_sin_precio(df_base, IndiceSugerencias(preparar_maestro(leer_fuente(ruta_maestro)))))
+
+
+# ─────────────────────────────────────────────────────────
+# 2. TABLAS AGREGADAS Y FIGURAS DE CADA PESTAÑA
+# ─────────────────────────────────────────────────────────
+def figuras_resumen(kpi_tec, kpi_eco, kpi_cnt) -> dict:
+    """Figuras del Resumen Ejecutivo (solo dependen de los KPIs)."""
+    figuras = {
+        "inicial_final": figura_barras_pares(["Inicial", "Final"],
+                                             [kpi_tec["long_inicial"], kpi_tec["long_final"]],
+                                             ["#1a56db", "#60a5fa"],
+                                             "Comparativo: Inicial vs Final", "Metros"),
+        "demolido_nuevo": figura_barras_pares(["Demolido", "Nuevo"],
+                                              [kpi_tec["long_demolida"], kpi_tec["long_nueva"]],
+                                              ["#64748b", "#1a56db"],
+                                              "Demolido vs Nuevo (Conduits)", "Metros"),
+        "inversion": figura_dona_inversion(kpi_eco["costo_demolicion"], kpi_eco["costo_nuevo"]),
+    }
+    for cat_name in CATEGORIAS:
+        data   = kpi_cnt[cat_name]
+        unidad = "m" if cat_name == "Conduits" else "und"
+        vals   = [data["demolido"], data["nuevo"], data["persistente"]]
+        figuras[cat_name] = figura_barras_estados(["Demolido", "Nuevo", "Persistente"], vals,
+                                                  unidad, yaxis_title=unidad)
+    return figuras
+
+
+def figura_rollup(rollup, medida):
+    return figura_sunburst(rollup.tabla, medida,
+                           f"{MEDIDAS_ROLLUP[medida][0]} por Sistema → Categoría → Tipo",
+                           MEDIDAS_ROLLUP[medida][1])
+
+
+def agregados_detalle(df_filtrado) -> dict:
+    """Tablas agregadas del Análisis por Tipo y por Diámetro."""
+    conduits = df_filtrado[df_filtrado["categoria"] == "Conduits"]
+    costo_tipo = df_filtrado.groupby(["type","estado"], observed=True).agg(
+        costo=("costo_total","sum"),
+        cantidad=("cantidad","sum"),
+        elementos=("id","count")
+    ).reset_index()
+    top10 = costo_tipo.groupby("type", observed=True)["costo"].sum().nlargest(10).index
+    return {
+        "cond_tipo" : conduits.groupby(["type","estado"], observed=True)["cantidad"].sum().reset_index(),
+        "costo_tipo": costo_tipo[costo_tipo["type"].isin(top10)],
+        "cond_diam" : conduits.groupby(["diametro","estado"], observed=True)["cantidad"].sum().reset_index(),
+        "costo_diam": (df_filtrado[df_filtrado["diametro"] != "N/A"]
+                       .groupby(["diametro","estado"], observed=True).agg(
+                           costo=("costo_total","sum"),
+                           elementos=("id","count"),
+                           cantidad=("cantidad","sum")
+                       ).reset_index()),
+    }
+
+
+def figuras_detalle(agregados: dict) -> dict:
+    """Figuras del Análisis Detallado (None si la tabla está vacía)."""
+    orden_diam = ['1"','2"','3"','4"']
+    hover_costo = ("<b>{eje}:</b> %{{x}}<br>"
+                   "<b>Estado:</b> %{{fullData.name}}<br>"
+                   "<b>Elementos:</b> %{{customdata[0]:,}}<br>"
+                   "<b>Cantidad:</b> %{{customdata[1]:,.1f}}<br>"
+                   "<b>Costo:</b> $ %{{y:,.0f}}"
+                   "<extra></extra>")
+    especificaciones = {
+        "cond_tipo": dict(
+            x="type", y="cantidad", color="estado",
+            titulo="Longitud (m) por Tipo de Conduit",
+            labels={"cantidad":"Metros","type":"Tipo","estado":"Estado"},
+            barmode="group",
+            hovertemplate="<b>Tipo:</b> %{x}<br><b>Longitud:</b> %{y:,.1f} m<extra>%{fullData.name}</extra>"),
+        "costo_tipo": dict(
+            x="type", y="costo", color="estado",
+            titulo="Costo Total (COP) por Tipo — Top 10",
+            labels={"costo":"COP","type":"Tipo","estado":"Estado"},
+            barmode="stack",
+            custom_data=["elementos","cantidad"],
+            hovertemplate=hover_costo.format(eje="Tipo")),
+        "cond_diam": dict(
+            x="diametro", y="cantidad", color="estado",
+            titulo="Longitud (m) por Diámetro",
+            labels={"cantidad":"Metros","diametro":"Diámetro","estado":"Estado"},
+            barmode="group",
+            category_orders={"diametro": orden_diam},
+            eje_x_categorico=True,
+            hovertemplate="<b>Diámetro:</b> %{x}<br><b>Longitud:</b> %{y:,.1f} m<extra>%{fullData.name}</extra>"),
+        "costo_diam": dict(
+            x="diametro", y="costo", color="estado",
+            titulo="Costo Total (COP) por Diámetro",
+            labels={"costo":"COP","diametro":"Diámetro","estado":"Estado"},
+            barmode="stack",
+            category_orders={"diametro": orden_diam},
+            eje_x_categorico=True,
+            custom_data=["elementos","cantidad"],
+            hovertemplate=hover_costo.format(eje="Diámetro")),
+    }
+    return {nombre: figura_barras_agregadas(agregados[nombre], **spec) if not agregados[nombre].empty else None
+            for nombre, spec in especificaciones.items()}
+
+
+def distribucion_modelo(df) -> dict:
+    """Elementos por estado de cada categoría → {categoria: [demolido, nuevo, persistente]}."""
+    dist = df.groupby(["categoria","estado"], observed=True).size()
+    return {cat: [int(dist.get((cat, e), 0)) for e in ESTADOS] for cat in CATEGORIAS}
+
+
+def figuras_integridad(kpi_cal, df) -> dict:
+    figuras = {"gauge": figura_gauge_integridad(max(0, 100 - kpi_cal["pct_critico"]))}
+    for cat_name, vals in distribucion_modelo(df).items():
+        figuras[cat_name] = figura_barras_estados(ESTADOS, vals, "elementos", yaxis_title="Elementos",
+                                                  titulo=cat_name, altura=300)
+    return figuras
+
+
+# ─────────────────────────────────────────────────────────
+# 3. PRECALENTAMIENTO
+# ─────────────────────────────────────────────────────────
+def _precalentar_factor(tramo, huella, df_base, rutas, factor):
+    """Vista por defecto del dashboard para un factor (lo que pide el primer rerun)."""
+    df = costos(tramo, huella, df_base, factor)
+    kpi_tec, kpi_eco, kpi_cnt, kpi_cal = kpis(tramo, huella, df, factor)
+    figuras_resumen(kpi_tec, kpi_eco, kpi_cnt)
+    figura_rollup(rollup_sistemas(tramo, huella, df, factor), "costo_total")
+    figuras_detalle(agregados_detalle(detalle(tramo, huella, factor, [], ESTADOS, [], df)))
+    figuras_integridad(kpi_cal, df)
+    obra = cantidades(tramo, huella, df, factor)
+    for formato in FORMATOS_CANTIDADES:
+        archivo_cantidades(tramo, huella, obra, factor, formato)
+
+    if factor == FACTOR_DEMOLICION:
+        indice_precios(tramo, huella, df)
+        atipicos(tramo, huella, df_base)
+        if kpi_cal["sin_precio"] > 0:
+            sugerencias(tramo, huella, df_base, rutas["maestro_precios"])
+
+
+def _mb_usados() -> float:
+    return ALMACEN.estadisticas()["mb_usados"]
+
+
+def precalentar(tramo, huella, df_base, rutas, factores=FACTORES_PRESET):
+    """
+    Construye en el almacén y en el caché de figuras la vista por defecto
+    del dashboard para `factores`. Retorna los segundos empleados.
+
+    El factor por defecto se construye primero (mide cuánto ocupa un
+    factor) y se vuelve a consultar al final: sus entradas quedan como
+    las más recientes del LRU y son las últimas en expulsarse. Los demás
+    factores solo se precalientan mientras quepan en el presupuesto del
+    almacén (BIM_PRESUPUESTO_MB); los que no caben se calculan al pedirlos.
+    """
+    inicio = time.perf_counter()
+    otros = [f for f in factores if f != FACTOR_DEMOLICION]
+    calentados = []
+
+    antes = _mb_usados()
+    _precalentar_factor(tramo, huella, df_base, rutas, FACTOR_DEMOLICION)
+    mb_factor = max(_mb_usados() - antes, 0.0)
+    presupuesto = ALMACEN.estadisticas()["mb_presupuesto"]
+
+    for factor in otros:
+        if _mb_usados() + mb_factor > presupuesto:
+            print(f"  ⚠️  Presupuesto del almacén ({presupuesto:,.0f} MB): "
+                  f"{len(otros) - len(calentados)} factores se calcularán al pedirlos")
+            break
+        _precalentar_factor(tramo, huella, df_base, rutas, factor)
+        calentados.append(factor)
+
+    # Todo acierto: solo renueva el factor por defecto en el LRU (almacén y figuras)
+    _precalentar_factor(tramo, huella, df_base, rutas, FACTOR_DEMOLICION)
+
+    segundos = time.perf_counter() - inicio
+    print(f"  🔥 Vistas de {tramo} precalentadas ({len(calentados) + 1} factores) en {segundos:.1f} s")
+    return segundos